@@ -0,0 +1,1414 @@
+import asyncio
+import io
+import itertools
+import logging
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from inventory import InventoryManagerRefactored, Location, classify_stock, instrumentation, movement_source
+from inventory.core import MOVEMENT_CATEGORIES
+from inventory.instrumentation import instrumented
+from inventory.logs import LOG_FORMAT, configure_logging, set_quiet, stop_logging
+from inventory.movement_queue import MovementQueue
+from inventory.report_runner import ReportRunner
+from inventory.rollups import RollupEngine
+from inventory.service import InventoryService
+
+
+def new_database(name):
+    """Cria um banco vazio em uma pasta temporária e retorna o gerenciador configurado."""
+    db_path = os.path.join(tempfile.mkdtemp(), name)
+    manager = InventoryManagerRefactored(db_path)
+    manager.setup()
+    return manager
+
+
+def ops_per_second(operation, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        operation()
+    return count / (time.perf_counter() - start)
+
+
+# ☆☆ Pool de conexões x conexão por consulta ☆☆
+def bench_connection_pool(count=2000):
+    manager = new_database("pool.db")
+    manager.stock.add_stock('CAM-001', 'Camiseta', 30, 10, 50, 'VEST01')
+    query = "UPDATE Stock SET real_stock = real_stock + ? WHERE product_code = ?"
+    params = (1, 'CAM-001')
+
+    def connect_per_query():
+        # Caminho antigo do BaseEntity.execute_query
+        with sqlite3.connect(manager.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            conn.commit()
+
+    legacy = ops_per_second(connect_per_query, count)
+    pooled = ops_per_second(lambda: manager.stock.execute_query(query, params), count)
+
+    print("=== Pool de conexões ===")
+    print(f"Conexão por consulta: {legacy:,.0f} ops/s")
+    print(f"Pool de conexões:     {pooled:,.0f} ops/s ({pooled / legacy:.1f}x)")
+    print(f"Métricas do pool: {manager.pool.metrics()}")
+
+
+def run_concurrently(operation, threads, count):
+    """Executa operation() count vezes em cada uma das threads e retorna o tempo total."""
+    workers = [threading.Thread(target=lambda: [operation() for _ in range(count)]) for _ in range(threads)]
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    return time.perf_counter() - start
+
+
+# ☆☆ Vendas simultâneas do mesmo produto ☆☆
+def bench_concurrent_sales(threads=8, sales=250):
+    initial_stock = threads * sales
+    print("=== Vendas simultâneas ===")
+
+    manager = new_database("legacy_sales.db")
+    with redirect_stdout(io.StringIO()):
+        manager.stock.add_stock('CAM-001', 'Camiseta', initial_stock, 10, initial_stock, 'VEST01')
+
+    def read_modify_write():
+        # Caminho antigo: SELECT, cálculo em Python, UPDATE e INSERT em conexões separadas
+        for attempt in range(20):
+            try:
+                with sqlite3.connect(manager.db_path) as conn:
+                    current_stock, name = conn.execute(
+                        "SELECT real_stock, name FROM Stock WHERE product_code = ?", ('CAM-001',)
+                    ).fetchone()
+                with sqlite3.connect(manager.db_path) as conn:
+                    conn.execute("UPDATE Stock SET real_stock = ? WHERE product_code = ?", (current_stock - 1, 'CAM-001'))
+                with sqlite3.connect(manager.db_path) as conn:
+                    conn.execute(
+                        "INSERT INTO Movements (product_code, name, movement_category, moved_quantity, before_stock, after_stock, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        ('CAM-001', name, 'SALE', 1, current_stock, current_stock - 1, datetime.now()),
+                    )
+                return
+            except sqlite3.OperationalError:
+                time.sleep(0.001)
+
+    report_sales(manager, "Leitura-modificação-escrita", run_concurrently(read_modify_write, threads, sales), initial_stock)
+
+    manager = new_database("engine_sales.db")
+    with redirect_stdout(io.StringIO()):
+        manager.stock.add_stock('CAM-001', 'Camiseta', initial_stock, 10, initial_stock, 'VEST01')
+    elapsed = run_concurrently(lambda: manager.register_product_movement('CAM-001', 1, 'SALE'), threads, sales)
+    report_sales(manager, "Movimentação atômica", elapsed, initial_stock)
+
+
+def report_sales(manager, label, elapsed, initial_stock):
+    real_stock = manager.stock.execute_query("SELECT real_stock FROM Stock WHERE product_code = 'CAM-001'").fetchone()[0]
+    sales = manager.movement.execute_query("SELECT COUNT(*) FROM Movements WHERE movement_category = 'SALE'").fetchone()[0]
+    lost_updates = sales - (initial_stock - real_stock)
+    print(f"{label}: {sales / elapsed:,.0f} vendas/s, {sales} vendas registradas, estoque final {real_stock}, {lost_updates} atualizações perdidas")
+
+
+# ☆☆ Lote de movimentações x uma chamada por linha ☆☆
+def bench_bulk_movements(products=1000, lines=50000, single_lines=2000):
+    print("=== Lote de movimentações ===")
+    manager = new_database("bulk.db")
+    codes = [f"P{i:06d}" for i in range(products)]
+    manager.stock.execute_many(
+        "INSERT INTO Stock (product_code, name, real_stock, min_stock, max_stock, location) VALUES (?, ?, ?, ?, ?, ?)",
+        [(code, f"Produto {code}", 100, 10, 500, 'LOC01') for code in codes],
+    )
+    sale_lines = [(codes[i % products], 1, "SALE" if i % 4 else "ENTRY") for i in range(lines)]
+
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for product_code, quantity, category in sale_lines[:single_lines]:
+            manager.register_product_movement(product_code, quantity, category)
+        single = single_lines / (time.perf_counter() - start)
+        summary = manager.register_movements_bulk(sale_lines)
+
+    print(f"Uma chamada por linha: {single:,.0f} linhas/s")
+    print(f"register_movements_bulk: {summary['lines_per_sec']:,.0f} linhas/s "
+          f"({summary['applied']} aplicadas, {len(summary['rejected'])} rejeitadas)")
+
+
+def fill_movements(manager, rows, products, now, interval=30):
+    """Gera 'rows' movimentações distribuídas a cada 'interval' segundos até 'now'."""
+    categories = ("SALE", "SALE", "SALE", "PURCHASE", "ENTRY")
+    manager.movement.execute_many(
+        "INSERT INTO Movements (product_code, name, movement_category, moved_quantity, before_stock, after_stock, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((f"P{i % products:06d}", "Produto", categories[i % 5], 1, 10, 9, now - timedelta(seconds=(rows - i) * interval))
+         for i in range(rows)),
+    )
+
+
+def best_time(operation, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# ☆☆ Consultas de relatório com e sem índices ☆☆
+def bench_indexes(rows=2000000, products=5000):
+    print(f"=== Índices ({rows:,} movimentações) ===")
+    db_path = os.path.join(tempfile.mkdtemp(), "indexes.db")
+    manager = InventoryManagerRefactored(db_path)
+    # Só as tabelas, sem a migração de índices
+    for entity in (manager.user, manager.product, manager.stock, manager.movement, manager.purchase_order):
+        entity.create_table()
+
+    now = datetime.now()
+    fill_movements(manager, rows, products, now)
+
+    # Parâmetros de exemplo de cada consulta, com as janelas e o produto usados pelos relatórios
+    params = {label: query_params for label, (_, query_params) in manager.INDEXED_QUERIES.items()}
+    params.update({
+        'movimentações recentes': (now - timedelta(days=7),),
+        'vendas no período': ('SALE', now - timedelta(days=30)),
+        'reposições por produto': ('PURCHASE', now - timedelta(days=60)),
+        'histórico do produto': ('P000001',),
+        'ordens em aberto do produto': ('P000001',),
+    })
+
+    def run_queries():
+        times = {}
+        for label, (query, _) in manager.INDEXED_QUERIES.items():
+            try:
+                times[label] = best_time(lambda: manager.stock.execute_query(query, params[label]).fetchall())
+            except sqlite3.OperationalError:
+                # Tabela criada só por uma migração (ex.: StockStatus)
+                times[label] = None
+        return times
+
+    before = run_queries()
+    manager.migrate()
+    manager.stock.execute_query("ANALYZE")
+    after = run_queries()
+    full_scans = manager.check_query_plans()
+    assert not full_scans, f"Consultas sem índice: {full_scans}"
+
+    for label in before:
+        before_ms = f"{before[label] * 1000:,.1f} ms" if before[label] is not None else "sem a tabela"
+        print(f"{label}: {before_ms} -> {after[label] * 1000:,.1f} ms")
+
+
+def measure(operation):
+    """Retorna (segundos, pico de memória em MB) de uma execução."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    operation()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2 ** 20
+
+
+# ☆☆ Análise detalhada: filtro no pandas x filtro no SQL ☆☆
+def bench_detailed_analysis(rows=1000000, products=20000):
+    print(f"=== Análise detalhada ({rows:,} movimentações) ===")
+    manager = new_database("analysis.db")
+    now = datetime.now()
+    manager.product.execute_many(
+        "INSERT INTO Products (product_code, name, category) VALUES (?, ?, ?)",
+        [(f"P{i:06d}", "Produto", "Geral") for i in range(products)],
+    )
+    # Parte dos produtos fica sem movimentações recentes
+    fill_movements(manager, rows, products // 2, now)
+    sales_since = now - timedelta(days=30)
+    purchases_since = now - timedelta(days=60)
+
+    def pandas_path():
+        # Caminho antigo: carrega Movements inteira e filtra em memória
+        with manager.pool.connection() as conn:
+            movements_df = pd.read_sql_query("SELECT product_code, movement_category, timestamp FROM Movements", conn, parse_dates=['timestamp'])
+            products_df = pd.read_sql_query("SELECT product_code, name FROM Products", conn)
+        recent_sales = movements_df[(movements_df['movement_category'] == "SALE") & (movements_df['timestamp'] >= sales_since)]
+        products_df[~products_df['product_code'].isin(recent_sales['product_code'])]
+        recent_purchases = movements_df[(movements_df['movement_category'] == "PURCHASE") & (movements_df['timestamp'] >= purchases_since)]
+        purchase_counts = recent_purchases['product_code'].value_counts()
+        purchase_counts[purchase_counts >= 4]
+
+    def sql_path():
+        manager.get_unsold_products(sales_since)
+        manager.get_frequent_purchases(purchases_since, 4)
+
+    for label, operation in (("pandas", pandas_path), ("SQL", sql_path)):
+        elapsed, peak = measure(operation)
+        print(f"{label}: {elapsed * 1000:,.0f} ms, pico de memória {peak:,.1f} MB")
+
+
+# ☆☆ Classificação do estoque: itertuples x vetorizada ☆☆
+def bench_stock_classification(skus=1000000, seed=42):
+    print(f"=== Classificação do estoque ({skus:,} SKUs) ===")
+    rng = np.random.default_rng(seed)
+    min_stock = rng.integers(0, 50, skus)
+    stock_df = pd.DataFrame({
+        'product_code': [f"P{i:07d}" for i in range(skus)],
+        'real_stock': rng.integers(0, 300, skus),
+        'min_stock': min_stock,
+        'max_stock': min_stock + rng.integers(50, 250, skus),
+    })
+
+    def itertuples_path():
+        # Caminho antigo do filter_df: laço por linha e três varreduras com isin
+        filter = {'low_stock': [], 'regular_stock': [], 'over_stock': []}
+        for row in stock_df.itertuples():
+            if row.real_stock > row.max_stock:
+                filter['over_stock'].append(row.product_code)
+            elif row.real_stock <= row.min_stock:
+                filter['low_stock'].append(row.product_code)
+            else:
+                filter['regular_stock'].append(row.product_code)
+        return {status: stock_df[stock_df['product_code'].isin(codes)] for status, codes in filter.items()}
+
+    old = best_time(itertuples_path, repeat=1)
+    new = best_time(lambda: classify_stock(stock_df.copy()))
+    print(f"itertuples + isin: {old * 1000:,.0f} ms")
+    print(f"classify_stock:    {new * 1000:,.0f} ms ({old / new:.0f}x)")
+
+
+# ☆☆ Painel de estoque baixo: varredura do Stock x resumo StockStatus ☆☆
+def bench_stock_status(skus=500000, sales=2000, seed=42):
+    print(f"=== Painel de estoque baixo ({skus:,} SKUs) ===")
+    manager = new_database("stock_status.db")
+    rng = np.random.default_rng(seed)
+    # Cerca de 1% dos produtos abaixo do mínimo
+    real_stock = np.where(rng.random(skus) < 0.01, 5, 100)
+    manager.stock.execute_many(
+        "INSERT INTO Stock (product_code, name, real_stock, min_stock, max_stock, location) VALUES (?, ?, ?, ?, ?, ?)",
+        ((f"P{i:07d}", "Produto", int(real_stock[i]), 10, 500, 'LOC01') for i in range(skus)),
+    )
+
+    def full_scan():
+        with manager.pool.connection() as conn:
+            stock_df = pd.read_sql_query("SELECT product_code, name, real_stock, min_stock, max_stock FROM Stock", conn)
+        return classify_stock(stock_df)['low_stock']
+
+    scan = best_time(full_scan)
+    lookup = best_time(lambda: manager.stock_status.get_products('low_stock'))
+    print(f"Varredura + classify_stock: {scan * 1000:,.1f} ms")
+    print(f"StockStatus indexado:       {lookup * 1000:,.1f} ms ({scan / lookup:.0f}x)")
+
+    with redirect_stdout(io.StringIO()):
+        for i in range(sales):
+            manager.register_product_movement(f"P{i:07d}", 95, "SALE")
+    inconsistencies = manager.stock_status.check_consistency()
+    assert not inconsistencies, f"StockStatus divergente: {inconsistencies[:10]}"
+    print(f"StockStatus consistente após {sales} vendas.")
+
+
+# ☆☆ Análises pelos agregados ProductActivity x direto em Movements ☆☆
+def bench_product_activity(rows=1000000, products=2000):
+    print(f"=== Agregados por produto ({rows:,} movimentações) ===")
+    manager = new_database("activity.db")
+    now = datetime.now()
+    manager.product.execute_many(
+        "INSERT INTO Products (product_code, name, category) VALUES (?, ?, ?)",
+        [(f"P{i:06d}", "Produto", "Geral") for i in range(products)],
+    )
+    start = time.perf_counter()
+    # Cerca de 90 dias de histórico, com várias movimentações por produto e dia
+    fill_movements(manager, rows, products // 2, now, interval=8)
+    print(f"Carga com triggers: {rows / (time.perf_counter() - start):,.0f} movimentações/s")
+
+    # Janelas começando à meia-noite, para comparar com a granularidade diária
+    sales_since = (now - timedelta(days=30)).replace(hour=0, minute=0, second=0, microsecond=0)
+    purchases_since = (now - timedelta(days=60)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def movements_path():
+        # Caminho anterior: consultas direto em Movements
+        with manager.pool.connection() as conn:
+            unsold = pd.read_sql_query(
+                "SELECT p.product_code, p.name FROM Products p WHERE p.product_code NOT IN "
+                "(SELECT product_code FROM Movements WHERE movement_category = 'SALE' AND timestamp >= ? AND product_code IS NOT NULL)",
+                conn, params=(sales_since,))
+            frequent = pd.read_sql_query(
+                "SELECT product_code, COUNT(*) AS purchase_count FROM Movements WHERE movement_category = 'PURCHASE' AND timestamp >= ? "
+                "GROUP BY product_code HAVING COUNT(*) >= ? ORDER BY purchase_count DESC",
+                conn, params=(purchases_since, 4))
+        return unsold, frequent
+
+    def activity_path():
+        return manager.get_unsold_products(sales_since), manager.get_frequent_purchases(purchases_since, 4)
+
+    raw, aggregated = movements_path(), activity_path()
+    assert set(raw[0]['product_code']) == set(aggregated[0]['product_code'])
+    assert dict(zip(*raw[1].values.T)) == dict(zip(*aggregated[1].values.T))
+
+    before, after = best_time(movements_path), best_time(activity_path)
+    print(f"Movements:       {before * 1000:,.1f} ms")
+    print(f"ProductActivity: {after * 1000:,.1f} ms ({before / after:.1f}x)")
+
+
+# ☆☆ Consultas repetidas com e sem cache ☆☆
+def bench_lookup_cache(products=1000, lookups=100000, seed=42):
+    print(f"=== Cache de consultas ({lookups:,} consultas) ===")
+    manager = new_database("cache.db")
+    codes = [f"P{i:06d}" for i in range(products)]
+    manager.stock.execute_many(
+        "INSERT INTO Stock (product_code, name, real_stock, min_stock, max_stock, location) VALUES (?, ?, ?, ?, ?, ?)",
+        [(code, "Produto", 100, 10, 500, 'LOC01') for code in codes],
+    )
+    with redirect_stdout(io.StringIO()):
+        manager.user.add_user("Admin", 2)
+    rng = np.random.default_rng(seed)
+    picks = [codes[i] for i in rng.integers(0, products, lookups)]
+
+    def uncached():
+        for product_code in picks:
+            manager.stock.execute_query("SELECT location FROM Stock WHERE product_code = ?", (product_code,)).fetchone()
+            manager.stock.execute_query("SELECT privilege FROM Users WHERE id = ?", (1,)).fetchone()
+
+    def cached():
+        for product_code in picks:
+            manager.product.get_location(product_code)
+            manager.purchase_order.check_privilege(1, 2)
+
+    old, new = best_time(uncached, repeat=1), best_time(cached, repeat=1)
+    print(f"Sem cache: {2 * lookups / old:,.0f} consultas/s")
+    print(f"Com cache: {2 * lookups / new:,.0f} consultas/s ({old / new:.1f}x)")
+    print(f"Métricas do cache: {manager.cache.metrics()}")
+
+
+# ☆☆ Exportação em blocos para CSV e Parquet ☆☆
+def bench_export(sizes=(200000, 1000000)):
+    print("=== Exportação em blocos ===")
+    for rows in sizes:
+        manager = new_database(f"export_{rows}.db")
+        fill_movements(manager, rows, 1000, datetime.now())
+        folder = os.path.dirname(manager.db_path)
+        formats = [("CSV", manager.exporter.export_csv, "movements.csv")]
+        try:
+            import pyarrow  # noqa: F401
+            formats.append(("Parquet", manager.exporter.export_parquet, "movements.parquet"))
+        except ImportError:
+            print("pyarrow não instalado; exportação Parquet ignorada.")
+        for label, export, file_name in formats:
+            elapsed, peak = measure(lambda: export('Movements', os.path.join(folder, file_name)))
+            print(f"{label}, {rows:,} linhas: {rows / elapsed:,.0f} linhas/s, pico de memória {peak:,.1f} MB")
+
+
+# ☆☆ Aprovação e finalização de ordens de compra em lote ☆☆
+def bench_purchase_orders(orders=10000, single_orders=1000, products=500):
+    print(f"=== Ordens de compra ({orders:,} ordens) ===")
+    manager = new_database("orders.db")
+    codes = [f"P{i:06d}" for i in range(products)]
+    with redirect_stdout(io.StringIO()):
+        manager.user.add_user("Admin", 2)
+    manager.stock.execute_many(
+        "INSERT INTO Stock (product_code, name, real_stock, min_stock, max_stock, location) VALUES (?, ?, ?, ?, ?, ?)",
+        [(code, "Produto", 10, 5, 500, 'LOC01') for code in codes],
+    )
+    manager.purchase_order.execute_many(
+        "INSERT INTO PurchaseOrders (product_code, name, purchase_quantity, order_date) VALUES (?, ?, ?, ?)",
+        [(codes[i % products], "Produto", 10, datetime.now()) for i in range(orders + single_orders)],
+    )
+    batch_ids = list(range(1, orders + 1))
+    single_ids = list(range(orders + 1, orders + single_orders + 1))
+
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for order_id in single_ids:
+            manager.purchase_order.approve_order(1, order_id)
+            manager.purchase_order.finalize_order(1, order_id)
+        single = single_orders / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        manager.purchase_order.approve_orders(1, batch_ids)
+        outcomes = manager.purchase_order.finalize_orders(1, batch_ids)
+        batch = orders / (time.perf_counter() - start)
+
+    assert all(outcome == "finalizada" for outcome in outcomes.values())
+    print(f"Uma ordem por chamada: {single:,.0f} ordens/s")
+    print(f"approve_orders + finalize_orders: {batch:,.0f} ordens/s ({batch / single:.0f}x)")
+
+
+def bench_reorder(skus=500000, low_every=20, products_with_open_orders=5000):
+    print(f"=== Reposição automática ({skus:,} SKUs) ===")
+    manager = new_database("reorder.db")
+    rng = np.random.default_rng(42)
+    real = rng.integers(21, 200, skus)
+    # Um em cada low_every produtos fica no mínimo (20) ou abaixo dele
+    real[::low_every] = rng.integers(0, 21, len(real[::low_every]))
+    codes = [f"P{i:07d}" for i in range(skus)]
+    manager.stock.execute_many(
+        "INSERT INTO Stock (product_code, name, real_stock, min_stock, regular_stock, max_stock, location) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(code, "Produto", int(stock), 20, 100, 200, 'LOC01') for code, stock in zip(codes, real)],
+    )
+    # Parte dos produtos em falta já tem ordens em aberto, que devem ser descontadas
+    open_codes = codes[::low_every][:products_with_open_orders]
+    manager.purchase_order.execute_many(
+        "INSERT INTO PurchaseOrders (product_code, name, purchase_quantity, order_date) VALUES (?, ?, ?, ?)",
+        [(code, "Produto", 50, datetime.now()) for code in open_codes],
+    )
+
+    with_open_orders = set(open_codes)
+    expected = {
+        code: 100 - int(stock) - (50 if code in with_open_orders else 0)
+        for code, stock in zip(codes[::low_every], real[::low_every])
+    }
+    expected = {code: quantity for code, quantity in expected.items() if quantity > 0}
+
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        orders = manager.purchase_order.create_reorders()
+        elapsed = time.perf_counter() - start
+        again = manager.purchase_order.create_reorders()
+
+    assert {code: quantity for _, code, quantity in orders} == expected
+    assert again == [], "a segunda execução não deve repetir ordens já em aberto"
+    print(f"{len(orders):,} ordens criadas em {elapsed:.2f} s")
+
+
+def bench_forecast(products=100000, days=730, density=0.1):
+    print(f"=== Previsão de demanda ({products:,} produtos × {days} dias) ===")
+    manager = new_database("forecast.db")
+    rng = np.random.default_rng(42)
+    codes = [f"P{i:06d}" for i in range(products)]
+    manager.stock.execute_many(
+        "INSERT INTO Stock (product_code, name, real_stock, min_stock, regular_stock, max_stock, location) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(code, "Produto", 50, 20, 100, 200, 'LOC01') for code in codes],
+    )
+
+    # Cada produto vende em uma fração diferente dos dias; o primeiro vende 5 unidades todo dia
+    end = datetime.now().date() + timedelta(days=1)
+    day_labels = [(end - timedelta(days=days - day)).isoformat() for day in range(days)]
+    selling = rng.random((days, products)) < rng.uniform(0, 2 * density, products)
+    selling[:, 0] = True
+    day_index, product_index = np.nonzero(selling)
+    quantities = rng.poisson(3, len(day_index)) + 1
+    quantities[product_index == 0] = 5
+    # Carga direta nos agregados diários; pelo trigger de Movements levaria muito mais tempo
+    manager.product_activity.execute_many(
+        "INSERT INTO ProductDailyActivity (product_code, day, sale_count, sale_quantity) VALUES (?, ?, 1, ?)",
+        zip([codes[i] for i in product_index], [day_labels[i] for i in day_index], quantities.tolist()),
+    )
+    print(f"{len(day_index):,} pares produto/dia com vendas")
+
+    start = time.perf_counter()
+    suggestions = manager.forecast.forecast(history_days=days, end=end)
+    seconds = time.perf_counter() - start
+    first = suggestions.iloc[0]
+    assert abs(first['forecast'] - 5) < 1e-3 and first['safety_stock'] < 1e-3
+    assert (first['suggested_min_stock'], first['suggested_regular_stock']) == (35, 105)
+    print(f"Previsão de todos os produtos: {seconds:.1f} s")
+
+
+def bench_startup(repeat=5):
+    print("=== Inicialização: consulta simples em um processo novo ===")
+    manager = new_database("startup.db")
+    with redirect_stdout(io.StringIO()):
+        manager.product.add_product('CAM-001', 'Camiseta', 'Vestuário')
+        manager.stock.add_stock('CAM-001', 'Camiseta', 30, 10, 50, 'VEST01')
+    workdir = os.path.dirname(manager.db_path)
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+
+    def run(*args):
+        return subprocess.run([sys.executable, *args], cwd=workdir, env=env, capture_output=True, text=True, check=True)
+
+    # python -X importtime: módulos carregados por 'import inventory' e os mais lentos
+    imports = []
+    for line in run('-X', 'importtime', '-c', 'import inventory').stderr.splitlines():
+        fields = line[len('import time:'):].split('|')
+        if line.startswith('import time:') and fields[1].strip().isdigit():
+            imports.append((int(fields[1]), fields[2].strip()))
+    loaded = {name for _, name in imports}
+    assert not loaded & {'pandas', 'numpy', 'dateutil'}, "a importação do pacote não deve carregar pandas/numpy/dateutil"
+    print(f"import inventory: {dict((name, us) for us, name in imports)['inventory'] / 1000:.1f} ms")
+    for us, name in sorted(imports, reverse=True)[1:6]:
+        print(f"  {name}: {us / 1000:.1f} ms")
+
+    # Mesma consulta, importando pandas e dateutil antes, como acontecia na importação do módulo
+    lookup = ['--db', manager.db_path, 'lookup', 'CAM-001']
+    eager = "import sys, pandas, dateutil.relativedelta; from inventory.__main__ import main; main(sys.argv[1:])"
+    lazy_time = best_time(lambda: run('-m', 'inventory', *lookup), repeat)
+    eager_time = best_time(lambda: run('-c', eager, *lookup), repeat)
+    print(f"python -m inventory lookup: {lazy_time * 1000:.0f} ms (com pandas/dateutil: {eager_time * 1000:.0f} ms)")
+
+
+def bench_service(clients=64, requests_per_client=200, products=1000):
+    print(f"=== Serviço asyncio ({clients} terminais, {clients * requests_per_client:,} pedidos) ===")
+    codes = [f"P{i:05d}" for i in range(products)]
+
+    async def terminal(service, rng, latencies):
+        # Cliente local simulando um terminal de loja: muitas consultas, algumas vendas e entradas
+        for _ in range(requests_per_client):
+            code = codes[rng.integers(products)]
+            kind = rng.random()
+            start = time.perf_counter()
+            if kind < 0.6:
+                await service.lookup(code)
+            elif kind < 0.9:
+                await service.sale(code, 1)
+            elif kind < 0.98:
+                await service.entry(code, 5)
+            else:
+                await service.order(code, "Produto", 10)
+            latencies.append(time.perf_counter() - start)
+
+    async def load_test(db_path, max_batch):
+        latencies = []
+        async with InventoryService(db_path, max_batch=max_batch) as service:
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                terminal(service, np.random.default_rng(seed), latencies) for seed in range(clients)
+            ))
+            elapsed = time.perf_counter() - start
+        return len(latencies) / elapsed, np.percentile(latencies, 99) * 1000, service.metrics()['average_batch']
+
+    for label, max_batch in (("Commit por escrita", 1), ("Group commit", 256)):
+        manager = new_database("service.db")
+        manager.stock.execute_many(
+            "INSERT INTO Stock (product_code, name, real_stock, min_stock, max_stock, location) VALUES (?, ?, ?, ?, ?, ?)",
+            [(code, "Produto", 10 ** 6, 10, 2 * 10 ** 6, 'LOC01') for code in codes],
+        )
+        with redirect_stdout(io.StringIO()):
+            rate, p99, batch = asyncio.run(load_test(manager.db_path, max_batch))
+        print(f"{label}: {rate:,.0f} pedidos/s, p99 {p99:.1f} ms, {batch:.1f} escritas por transação")
+
+
+def bench_movement_queue(threads=8, sales_per_thread=2000, products=100):
+    print(f"=== Fila de movimentações ({threads} threads, {threads * sales_per_thread:,} vendas) ===")
+    codes = [f"P{i:03d}" for i in range(products)]
+    for mode in MovementQueue.MODES:
+        manager = new_database("queue.db")
+        manager.stock.execute_many(
+            "INSERT INTO Stock (product_code, name, real_stock, min_stock, max_stock, location) VALUES (?, ?, ?, ?, ?, ?)",
+            [(code, "Produto", 10 ** 6, 10, 2 * 10 ** 6, 'LOC01') for code in codes],
+        )
+        movements = MovementQueue(manager, mode=mode)
+        sequence = itertools.count()
+
+        # Quem vende não espera o commit; o tempo inclui o fechamento da fila, que grava o restante
+        start = time.perf_counter()
+        run_concurrently(lambda: movements.submit(codes[next(sequence) % products], 1, "SALE"), threads, sales_per_thread)
+        movements.close()
+        elapsed = time.perf_counter() - start
+        total = manager.movement.execute_query("SELECT COUNT(*) FROM Movements").fetchone()[0]
+        assert total == threads * sales_per_thread
+        print(f"Modo '{mode}': {total / elapsed:,.0f} movimentações/s em {movements.stats['batches']:,} transações")
+
+
+def bench_report_runner(rows=1000000, products=50000, threads=4):
+    print(f"=== Relatórios em paralelo ({rows:,} movimentações, {products:,} produtos) ===")
+    manager = new_database("reports.db")
+    codes = [f"P{i:06d}" for i in range(products)]
+    manager.product.execute_many(
+        "INSERT INTO Products (product_code, name, category) VALUES (?, ?, ?)",
+        [(code, "Produto", "Geral") for code in codes],
+    )
+    manager.stock.execute_many(
+        "INSERT INTO Stock (product_code, name, real_stock, min_stock, max_stock, location) VALUES (?, ?, ?, ?, ?, ?)",
+        [(code, "Produto", i % 300, 20, 250, 'LOC01') for i, code in enumerate(codes)],
+    )
+    # Cerca de 35 dias de histórico, com os snapshots dos dias completos (os relatórios só leem)
+    fill_movements(manager, rows, products, datetime.now(), interval=3)
+    manager.snapshot.append()
+
+    def sequential():
+        with redirect_stdout(io.StringIO()):
+            manager.generate_weekly_report()
+            manager.perform_detailed_analysis()
+
+    runner = ReportRunner(manager, threads=threads)
+    with redirect_stdout(io.StringIO()):
+        results, timings = runner.print_report()
+    # As seções são as mesmas consultas do relatório sequencial
+    assert results['low_stock'].equals(manager.stock_status.get_products('low_stock'))
+    assert len(results['unsold_products']) == len(manager.get_unsold_products(datetime.now() - timedelta(days=30)))
+
+    before = best_time(sequential, repeat=1)
+    print(f"Sequencial (relatório + análise): {before * 1000:,.0f} ms")
+    for name, timing in timings.items():
+        if name != 'total':
+            print(f"  {name}: {timing['rows']:,} linhas, {timing['seconds'] * 1000:,.0f} ms")
+    total = timings['total']
+    print(f"ReportRunner com {runner.threads} threads ({os.cpu_count()} CPUs, {total['attempts']} tentativa(s)): "
+          f"{total['seconds'] * 1000:,.0f} ms")
+
+
+def bench_partitions(rows=2000000, products=5000, months=24):
+    print(f"=== Partições mensais de Movements ({rows:,} movimentações em {months} meses) ===")
+    manager = new_database("partitions.db")
+    now = datetime.now()
+    fill_movements(manager, rows, products, now, interval=months * 30 * 86400 // rows)
+    week_ago, month_ago = now - timedelta(days=7), now - timedelta(days=30)
+
+    def reports():
+        with manager.pool.connection() as conn:
+            recent = conn.execute(
+                f"SELECT * FROM {movement_source(conn, week_ago)} WHERE timestamp >= ?", (week_ago,)
+            ).fetchall()
+            sales = conn.execute(
+                f"SELECT product_code, COUNT(*) FROM {movement_source(conn, month_ago)} "
+                "WHERE movement_category = 'SALE' AND timestamp >= ? GROUP BY product_code", (month_ago,)
+            ).fetchall()
+        return len(recent), sorted(sales)
+
+    def inserts(count=20000):
+        movements = [(f"P{i % products:06d}", "Produto", "SALE", 1, 10, 9, now) for i in range(count)]
+        with manager.pool.transaction():
+            manager.movement.add_movements(movements)
+        return count
+
+    size = lambda: os.path.getsize(manager.db_path)
+    # Inserções antes dos relatórios, para que as duas medições de relatório vejam os mesmos dados
+    before_inserts = 20000 / best_time(inserts)
+    before_reports = best_time(reports)
+    expected = reports()
+
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        moved = manager.movement.archive(keep_months=2)
+        split = time.perf_counter() - start
+    after_reports = best_time(reports)
+    assert reports() == expected
+    after_inserts = 20000 / best_time(inserts)
+
+    # Desanexa a partição mais antiga e compacta o banco principal
+    before_size = size()
+    oldest = manager.movement.partitions()[0][0]
+    with redirect_stdout(io.StringIO()):
+        manager.movement.detach_partition(oldest, os.path.join(os.path.dirname(manager.db_path), f"movements_{oldest}.db"))
+    manager.pool.close_all()
+    manager.movement.compact()
+
+    print(f"Divisão em {len(moved)} partições: {split:.1f} s")
+    print(f"Relatórios de 7 e 30 dias: {before_reports * 1000:,.1f} ms -> {after_reports * 1000:,.1f} ms ({before_reports / after_reports:.1f}x)")
+    print(f"Inserção em lote: {before_inserts:,.0f} -> {after_inserts:,.0f} movimentações/s")
+    print(f"Banco principal: {before_size / 2 ** 20:,.0f} MB -> {size() / 2 ** 20:,.0f} MB após desanexar {oldest} e compactar")
+
+
+def table_sizes(conn, tables):
+    """Bytes ocupados pelas tabelas informadas e pelos seus índices, via dbstat."""
+    return conn.execute(f"""
+    SELECT SUM(pgsize) FROM dbstat
+    WHERE name IN (SELECT name FROM sqlite_schema WHERE tbl_name IN ({', '.join('?' * len(tables))}))
+    """, tables).fetchone()[0]
+
+
+# ☆☆ Movements compacta (IDs inteiros) x formato antigo ☆☆
+def bench_compact_schema(rows=10000000, products=5000, batch=100000):
+    print(f"=== Formato compacto de Movements ({rows:,} movimentações) ===")
+    folder = tempfile.mkdtemp()
+    legacy = InventoryManagerRefactored(os.path.join(folder, "legacy.db"))
+    # Banco no formato antigo: esquema até a migração 5
+    for entity in (legacy.user, legacy.product, legacy.stock, legacy.movement, legacy.purchase_order):
+        entity.create_table()
+    legacy.migrate(up_to=5)
+    codes = [f"P{i:06d}" for i in range(products)]
+    legacy.product.execute_many(
+        "INSERT INTO Products (product_code, name, category) VALUES (?, ?, ?)",
+        [(code, "Produto", "Geral") for code in codes],
+    )
+    legacy.stock.execute_many(
+        "INSERT INTO Stock (product_code, name, real_stock, min_stock, max_stock, location) VALUES (?, ?, ?, ?, ?, ?)",
+        [(code, "Produto", 100, 20, 250, 'LOC01') for code in codes],
+    )
+    now = datetime.now()
+    # Cerca de dois anos de histórico
+    fill_movements(legacy, rows, products, now, interval=max(730 * 86400 // rows, 1))
+
+    week_ago = now - timedelta(days=7)
+    queries = {
+        'relatório de 7 dias': ("SELECT * FROM Movements WHERE timestamp >= ?", (week_ago,)),
+        'histórico do produto': ("SELECT * FROM Movements WHERE product_code = ? ORDER BY timestamp", ('P000001',)),
+        'totais por categoria (varredura completa)': (
+            "SELECT movement_category, COUNT(*), SUM(moved_quantity) FROM Movements GROUP BY movement_category", None),
+    }
+
+    def run_queries(manager):
+        results = {label: sorted(manager.stock.execute_query(query, params)) for label, (query, params) in queries.items()}
+        times = {label: best_time(lambda: manager.stock.execute_query(query, params).fetchall())
+                 for label, (query, params) in queries.items()}
+        return results, times
+
+    def insert_rate(insert):
+        movements = [(codes[i % products], "Produto", "SALE", 1, 100, 99, now) for i in range(batch)]
+        return batch / best_time(lambda: insert(movements))
+
+    def legacy_insert(movements):
+        with legacy.pool.transaction():
+            legacy.movement.execute_many(
+                "INSERT INTO Movements (product_code, name, movement_category, moved_quantity, before_stock, after_stock, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", movements)
+
+    def compact_insert(movements):
+        with compact.pool.transaction():
+            compact.movement.add_movements(movements)
+
+    legacy_results, legacy_times = run_queries(legacy)
+    with legacy.pool.connection() as conn:
+        legacy_size = table_sizes(conn, ['Movements'])
+    legacy_file = os.path.getsize(legacy.db_path)
+    legacy.pool.close_all()
+    compact_path = os.path.join(folder, "compact.db")
+    shutil.copyfile(legacy.db_path, compact_path)
+    legacy_inserts = insert_rate(legacy_insert)
+
+    compact = InventoryManagerRefactored(compact_path)
+    start = time.perf_counter()
+    compact.migrate()
+    migration = time.perf_counter() - start
+    compact.pool.close_all()
+    compact.movement.compact()
+    with compact.pool.connection() as conn:
+        compact_size = table_sizes(conn, ['MovementLog', 'MovementCategories'])
+    compact_file = os.path.getsize(compact.db_path)
+    compact_results, compact_times = run_queries(compact)
+    assert compact_results == legacy_results, "a view Movements não devolve as mesmas linhas"
+    compact_inserts = insert_rate(compact_insert)
+
+    print(f"Migração para MovementLog: {migration:.1f} s")
+    print(f"Movements e índices: {legacy_size / 2 ** 20:,.0f} MB -> {compact_size / 2 ** 20:,.0f} MB "
+          f"({1 - compact_size / legacy_size:.0%} menor); arquivo: {legacy_file / 2 ** 20:,.0f} MB -> {compact_file / 2 ** 20:,.0f} MB")
+    print(f"Inserção em lote: {legacy_inserts:,.0f} -> {compact_inserts:,.0f} movimentações/s")
+    for label in queries:
+        print(f"{label}: {legacy_times[label] * 1000:,.1f} ms -> {compact_times[label] * 1000:,.1f} ms")
+
+
+# ☆☆ Custo da instrumentação ligada e desligada ☆☆
+def bench_instrumentation(sales=20000, calls=200000):
+    print(f"=== Instrumentação ({sales:,} vendas) ===")
+    manager = new_database("instrumentation.db")
+    manager.product.add_product('P000001', 'Produto', 'Geral')
+    manager.stock.add_stock('P000001', 'Produto', sales * 10, 10, sales * 20, 'LOC01')
+    entity = manager.stock
+    operation = 'InventoryManagerRefactored.register_product_movement'
+
+    def raw_query(query, params=None):
+        # Corpo de execute_query sem a verificação da instrumentação
+        try:
+            with entity.pool.connection() as conn:
+                cursor = conn.cursor()
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                if not entity.pool.in_transaction():
+                    conn.commit()
+                return cursor
+        except sqlite3.Error:
+            raise
+
+    def extra_cost(function, baseline, repeat=7):
+        # Execuções alternadas, o melhor tempo de cada lado
+        best = [float('inf'), float('inf')]
+        for _ in range(repeat):
+            for side, operation in enumerate((function, baseline)):
+                best[side] = min(best[side], best_time(lambda: [operation() for _ in range(calls)], repeat=1) / calls)
+        return best[0] - best[1]
+
+    def noop():
+        pass
+
+    # Custo fixo do caminho desligado: a verificação em execute_query e o wrapper das operações.
+    # Dentro de uma transação não há commit, cuja variação esconderia a diferença.
+    with entity.pool.transaction():
+        query_cost = extra_cost(lambda: entity.execute_query("SELECT 1"), lambda: raw_query("SELECT 1"))
+    wrapper_cost = extra_cost(instrumented(noop), noop)
+
+    def run_sales(sale, count=sales // 4):
+        with redirect_stdout(io.StringIO()):
+            return best_time(lambda: [sale('P000001', 1, 'SALE') for _ in range(count)]) / count
+
+    unwrapped = InventoryManagerRefactored.register_product_movement.__wrapped__
+    raw_sale = run_sales(lambda *args: unwrapped(manager, *args))
+    disabled_sale = run_sales(manager.register_product_movement)
+    instrumentation.reset()
+    instrumentation.enable()
+    try:
+        enabled_sale = run_sales(manager.register_product_movement)
+        breakdown = instrumentation.breakdown(operation)
+        sale_count = instrumentation.snapshot()['operations'][operation]['count']
+    finally:
+        instrumentation.disable()
+        instrumentation.reset()
+
+    statements = sum(entry['calls'] for entry in breakdown) / sale_count
+    # Por venda: register_product_movement e apply_product_movement passam pelo wrapper
+    overhead = (2 * wrapper_cost + statements * max(query_cost, 0)) / disabled_sale
+    print(f"Desligada: {query_cost * 1e9:,.0f} ns por consulta, {wrapper_cost * 1e9:,.0f} ns por operação; "
+          f"{statements:.0f} consultas por venda -> {overhead:.2%} de {disabled_sale * 1e6:,.0f} µs")
+    print(f"Venda: {raw_sale * 1e6:,.0f} µs sem wrapper, {disabled_sale * 1e6:,.0f} µs desligada, "
+          f"{enabled_sale * 1e6:,.0f} µs ligada ({enabled_sale / disabled_sale - 1:+.1%})")
+    print("Tempo médio por venda (µs): conexão / execução / commit")
+    for entry in breakdown:
+        print(f"  {entry['connect'] / sale_count * 1000:7.1f} / {entry['execute'] / sale_count * 1000:7.1f} / "
+              f"{entry['commit'] / sale_count * 1000:7.1f}  {entry['statement'][:80]}")
+    assert overhead < 0.02, f"instrumentação desligada custa {overhead:.2%} por venda"
+
+
+# ☆☆ Logging síncrono x fila com thread própria ☆☆
+def bench_logging(movements=20000, repeat=3):
+    print(f"=== Logging ({movements:,} movimentações) ===")
+    folder = tempfile.mkdtemp()
+    manager = new_database("logging.db")
+    with redirect_stdout(io.StringIO()):
+        manager.product.add_product('P000001', 'Produto', 'Geral')
+    log_path = os.path.join(folder, "inventory_system.log")
+    root = logging.getLogger()
+
+    def basic_config():
+        # Configuração anterior: basicConfig com FileHandler, gravando na thread da operação
+        logging.basicConfig(filename=log_path, level=logging.INFO, format=LOG_FORMAT, force=True)
+
+    def silent():
+        stop_logging()
+        logging.basicConfig(level=logging.WARNING, handlers=[logging.NullHandler()], force=True)
+
+    setups = {
+        'sem log, silencioso (referência)': (silent, True),
+        'antes: basicConfig + print': (basic_config, False),
+        'fila + arquivo rotativo + print': (lambda: configure_logging(log_path, force=True), False),
+        'fila + arquivo rotativo, silencioso': (lambda: configure_logging(log_path, force=True), True),
+        'fila + JSON, silencioso': (lambda: configure_logging(log_path, structured=True, force=True), True),
+    }
+    results = {}
+    for label, (setup, quiet) in setups.items():
+        setup()
+        set_quiet(quiet)
+        best = best_drained = float('inf')
+        for _ in range(repeat):
+            # A saída vai para um arquivo de verdade, como um terminal redirecionado
+            with open(os.path.join(folder, "stdout.txt"), 'w') as stdout, redirect_stdout(stdout):
+                start = time.perf_counter()
+                with manager.pool.transaction():
+                    for _ in range(movements):
+                        manager.movement.add_movement('P000001', 'Produto', 'SALE', 1, 100, 99)
+                elapsed = time.perf_counter() - start
+                # Tempo até a thread de logging esvaziar a fila
+                stop_logging()
+                drained = time.perf_counter() - start
+            best, best_drained = min(best, elapsed), min(best_drained, drained)
+            setup()
+        results[label] = (best / movements, best_drained / movements)
+    silent()
+    root.handlers.clear()
+    set_quiet(False)
+
+    baseline = results['sem log, silencioso (referência)'][0]
+    for label, (per_op, drained) in results.items():
+        print(f"{label}: {per_op * 1e6:,.1f} µs por movimentação (+{(per_op - baseline) * 1e6:,.1f} µs), "
+              f"{drained * 1e6:,.1f} µs com a fila esvaziada")
+
+
+# ☆☆ Relatórios a partir dos snapshots diários x das movimentações ☆☆
+def bench_snapshots(rows=2000000, products=1000, days=365):
+    print(f"=== Snapshots diários ({rows:,} movimentações em {days} dias) ===")
+    manager = new_database("snapshots.db")
+    now = datetime.now()
+    fill_movements(manager, rows, products, now, interval=max(days * 86400 // rows, 1))
+    snapshot = manager.snapshot
+    today = now.date()
+    week_start, month_start = today - timedelta(days=6), today - timedelta(days=29)
+    tomorrow = today + timedelta(days=1)
+
+    backfill, _ = measure(snapshot.backfill)
+    # Um dia novo: apaga o snapshot de ontem e grava de novo
+    with manager.pool.transaction() as conn:
+        for table in ('DailyMovementTotals', 'DailyStockSnapshots', 'SnapshotDays'):
+            conn.execute(f"DELETE FROM {table} WHERE day >= ?", ((today - timedelta(days=1)).isoformat(),))
+    append, _ = measure(snapshot.append)
+
+    def raw_totals(start, end):
+        # Mesma agregação direto sobre as movimentações
+        return sorted(manager.stock.execute_query(
+            "SELECT product_code, movement_category, COUNT(*), SUM(moved_quantity) FROM AllMovements "
+            "WHERE timestamp >= ? AND timestamp < ? GROUP BY product_code, movement_category",
+            (start.isoformat(), end.isoformat())).fetchall())
+
+    def snapshot_totals(start, end):
+        frame = snapshot.period_report(start, end)
+        return sorted(zip(frame['product_code'], frame['movement_category'], frame['movement_count'].tolist(),
+                          frame['moved_quantity'].tolist()))
+
+    for start in (week_start, month_start, today - timedelta(days=400)):
+        assert snapshot_totals(start, tomorrow) == raw_totals(start, tomorrow), f"totais divergentes desde {start}"
+
+    def old_weekly():
+        with manager.pool.connection() as conn:
+            since = now - timedelta(days=7)
+            return manager.movement.read_dataframe(
+                "SELECT product_code, name, movement_category, moved_quantity, before_stock, after_stock, timestamp "
+                f"FROM {movement_source(conn, since)} WHERE timestamp >= ?", (since,))
+
+    def old_monthly():
+        return manager.movement.read_dataframe(
+            "SELECT product_code, movement_category, COUNT(*), SUM(moved_quantity) FROM Movements "
+            "WHERE timestamp >= ? GROUP BY product_code, movement_category", (month_start.isoformat(),))
+
+    def old_week_over_week():
+        return manager.movement.read_dataframe(
+            "SELECT product_code, movement_category, SUM(CASE WHEN timestamp >= ?1 THEN moved_quantity ELSE 0 END), "
+            "SUM(CASE WHEN timestamp < ?1 THEN moved_quantity ELSE 0 END) FROM Movements "
+            "WHERE timestamp >= ?2 GROUP BY product_code, movement_category",
+            ((tomorrow - timedelta(days=7)).isoformat(), (tomorrow - timedelta(days=14)).isoformat()))
+
+    cases = {
+        'relatório semanal': (old_weekly, lambda: snapshot.period_report(week_start, tomorrow)),
+        'relatório de 30 dias': (old_monthly, lambda: snapshot.period_report(month_start, tomorrow)),
+        'comparação semanal': (old_week_over_week, snapshot.week_over_week),
+    }
+    sizes = manager.stock.execute_query(
+        "SELECT (SELECT COUNT(*) FROM DailyMovementTotals), (SELECT COUNT(*) FROM DailyStockSnapshots)").fetchone()
+    print(f"Backfill: {backfill:.1f} s; um dia novo: {append * 1000:,.0f} ms; "
+          f"{sizes[0]:,} linhas de totais e {sizes[1]:,} de estoque")
+    for label, (old, new) in cases.items():
+        old_rows, new_rows = len(old()), len(new())
+        print(f"{label}: {best_time(old) * 1000:,.1f} ms ({old_rows:,} linhas) -> "
+              f"{best_time(new) * 1000:,.1f} ms ({new_rows:,} linhas)")
+
+    # Com o histórico antigo em partições mensais o backfill lê cada partição
+    with redirect_stdout(io.StringIO()):
+        manager.movement.archive(keep_months=2)
+    snapshot.backfill()
+    assert snapshot_totals(month_start, tomorrow) == raw_totals(month_start, tomorrow)
+    assert snapshot_totals(today - timedelta(days=400), tomorrow) == raw_totals(today - timedelta(days=400), tomorrow)
+
+
+# ☆☆ Agregados por categoria e localização em memória x GROUP BY no banco ☆☆
+def bench_rollups(products=1000000, categories=200, locations=2000, rows=500000, sales=1000, seed=42):
+    print(f"=== Agregados por categoria e localização ({products:,} produtos) ===")
+    manager = new_database("rollups.db")
+    rng = np.random.default_rng(seed)
+    category, location = rng.integers(0, categories, products), rng.integers(0, locations, products)
+    min_stock = rng.integers(0, 50, products)
+    # Estoque de pelo menos 10 unidades: todas as vendas do teste são aceitas
+    real_stock = rng.integers(10, 300, products)
+    unit_cost = rng.integers(100, 10000, products) / 100
+    manager.product.execute_many(
+        "INSERT INTO Products (product_code, name, category, unit_cost) VALUES (?, ?, ?, ?)",
+        ((f"P{i:06d}", "Produto", f"CAT{category[i]:03d}", float(unit_cost[i])) for i in range(products)),
+    )
+    manager.stock.execute_many(
+        "INSERT INTO Stock (product_code, name, real_stock, min_stock, max_stock, location) VALUES (?, ?, ?, ?, ?, ?)",
+        ((f"P{i:06d}", "Produto", int(real_stock[i]), int(min_stock[i]), int(min_stock[i]) + 200,
+          f"LOC{location[i]:04d}") for i in range(products)),
+    )
+    fill_movements(manager, rows, products, datetime.now(), interval=60 * 86400 // rows)
+    manager.snapshot.append()
+    engine = RollupEngine(manager)
+
+    def group_by(dimension):
+        # Mesmos indicadores calculados pelo banco a cada consulta
+        window = (datetime.now().date() - timedelta(days=engine.volume_days - 1)).isoformat()
+        return manager.stock.read_dataframe(f"""
+            SELECT {dimension}, COUNT(*) AS products, SUM(real_stock) AS units,
+                   SUM(real_stock * unit_cost) AS stock_value,
+                   SUM(real_stock <= min_stock AND real_stock <= max_stock) AS low_stock,
+                   SUM(real_stock > max_stock) AS over_stock,
+                   SUM(coalesce(v.movements, 0)) AS movements, SUM(coalesce(v.moved_quantity, 0)) AS moved_quantity
+            FROM Stock s
+            JOIN Products p ON p.product_code = s.product_code
+            LEFT JOIN (SELECT product_id, COUNT(*) AS movements, SUM(moved_quantity) AS moved_quantity
+                       FROM MovementLog WHERE timestamp >= ? GROUP BY product_id) v ON v.product_id = p.id
+            GROUP BY {dimension} ORDER BY {dimension}
+        """, (window,)).set_index(dimension)
+
+    def check(dimension):
+        expected, actual = group_by(dimension), engine.rollup(dimension).sort_index()
+        assert (expected.index == actual.index).all(), f"grupos divergentes por {dimension}"
+        for column in RollupEngine.COLUMNS:
+            assert np.allclose(expected[column], actual[column]), f"{column} divergente por {dimension}"
+
+    load = best_time(lambda: (engine.invalidate(), engine.rollup()), repeat=1)
+    check('category')
+    check('location')
+    cached = best_time(lambda: engine.rollup('location'))
+    fresh = best_time(lambda: (engine._rollups.clear(), engine.rollup('location')))
+    sql = best_time(lambda: group_by('location'), repeat=1)
+    print(f"Carga do retrato: {load:.2f} s")
+    print(f"GROUP BY no banco: {sql * 1000:,.0f} ms")
+    print(f"Agregado por localização: {fresh * 1000:,.1f} ms (recalculado), {cached * 1000:,.2f} ms (em cache)")
+
+    with redirect_stdout(io.StringIO()):
+        for i in rng.choice(products, sales, replace=False):
+            manager.register_product_movement(f"P{i:06d}", 10, "SALE")
+    refresh = best_time(lambda: engine.rollup('category'), repeat=1)
+    check('category')
+    check('location')
+    drill = best_time(lambda: engine.drill_down('CAT007'))
+    assert len(engine.drill_down('CAT007')) == int((category == 7).sum())
+    print(f"Após {sales} vendas: {refresh * 1000:,.0f} ms para atualizar e agregar "
+          f"({engine.stats['full_loads']} cargas completas, {engine.stats['refreshed_products']} produtos relidos)")
+    print(f"Drill-down de uma categoria: {drill * 1000:,.1f} ms")
+
+
+# ☆☆ Localizações: consultas por lista e mudança em lote x um produto por vez ☆☆
+def bench_locations(skus=500000, locations=5000, picks=200, relocations=2000, seed=42):
+    print(f"=== Localizações ({skus:,} SKUs em {locations:,} localizações) ===")
+    manager = new_database("locations.db")
+    rng = np.random.default_rng(seed)
+    location = rng.integers(0, locations, skus)
+    manager.stock.execute_many(
+        "INSERT INTO Stock (product_code, name, real_stock, min_stock, max_stock, location) VALUES (?, ?, ?, ?, ?, ?)",
+        ((f"P{i:07d}", "Produto", 100, 10, 500, f"LOC{location[i]:04d}") for i in range(skus)),
+    )
+    codes = [f"P{i:07d}" for i in rng.choice(skus, picks, replace=False)]
+    bins = [f"LOC{i:04d}" for i in rng.choice(locations, 20, replace=False)]
+
+    def one_query_per_product():
+        # Caminho antigo: uma consulta por produto da lista
+        return {code: manager.stock.execute_query("SELECT location FROM Stock WHERE product_code = ?",
+                                                  (code,)).fetchone()[0] for code in codes}
+
+    assert one_query_per_product() == manager.location.get_locations(codes)
+    single = best_time(one_query_per_product)
+    batch = best_time(lambda: manager.location.get_locations(codes))
+    picking = best_time(lambda: manager.location.picking_list(dict.fromkeys(codes, 1)))
+    print(f"Localização de {picks} SKUs: {single * 1000:,.1f} ms (uma consulta por SKU) -> "
+          f"{batch * 1000:,.2f} ms (uma consulta); lista de separação: {picking * 1000:,.2f} ms")
+
+    def bins_scan():
+        return [manager.location.bin_contents(bin_location) for bin_location in bins]
+
+    manager.stock.execute_query("DROP INDEX idx_stock_location")
+    scan = best_time(bins_scan, repeat=1)
+    manager.stock.execute_query(Location.SCHEMA[0])
+    indexed = best_time(bins_scan)
+    print(f"Conteúdo de {len(bins)} localizações: {scan * 1000:,.0f} ms (varredura) -> {indexed * 1000:,.1f} ms (índice)")
+
+    moved = [f"P{i:07d}" for i in rng.choice(skus, relocations, replace=False)]
+
+    def relocate_one_by_one(target):
+        # Uma transação por produto, como Moves.location_movement
+        for code in moved[:relocations // 10]:
+            with manager.pool.transaction():
+                manager.location.apply_relocations({code: target})
+                manager.movement.add_movement(code, "Produto", 'RE-LOCATION', 0, 100, 100)
+
+    with redirect_stdout(io.StringIO()):
+        one_by_one = measure(lambda: relocate_one_by_one("DOCA01"))[0] / (relocations // 10)
+        bulk = measure(lambda: manager.relocate_products(dict.fromkeys(moved, "DOCA02")))[0] / relocations
+    assert len(manager.location.bin_contents("DOCA02")) == relocations
+    logged = manager.movement.execute_query(
+        "SELECT COUNT(*) FROM Movements WHERE movement_category = 'RE-LOCATION'").fetchone()[0]
+    assert logged == relocations + relocations // 10
+    print(f"Mudança de localização: {1 / one_by_one:,.0f} SKUs/s (uma transação por SKU) -> "
+          f"{1 / bulk:,.0f} SKUs/s (lote de {relocations:,} em uma transação)")
+
+
+# ☆☆ Suíte de cenários sobre dados sintéticos ☆☆
+# Escalas da base gerada: produtos, usuários, ordens de compra, anos de histórico e movimentações por dia
+SCALES = {
+    'small': {'products': 1000, 'users': 10, 'orders': 2000, 'years': 1, 'movements_per_day': 500, 'operations': 1000},
+    'medium': {'products': 20000, 'users': 50, 'orders': 20000, 'years': 2, 'movements_per_day': 5000, 'operations': 5000},
+    'large': {'products': 100000, 'users': 200, 'orders': 100000, 'years': 3, 'movements_per_day': 20000, 'operations': 10000},
+}
+
+PRODUCT_CATEGORIES = {
+    'Vestuário': ('Camiseta', 'Calça', 'Jaqueta', 'Meia'),
+    'Eletrônicos': ('Processador', 'Teclado', 'Monitor', 'Cabo'),
+    'Eletrodomésticos': ('Lava-louças', 'Micro-ondas', 'Liquidificador'),
+    'Papelaria': ('Caneta', 'Caderno', 'Grampeador'),
+    'Casa': ('Caneca', 'Toalha', 'Travesseiro'),
+}
+
+
+def generate_dataset(manager, seed=42, products=1000, users=10, orders=2000, years=1, movements_per_day=500,
+                     end=None, chunk_size=100000):
+    """Preenche o banco com produtos, estoque, usuários, ordens de compra e anos de movimentações.
+
+    A mesma semente e a mesma data final (padrão: a meia-noite de hoje) geram sempre os mesmos
+    dados. As vendas se concentram em poucos produtos
+    (popularidade em lei de potência), e o estoque de cada produto é o saldo final das suas
+    movimentações, então Stock e Movements ficam consistentes. Retorna as contagens geradas.
+    """
+    rng = np.random.default_rng(seed)
+    end = end or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=365 * years)
+
+    # Produtos e usuários
+    category_names = list(PRODUCT_CATEGORIES)
+    product_categories = rng.integers(len(category_names), size=products)
+    codes = [f"P{i:06d}" for i in range(products)]
+    names = [f"{rng.choice(PRODUCT_CATEGORIES[category_names[category]])} {i}"
+             for i, category in enumerate(product_categories)]
+    manager.product.execute_many(
+        "INSERT INTO Products (product_code, name, category) VALUES (?, ?, ?)",
+        [(code, name, category_names[category]) for code, name, category in zip(codes, names, product_categories)],
+    )
+    privileges = rng.choice([0, 1, 2], size=users, p=[0.6, 0.3, 0.1])
+    privileges[0] = 2  # O usuário 1 é sempre gerente
+    manager.user.execute_many(
+        "INSERT INTO Users (name, privilege) VALUES (?, ?)",
+        [(f"Usuário {i + 1}", int(privilege)) for i, privilege in enumerate(privileges)],
+    )
+
+    # Movimentações: instantes uniformes no período, produtos por popularidade
+    count = int(365 * years * movements_per_day)
+    popularity = 1.0 / np.arange(1, products + 1) ** 0.8
+    product_index = rng.choice(products, size=count, p=popularity / popularity.sum())
+    offsets = np.sort(rng.integers(int((end - start).total_seconds()), size=count))
+    kinds = rng.choice(3, size=count, p=[0.7, 0.2, 0.1])  # SALE, ENTRY, PURCHASE
+    quantities = rng.geometric(0.4, size=count)
+    signed = np.where(kinds == 0, -quantities, quantities)
+
+    # Saldo de cada produto ao longo do tempo; o estoque inicial cobre o menor saldo atingido
+    order = np.lexsort((offsets, product_index))
+    balance = np.empty(count, dtype=np.int64)
+    group_start = np.searchsorted(product_index[order], np.arange(products))
+    cumulative = np.cumsum(signed[order])
+    starting_sum = np.where(group_start < count, cumulative[np.minimum(group_start, count - 1)] - signed[order][np.minimum(group_start, count - 1)], 0)
+    balance[order] = cumulative - np.repeat(starting_sum, np.diff(np.append(group_start, count)))
+    lowest = np.zeros(products, dtype=np.int64)
+    np.minimum.at(lowest, product_index, balance)
+    min_stock = rng.integers(5, 50, size=products)
+    max_stock = min_stock * rng.integers(3, 10, size=products)
+    initial_stock = -lowest + rng.integers(0, max_stock)
+    after_stock = initial_stock[product_index] + balance
+    final_stock = initial_stock + np.bincount(product_index, weights=signed, minlength=products).astype(np.int64)
+
+    locations = [f"{category[:4].upper()}{rng.integers(1, 20):02d}" for category in category_names]
+    manager.stock.execute_many(
+        "INSERT INTO Stock (product_code, name, real_stock, min_stock, regular_stock, max_stock, location) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(code, name, int(real), int(low), int((low + high) // 2), int(high), locations[category])
+         for code, name, real, low, high, category in zip(codes, names, final_stock, min_stock, max_stock, product_categories)],
+    )
+
+    product_ids = dict(manager.product.execute_query("SELECT product_code, id FROM Products").fetchall())
+    id_of = np.array([product_ids[code] for code in codes])
+    category_ids = np.array([MOVEMENT_CATEGORIES['SALE'], MOVEMENT_CATEGORIES['ENTRY'], MOVEMENT_CATEGORIES['PURCHASE']])
+    timestamps = np.char.replace(np.datetime_as_string(
+        np.datetime64(start, 's') + offsets.astype('timedelta64[s]'), unit='s'), 'T', ' ')
+    for first in range(0, count, chunk_size):
+        part = slice(first, first + chunk_size)
+        rows = zip(id_of[product_index[part]].tolist(), category_ids[kinds[part]].tolist(), quantities[part].tolist(),
+                   (after_stock[part] - signed[part]).tolist(), after_stock[part].tolist(), timestamps[part].tolist())
+        with manager.pool.transaction():
+            manager.movement.execute_many(
+                "INSERT INTO MovementLog (product_id, category_id, moved_quantity, before_stock, after_stock, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    # Ordens de compra: as mais antigas já finalizadas, as recentes ainda abertas
+    order_products = rng.choice(products, size=orders, p=popularity / popularity.sum())
+    order_offsets = np.sort(rng.integers(int((end - start).total_seconds()), size=orders))
+    order_dates = [(start + timedelta(seconds=int(offset))).strftime('%Y-%m-%d %H:%M:%S') for offset in order_offsets]
+    finished = np.arange(orders) < orders * 0.8
+    approved = finished | (rng.random(orders) < 0.5)
+    manager.purchase_order.execute_many(
+        "INSERT INTO PurchaseOrders (product_code, name, purchase_quantity, order_approved, order_finished, order_date) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [(codes[index], names[index], int(max_stock[index]), bool(is_approved), bool(is_finished), date)
+         for index, is_approved, is_finished, date in zip(order_products, approved, finished, order_dates)],
+    )
+    # A carga não passa pelo caminho de gravação que mantém os snapshots diários
+    manager.snapshot.append()
+    return {'products': products, 'users': users, 'orders': orders, 'movements': count,
+            'start': start.isoformat(sep=' '), 'end': end.isoformat(sep=' ')}
+
+
+def latency_stats(samples):
+    """Vazão e percentis de latência (em ms) de uma lista de durações em segundos."""
+    samples = np.array(samples)
+    return {
+        'count': len(samples),
+        'ops_per_sec': len(samples) / samples.sum(),
+        'p50_ms': float(np.percentile(samples, 50) * 1000),
+        'p95_ms': float(np.percentile(samples, 95) * 1000),
+        'p99_ms': float(np.percentile(samples, 99) * 1000),
+        'max_ms': float(samples.max() * 1000),
+    }
+
+
+def timed_calls(operation, arguments):
+    """Chama operation(*args) para cada item, sem a saída no console; retorna a duração de cada chamada."""
+    durations = []
+    with redirect_stdout(io.StringIO()):
+        for args in arguments:
+            start = time.perf_counter()
+            operation(*args)
+            durations.append(time.perf_counter() - start)
+    return durations
+
+
+def run_scenarios(manager, operations=1000, repeat=3, seed=42):
+    """Executa os cenários da suíte sobre um banco já gerado; retorna {cenário: métricas}."""
+    rng = np.random.default_rng(seed)
+    codes = [row[0] for row in manager.stock.execute_query("SELECT product_code FROM Stock ORDER BY product_code")]
+    # Os produtos mais populares, como nas movimentações geradas
+    popular = [codes[i] for i in rng.integers(0, max(len(codes) // 10, 1), size=operations)]
+    scenarios = {}
+
+    # As entradas vêm antes e repõem exatamente o que as vendas vão tirar, então nenhuma venda é rejeitada
+    scenarios['entry'] = latency_stats(timed_calls(manager.register_product_movement, [(code, 1, "ENTRY") for code in popular]))
+    scenarios['sale'] = latency_stats(timed_calls(manager.register_product_movement, [(code, 1, "SALE") for code in popular]))
+
+    # Ordens criadas e aprovadas para o cenário; finaliza metade uma a uma e a outra metade em lote
+    with redirect_stdout(io.StringIO()):
+        order_ids = [manager.purchase_order.create_order(code, "Produto", 10) for code in popular]
+        manager.purchase_order.approve_orders(1, order_ids)
+    half = len(order_ids) // 2
+    scenarios['finalize_order'] = latency_stats(timed_calls(manager.purchase_order.finalize_order, [(1, order_id) for order_id in order_ids[:half]]))
+    batch_time = sum(timed_calls(manager.purchase_order.finalize_orders, [(1, order_ids[half:])]))
+    scenarios['finalize_orders'] = {'count': len(order_ids) - half, 'ops_per_sec': (len(order_ids) - half) / batch_time,
+                                    'seconds': batch_time}
+
+    # Consultas de produtos sorteados entre todos, com o cache vazio no início
+    manager.cache.clear()
+    lookups = [(codes[i],) for i in rng.integers(0, len(codes), size=operations)]
+    scenarios['simple_report'] = latency_stats(timed_calls(manager.simple_report, lookups))
+
+    for name, report in (('generate_weekly_report', manager.generate_weekly_report),
+                         ('perform_detailed_analysis', manager.perform_detailed_analysis)):
+        durations = timed_calls(report, [()] * repeat)
+        scenarios[name] = {'count': repeat, 'seconds': min(durations), 'mean_seconds': sum(durations) / repeat}
+    return scenarios
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(scale='small', seed=42, db_path=None, output=None):
+    """Gera (ou reaproveita) a base sintética da escala, executa os cenários e grava o resultado em JSON."""
+    import json
+    import platform
+
+    config = SCALES[scale]
+    db_path = db_path or os.path.join(tempfile.mkdtemp(), f"suite_{scale}_{seed}.db")
+    reuse = os.path.exists(db_path)
+    manager = InventoryManagerRefactored(db_path)
+    manager.setup()
+    if reuse:
+        dataset = {'reused': db_path}
+    else:
+        start = time.perf_counter()
+        dataset = generate_dataset(manager, seed=seed, **{key: config[key] for key in
+                                                          ('products', 'users', 'orders', 'years', 'movements_per_day')})
+        dataset['generation_seconds'] = time.perf_counter() - start
+    dataset['db_bytes'] = os.path.getsize(db_path)
+
+    result = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'scale': scale,
+        'seed': seed,
+        'config': config,
+        'environment': {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                        'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'dataset': dataset,
+        'scenarios': run_scenarios(manager, operations=config['operations'], seed=seed),
+    }
+    output = output or f"benchmark_{scale}_{result['commit'] or 'local'}.json"
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(result, file, indent=2, ensure_ascii=False)
+
+    print(f"=== Suíte '{scale}' (semente {seed}, commit {result['commit']}) ===")
+    for name, metrics in result['scenarios'].items():
+        if 'p50_ms' in metrics:
+            print(f"{name}: {metrics['ops_per_sec']:,.0f} ops/s, p50 {metrics['p50_ms']:.2f} ms, p99 {metrics['p99_ms']:.2f} ms")
+        elif 'mean_seconds' in metrics:
+            print(f"{name}: {metrics['seconds'] * 1000:,.0f} ms")
+        else:
+            print(f"{name}: {metrics['ops_per_sec']:,.0f} ops/s")
+    print(f"Resultado gravado em {output}")
+    return result
+
+
+# Métricas comparadas entre dois resultados; True quando maior é melhor
+COMPARED_METRICS = {'ops_per_sec': True, 'p50_ms': False, 'p99_ms': False, 'seconds': False}
+
+
+def compare_results(old_path, new_path, threshold=0.25):
+    """Compara dois resultados da suíte; retorna as regressões acima de 'threshold' (fração)."""
+    import json
+
+    with open(old_path, encoding='utf-8') as file:
+        old = json.load(file)
+    with open(new_path, encoding='utf-8') as file:
+        new = json.load(file)
+    if (old['scale'], old['seed']) != (new['scale'], new['seed']):
+        print(f"Aviso: escalas ou sementes diferentes ({old['scale']}/{old['seed']} x {new['scale']}/{new['seed']}).")
+
+    print(f"=== {old.get('commit')} -> {new.get('commit')} ===")
+    regressions = []
+    for scenario, metrics in new['scenarios'].items():
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if metric not in metrics or metric not in old['scenarios'].get(scenario, {}):
+                continue
+            before, after = old['scenarios'][scenario][metric], metrics[metric]
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            flag = " REGRESSÃO" if worse > threshold else ""
+            print(f"{scenario}.{metric}: {before:,.2f} -> {after:,.2f} ({change:+.1%}){flag}")
+            if flag:
+                regressions.append((scenario, metric, before, after))
+    return regressions
+
+
+def run_micro_benchmarks():
+    bench_connection_pool()
+    bench_concurrent_sales()
+    bench_bulk_movements()
+    bench_indexes()
+    bench_detailed_analysis()
+    bench_stock_classification()
+    bench_stock_status()
+    bench_product_activity()
+    bench_lookup_cache()
+    bench_export()
+    bench_purchase_orders()
+    bench_reorder()
+    bench_forecast()
+    bench_startup()
+    bench_service()
+    bench_movement_queue()
+    bench_report_runner()
+    bench_partitions()
+    bench_compact_schema()
+    bench_instrumentation()
+    bench_logging()
+    bench_snapshots()
+    bench_rollups()
+    bench_locations()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python benchmark.py', description="Benchmarks do sistema de estoque.")
+    commands = parser.add_subparsers(dest='command')
+    suite = commands.add_parser('suite', help="gera uma base sintética e mede os cenários, gravando JSON")
+    suite.add_argument('--scale', choices=list(SCALES), default='small')
+    suite.add_argument('--seed', type=int, default=42)
+    suite.add_argument('--db', help="banco a reaproveitar ou criar (padrão: um novo em pasta temporária)")
+    suite.add_argument('--output', help="arquivo JSON do resultado (padrão: benchmark_ESCALA_COMMIT.json)")
+    compare = commands.add_parser('compare', help="compara dois resultados JSON da suíte")
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--threshold', type=float, default=0.25, help="piora tolerada, em fração (padrão: 0.25)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'suite':
+        run_suite(args.scale, args.seed, args.db, args.output)
+    elif args.command == 'compare':
+        return 1 if compare_results(args.old, args.new, args.threshold) else 0
+    else:
+        # Sem comando, os benchmarks de cada otimização
+        run_micro_benchmarks()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
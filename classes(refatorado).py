@@ -1,7 +1,8 @@
 import sqlite3
 from datetime import datetime
-import pandas as pd
-from dateutil.relativedelta import relativedelta
+
+from inventory import classify_stock
+# pandas and dateutil are imported only inside the reports that use them
 
 # ☆☆ Datetime adapting
     # Function to adapt datetime to SQLite compatible string format
@@ -18,19 +19,24 @@ sqlite3.register_converter("DATETIME", convert_datetime)
 
 
 class InventoryManager:
+    # Bump when create_tables changes, so existing databases get the new tables/indexes
+    SCHEMA_VERSION = 1
+
     def __init__(self, inventory_db):
         # Select database
         self.inventory_db = inventory_db
         self.create_tables()
         self.user_code = None
         self.privillege = 0
-        self.start()
 
 # ☆☆Create Users, Products, Stock, Movements and Purchase TABLEs☆☆  
     # **The registered product details(statics) are stored in a table, and the stock details(dynamics) are stored in another**
     def create_tables(self):
         with sqlite3.connect(self.inventory_db) as conn:
             cursor = conn.cursor()
+            # The schema is created only once; user_version marks the database as ready
+            if cursor.execute("PRAGMA user_version").fetchone()[0] >= self.SCHEMA_VERSION:
+                return
             # ---------Create Products Table---------
             create_user_table = """
             CREATE TABLE IF NOT EXISTS Users (
@@ -93,6 +99,16 @@ class InventoryManager:
             );
             """
             cursor.execute(create_purchase_table)
+            # ---------Create Indexes for reports and lookups---------
+            create_indexes = [
+                "CREATE INDEX IF NOT EXISTS idx_movements_timestamp ON Movements (timestamp)",
+                "CREATE INDEX IF NOT EXISTS idx_movements_category_timestamp ON Movements (movement_category, timestamp, product_code)",
+                "CREATE INDEX IF NOT EXISTS idx_movements_product_timestamp ON Movements (product_code, timestamp)",
+                "CREATE INDEX IF NOT EXISTS idx_purchase_status ON Purchase (order_approved, order_finished)",
+            ]
+            for create_index in create_indexes:
+                cursor.execute(create_index)
+            cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
             conn.commit()
         #  Start program
     def start(self):
@@ -252,6 +268,7 @@ class InventoryManager:
     def get_not_approved(self):
         # Check if the user is user or manager
         if self.privillege == 2 or self.privillege == 3:
+            import pandas as pd
             with sqlite3.connect(self.inventory_db) as conn:
                 query = "SELECT * FROM Purchase WHERE order_approved = 0"
                 not_approved_df = pd.read_sql_query(query, conn)
@@ -273,24 +290,19 @@ class InventoryManager:
             else:
                 with sqlite3.connect(self.inventory_db) as conn:
                     cursor = conn.cursor()
-                        # Get current stock
-                    result = self.get_real_stock(cursor, product_code)
-                        # If found in stock
+                        # Reduce stock only if there is enough, checking and updating in a single statement
+                    result = self.reduce_stock(cursor, product_code, sale_qnty)
+                        # If found in stock with enough quantity
                     if result:
-                        current_stock = result[0]
-                        # Check if there is enough stock to make the sale
-                        if current_stock >= sale_qnty:
-                            # Reduce sold quantity from current stock
-                            new_stock = current_stock - sale_qnty
-                                # Prepare update and log infos
-                            update_data = (new_stock, product_code)
-                            log_data = (product_code, result[1], 'SALE', sale_qnty, current_stock, new_stock)
-                                # Update Stock and create log in Movements
-                            self.update_stock(cursor, update_data, log_data)
-                            conn.commit()
-                            print(f"Foram vendidos {sale_qnty} pcs, do produto {product_code}, estoque atual = {new_stock} ")
-                        else:
-                            print(f'Estoque do produto {product_code} insuficiente.')
+                        new_stock, name = result
+                        current_stock = new_stock + sale_qnty
+                            # Create log in Movements, in the same transaction as the stock update
+                        log_data = (product_code, name, 'SALE', sale_qnty, current_stock, new_stock)
+                        self.log_movement(cursor, log_data)
+                        conn.commit()
+                        print(f"Foram vendidos {sale_qnty} pcs, do produto {product_code}, estoque atual = {new_stock} ")
+                    elif self.get_real_stock(cursor, product_code):
+                        print(f'Estoque do produto {product_code} insuficiente.')
                     else:
                         print(f"Produto {product_code} não encontrado no estoque")
         else:
@@ -377,7 +389,17 @@ class InventoryManager:
         # Update current stock to new stock, from product code
         sql = "UPDATE Stock SET real_stock = ? WHERE product_code = ?"
         cursor.execute(sql, new_stock)
+        InventoryManager.log_movement(cursor, logs)
 
+    @staticmethod
+    def reduce_stock(cursor, product_code, quantity):
+        # Reduce current stock only if it's enough, returning the new stock and name
+        sql = "UPDATE Stock SET real_stock = real_stock - ? WHERE product_code = ? AND real_stock >= ? RETURNING real_stock, name"
+        cursor.execute(sql, (quantity, product_code, quantity))
+        return cursor.fetchone()
+
+    @staticmethod
+    def log_movement(cursor, logs):
         # Register movement logs
         date = datetime.now()
         logs = logs + (date,)
@@ -401,13 +423,16 @@ class InventoryManager:
     def overall_report(self):
         # Check if it's user or manager
         if self.privillege == 2 or self.privillege == 3:
+            import pandas as pd
+            from dateutil.relativedelta import relativedelta
             with sqlite3.connect(self.inventory_db) as conn:
                 # Get stock informations
                 query = "SELECT * FROM Stock"
                 oa_df = pd.read_sql_query(query, conn)
-                # Get movement logs
-                query = "SELECT * FROM Movements"
-                moves_df = pd.read_sql_query(query, conn, parse_dates='timestamp')
+                # Get only the last seven days movement logs
+                seven_days_ago = datetime.now() - relativedelta(days=7)
+                query = "SELECT * FROM Movements WHERE timestamp >= ?"
+                moves_df = pd.read_sql_query(query, conn, params=(seven_days_ago,), parse_dates='timestamp')
             # Filter products from Stock that are with low/regular/over stock
             self.filter_df(oa_df)
             print("Segue o relatório semanal: ")
@@ -418,27 +443,20 @@ class InventoryManager:
 
     @staticmethod
     def filter_df(df):
-        filter = {'low_stock': [], 'regular_stock': [], 'over_stock': []}
-        for row in df.itertuples():
-                #  If current stock is higher than max stock, add to over stock list
-            if row.real_stock > row.max_stock:
-                filter['over_stock'].append(row.product_code)
-                # If current stock is lower than min stock, add to low stock list
-            elif row.real_stock <= row.min_stock:
-                filter['low_stock'].append(row.product_code)
-                # If current stock is not higher than max, nor lower than min, add to regular stock list
-            else:
-                filter['regular_stock'].append(row.product_code)
+        # Classify every product in one vectorized pass: over stock has priority over low stock
+        classify_stock(df)
 
         print('Segue os produtos que estão em baixo estoque:')
-        print(df[df['product_code'].isin(filter['low_stock'])])
+        print(df[df['status'] == 'low_stock'])
         print('Segue os produtos que estão com excesso de estoque:')
-        print(df[df['product_code'].isin(filter['over_stock'])])
+        print(df[df['status'] == 'over_stock'])
         print('Segue os produtos que estão com estoque regular:')
-        print(df[df['product_code'].isin(filter['regular_stock'])])
+        print(df[df['status'] == 'regular_stock'])
+        return df
         
     @staticmethod
     def last_moves(df):
+        from dateutil.relativedelta import relativedelta
         print(f'Segue abaixo a movimentação dos últimos sete dias:')
         seven_days_ago = datetime.now() - relativedelta(days=7)
         filtered_df = df[(df['timestamp'] >= seven_days_ago)]
@@ -452,14 +470,10 @@ class InventoryManager:
     def analized_report(self, sales_days=30, purchases_months=2, purchase_count=4):
         # Check if it's manager
         if self.privillege == 3:
-            # Get movements and products Tables
-            moves_df, products_df = self.get_movements_and_products_df()
-            # Get last sales and purchases for the specified periods, from the movements table
-            last_sales, last_purchases = self.filter_last_sales_and_purchases(moves_df, sales_days, purchases_months)
             # Filter the products that were not sold in the specified period
-            not_saled = self.not_saled_items(products_df, last_sales)
+            not_saled = self.not_saled_items(sales_days)
             # Filter the products that had more than n purchases in the specified period
-            purchases_more_than_x = self. filter_by_purchases_count(last_purchases, purchase_count)
+            purchases_more_than_x = self.filter_by_purchases_count(purchases_months, purchase_count)
 
             print("Segue a análise do estado do estoque: ")
             print(f'Produtos que não são vendidos há mais de {sales_days} dias.')
@@ -472,47 +486,41 @@ class InventoryManager:
             print('Acesso negado.')
         
         
-    def get_movements_and_products_df(self):
+    def not_saled_items(self, sales_days):
+        import pandas as pd
+        from dateutil.relativedelta import relativedelta
+        # Get the specified past date datetime (n days ago)
+        x_days_ago = datetime.now() - relativedelta(days=sales_days)
         with sqlite3.connect(self.inventory_db) as conn:
-            # Get movements table while converting dates into datetime, and turn into df
-            query = "SELECT * FROM Movements"
-            moves_df = pd.read_sql_query(query, conn, parse_dates='timestamp')
-            # Get products table and turn into df
-            query = "SELECT * FROM Products"
-            products_df = pd.read_sql_query(query, conn)
-        return moves_df, products_df
-    
-    def filter_last_sales_and_purchases(self, moves_df, sales_days, purchases_months):
+            # From the products table, get the products that have NO sale after the specified datetime
+            query = """
+            SELECT p.* FROM Products p
+            WHERE p.product_code NOT IN (
+                SELECT product_code FROM Movements
+                WHERE movement_category = 'SALE' AND timestamp >= ? AND product_code IS NOT NULL
+            )
+            """
+            return pd.read_sql_query(query, conn, params=(x_days_ago,))
+
+    def filter_by_purchases_count(self, purchases_months, count):
+        from dateutil.relativedelta import relativedelta
         # Get the specified past date datetime (n months ago)
         x_months_ago = datetime.now() - relativedelta(months=purchases_months)
-        # Get the specified past date datetime (n days ago)
-        x_days_ago = datetime.now() - relativedelta(days=sales_days)
-        # From the sales in moves df, filter the last n days rows
-        last_x_days_sales = self.filter_by_time_category(moves_df, 'SALE', x_days_ago)
-        # From the purchases in moves df, filter the last n months rows
-        last_x_months_purchases = self.filter_by_time_category(moves_df, 'PURCHASE', x_months_ago)
-        return last_x_days_sales, last_x_months_purchases
-    @staticmethod
-    def filter_by_time_category(df, operation, time):
-        # From a df, return a new df that matches the specified movement category and the period is after the specified datetime
-        df_filtered = df[(df['movement_category'] == operation) & (df['timestamp'] >= time)]
-        return df_filtered
-    @staticmethod
-    def not_saled_items(products_df, last_sales):
-        # From the products table, filter the products that are NOT in the provided last sales list
-        return products_df[~products_df['product_code'].isin(last_sales['product_code'])]
-    @staticmethod
-    def filter_by_purchases_count(last_purchases, count):
-        # From the last purchases log, create a new df that lists the count of how many times the same product code appears
-        filter_df = last_purchases.groupby('product_code').size().reset_index(name='count')
-        # From the df, filter products that had more than n counts, into a list
-        more_than_count_purchases = {}
-        for row in filter_df.itertuples():
-            if row.count >= count:
-                more_than_count_purchases[row.product_code] = row.count
-        return more_than_count_purchases
+        with sqlite3.connect(self.inventory_db) as conn:
+            cursor = conn.cursor()
+            # Count the purchases of each product after the specified datetime, keeping the ones with n or more
+            query = """
+            SELECT product_code, COUNT(*) FROM Movements
+            WHERE movement_category = 'PURCHASE' AND timestamp >= ?
+            GROUP BY product_code
+            HAVING COUNT(*) >= ?
+            """
+            cursor.execute(query, (x_months_ago, count))
+            return dict(cursor.fetchall())
     
-manage = InventoryManager('inventoring.db')
+if __name__ == "__main__":
+    manage = InventoryManager('inventoring.db')
+    manage.start()
 # manage.add_product('CAM-001', 'Camiseta', 'Vestuário', 10, 30, 50, 'VEST01')
 # manage.add_product('CAM-002', 'Camiseta', 'Vestuário', 10, 30, 50, 'VEST01')
 # manage.add_product('MAQ-001', 'Lava-louças', 'Eletrodomésticos', 2, 4, 10, 'ELET03')    
@@ -1,7 +1,9 @@
 import sqlite3
 from datetime import datetime
-import pandas as pd
-from dateutil.relativedelta import relativedelta
+
+from inventory import classify_stock
+
+# pandas and dateutil are imported only inside the reports that use them
 
 # Função para adaptar datetime para string no formato aceito pelo SQLite
 def adapt_datetime(dt):
@@ -123,35 +125,35 @@ class Moves:
         self.log_movements = "INSERT INTO Movements (product_code, movement_category, moved_quantity, before_change, after_change, timestamp) VALUES (?, ?, ?, ?, ?, ?)"   
           
         self.update_stock = "UPDATE Stock SET real_stock = ? WHERE product_code = ?"
+
+        self.reduce_stock = "UPDATE Stock SET real_stock = real_stock - ? WHERE product_code = ? AND real_stock >= ? RETURNING real_stock"
         
     # ☆☆☆ Product Sale (Reduce Stock) ☆☆☆
     def product_sale(self, product_code, sale_qnty):
         with sqlite3.connect('inventory.db') as conn:
             cursor = conn.cursor()
             
-            # Get current stock
-            cursor.execute("SELECT real_stock FROM Stock WHERE product_code = ?", (product_code,))
+            # Reduce stock only if there is enough to make the sale, in a single statement
+            cursor.execute(self.reduce_stock, (sale_qnty, product_code, sale_qnty))
             result = cursor.fetchone()
 
             if result:
-                current_stock = result[0]
-                # Check if there is enough stock to make the sale
-                if current_stock >= sale_qnty:
-                    new_stock = current_stock - sale_qnty
-                    #update stock table
-                    cursor.execute(self.update_stock, (new_stock, product_code))
-                    
-                    date = datetime.now()
-                    # insert into movement logs (refatorate? instance the execute code?)
-                    cursor.execute(self.log_movements, (product_code, 'SALE', sale_qnty, current_stock, new_stock, date))
-                    conn.commit()    
-                    #talvez consultar novamente a table?
-                    print(f"Foram vendidos {sale_qnty} pcs, do produto {product_code}, estoque atual = {new_stock} ")
-                else:
-                    print(f"Estoque do produto {product_code} insuficiente")
-            # If not found in stock
+                new_stock = result[0]
+                current_stock = new_stock + sale_qnty
+                
+                date = datetime.now()
+                # insert into movement logs, in the same transaction as the stock update
+                cursor.execute(self.log_movements, (product_code, 'SALE', sale_qnty, current_stock, new_stock, date))
+                conn.commit()    
+                print(f"Foram vendidos {sale_qnty} pcs, do produto {product_code}, estoque atual = {new_stock} ")
             else:
-                print(f"Produto {product_code} não encontrado no estoque")
+                # Check if the product exists, to tell why the sale failed
+                cursor.execute("SELECT real_stock FROM Stock WHERE product_code = ?", (product_code,))
+                if cursor.fetchone():
+                    print(f"Estoque do produto {product_code} insuficiente")
+                # If not found in stock
+                else:
+                    print(f"Produto {product_code} não encontrado no estoque")
                 
                 # ☆☆☆ Product Purchase (Add Stock)☆☆☆
     def stock_incrementing(self, product_code, purchase_qnty):
@@ -205,42 +207,27 @@ class Moves:
     
     @staticmethod # Return the df with last 5 moves from movement logs
     def last_moves(moves):
+        import pandas as pd
         with sqlite3.connect('inventory.db') as conn:
-            query = "SELECT * FROM Movements"
-            df = pd.read_sql_query(query, conn)
-            moves = []
-            for i in range(moves):
-                # check if df length is valid
-                if len(df) - i - 1 >= 0:
-                    moves.append(df.iloc[len(df) - i - 1])
-                
-            new_df = pd.DataFrame(moves)    
+            # Get only the last n moves, newest first
+            query = "SELECT * FROM Movements ORDER BY ID DESC LIMIT ?"
+            new_df = pd.read_sql_query(query, conn, params=(moves,))
         return new_df
             
     # ☆☆☆☆Show a overall report☆☆☆☆
     def overall_report(self):
+        import pandas as pd
         with sqlite3.connect('inventory.db') as conn:
             query = "SELECT * FROM Stock"
             df = pd.read_sql_query(query, conn)
             
-            # ------- can make function --------
-            # create empty lists and append the product code as it's evaluated
-            low_stock = []
-            over_stock = []
-            regular_stock = []
-            for row in df.itertuples():
-                if row.real_stock > row.max_stock:
-                    over_stock.append(row.product_code)
-                elif row.real_stock <= row.min_stock:
-                    low_stock.append(row.product_code)
-                else:
-                    regular_stock.append(row.product_code)
+            # classify every product in one vectorized pass (over stock has priority over low stock)
+            classify_stock(df)
                     
             print('Segue os produtos que estão em baixo estoque:')
-            # --another function--
-            print(df[df['product_code'].isin(low_stock)])
+            print(df[df['status'] == 'low_stock'])
             print('Segue os produtos que estão com excesso de estoque:')
-            print(df[df['product_code'].isin(over_stock)])
+            print(df[df['status'] == 'over_stock'])
             
             # ultimas movimentações (function?)
             last_moves = self.last_moves(5)
@@ -250,7 +237,7 @@ class Moves:
             
             # Estoque normal
             print('Segue os produtos que estão com estoque regular:')
-            print(df[df['product_code'].isin(regular_stock)])
+            print(df[df['status'] == 'regular_stock'])
     
         
     # ☆☆☆Search for especific product code (simple report)☆☆☆
@@ -262,29 +249,30 @@ def simple_report(product_code):
         print(f'O produto {stock[1]}: {stock[0]}, está na locação {stock[3]}, com {stock[2]} unidades em estoque.')
     # ☆☆Show detailed information about stock and tips☆☆
     
-def return_df_by_time_and_category(df, category, time):
-    new_df = df[(df['movement_category'] == category) & (df['timestamp'] >= time)]
-    return new_df
-    
 def return_last_sales_and_purchases():
+    import pandas as pd
+    from dateutil.relativedelta import relativedelta
     with sqlite3.connect('inventory.db') as conn:
-        query_moves = "SELECT * FROM Movements"
-        all_moves = pd.read_sql_query(query_moves, conn, parse_dates='timestamp')    
-        query_products = "SELECT * FROM Products"
-        all_products = pd.read_sql_query(query_products, conn)
         two_months_ago = datetime.now() - relativedelta(months=2)
         thirty_days_ago = datetime.now() - relativedelta(days=30)
-        fifteen_days_ago = datetime.now() - relativedelta(days=15)
-        last_thirty_days_sales = return_df_by_time_and_category(all_moves, 'SALE', thirty_days_ago)
-        last_two_months_purchases = return_df_by_time_and_category(all_moves, 'PURCHASE', two_months_ago)
+        # Products with no sale in the last thirty days, filtered by the database
+        query_not_saled = """
+        SELECT p.* FROM Products p
+        WHERE p.product_code NOT IN (
+            SELECT product_code FROM Movements
+            WHERE movement_category = 'SALE' AND timestamp >= ? AND product_code IS NOT NULL
+        )
+        """
+        not_saled = pd.read_sql_query(query_not_saled, conn, params=(thirty_days_ago,))
 
-        not_saled = all_products[~all_products['product_code'].isin(last_thirty_days_sales['product_code'])]
-        
-        count_df = last_two_months_purchases.groupby('product_code').size().reset_index(name='count')
-        recommend_add = {}
-        for row in count_df.itertuples():
-            if row.count > 3:
-                recommend_add[row.product_code] = row.count
+        # Products with more than 3 purchases in the last two months
+        query_purchases = """
+        SELECT product_code, COUNT(*) FROM Movements
+        WHERE movement_category = 'PURCHASE' AND timestamp >= ?
+        GROUP BY product_code
+        HAVING COUNT(*) > 3
+        """
+        recommend_add = dict(conn.execute(query_purchases, (two_months_ago,)).fetchall())
     return not_saled, recommend_add
     
             
@@ -319,4 +307,5 @@ def analized_report():
 # movimento.product_sale('CAM-001', 10)
 # movimento.location_movement('MAQ-001', 'NEW-LOQ')
 # movimento.overall_report()
-analized_report()
+if __name__ == "__main__":
+    analized_report()
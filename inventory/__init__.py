@@ -0,0 +1,47 @@
+"""Sistema de controle de estoque: produtos, estoque, movimentações, ordens de compra e relatórios."""
+from .core import (
+    STOCK_STATUSES,
+    BaseEntity,
+    ConnectionPool,
+    DailySnapshot,
+    DemandForecast,
+    InventoryManagerRefactored,
+    Location,
+    LookupCache,
+    Movement,
+    Product,
+    ProductActivity,
+    PurchaseOrder,
+    ReportExporter,
+    Stock,
+    StockStatus,
+    User,
+    classify_stock,
+    movement_source,
+)
+from .instrumentation import instrumentation
+from .logs import configure_logging, set_quiet
+
+__all__ = [
+    'STOCK_STATUSES',
+    'BaseEntity',
+    'ConnectionPool',
+    'DailySnapshot',
+    'DemandForecast',
+    'InventoryManagerRefactored',
+    'Location',
+    'LookupCache',
+    'Movement',
+    'Product',
+    'ProductActivity',
+    'PurchaseOrder',
+    'ReportExporter',
+    'Stock',
+    'StockStatus',
+    'User',
+    'classify_stock',
+    'configure_logging',
+    'instrumentation',
+    'movement_source',
+    'set_quiet',
+]
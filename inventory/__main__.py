@@ -0,0 +1,121 @@
+"""Ponto de entrada do sistema: python -m inventory [--db ARQUIVO] [comando]."""
+import argparse
+
+from .core import InventoryManagerRefactored
+from .instrumentation import instrumentation
+from .logs import configure_logging
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m inventory', description="Sistema de controle de estoque.")
+    parser.add_argument('--db', default='intei.db', help="arquivo do banco de dados (padrão: intei.db)")
+    parser.add_argument('--metrics', metavar='ARQUIVO',
+                        help="grava em JSON os tempos de cada operação e consulta do comando")
+    parser.add_argument('--quiet', action='store_true', help="não mostra as mensagens de confirmação das operações")
+    parser.add_argument('--json-log', action='store_true', help="grava o log com um objeto JSON por linha")
+    commands = parser.add_subparsers(dest='command')
+    lookup = commands.add_parser('lookup', help="mostra nome, localização e estoque atual de um produto")
+    lookup.add_argument('product_code')
+    locate = commands.add_parser('locate', help="mostra a localização de vários produtos em uma consulta")
+    locate.add_argument('product_codes', nargs='+')
+    bin_parser = commands.add_parser('bin', help="lista os produtos guardados em uma localização")
+    bin_parser.add_argument('location')
+    relocate = commands.add_parser('relocate', help="muda a localização de vários produtos em uma transação")
+    relocate.add_argument('moves', nargs='+', metavar='CÓDIGO=LOCALIZAÇÃO')
+    commands.add_parser('report', help="gera o relatório semanal")
+    commands.add_parser('analysis', help="gera a análise detalhada")
+    monthly = commands.add_parser('monthly', help="gera o relatório mensal a partir dos snapshots diários")
+    monthly.add_argument('--month', help="mês do relatório, no formato AAAA-MM (padrão: o mês atual)")
+    commands.add_parser('compare-weeks', help="compara os últimos 7 dias com os 7 anteriores")
+    snapshot = commands.add_parser('snapshot', help="grava os snapshots diários dos dias completos que faltam")
+    snapshot.add_argument('--backfill', action='store_true', help="refaz os snapshots de todo o histórico")
+    commands.add_parser('backfill-activity',
+                        help="reconstrói os agregados de vendas e reposições por produto a partir de todo o histórico")
+    rollup = commands.add_parser('rollup', help="agrega estoque, valor e volume movimentado por categoria ou localização")
+    rollup.add_argument('--by', choices=['category', 'location', 'both'], default='category',
+                        help="agrupamento (padrão: category)")
+    rollup.add_argument('--category', help="lista os produtos da categoria (drill-down)")
+    rollup.add_argument('--location', help="lista os produtos da localização (drill-down)")
+    reports = commands.add_parser('reports', help="gera relatório e análise em paralelo, com o tempo de cada seção")
+    reports.add_argument('--threads', type=int, help="número de threads (padrão: uma por seção, até o tamanho do pool)")
+    archive = commands.add_parser('archive', help="move os meses antigos de Movements para partições mensais")
+    archive.add_argument('--keep-months', type=int, default=2, help="meses mantidos em Movements (padrão: 2)")
+    detach = commands.add_parser('detach', help="move uma partição mensal para um arquivo de banco próprio")
+    detach.add_argument('month', help="mês da partição, no formato AAAA-MM")
+    detach.add_argument('archive_path')
+    attach = commands.add_parser('attach', help="traz de volta ao banco uma partição desanexada")
+    attach.add_argument('month', help="mês da partição, no formato AAAA-MM")
+    commands.add_parser('compact', help="recupera o espaço liberado pelas partições arquivadas")
+    args = parser.parse_args(argv)
+
+    configure_logging(structured=args.json_log, quiet=args.quiet or None)
+    manager = InventoryManagerRefactored(args.db)
+    manager.setup()
+    if args.metrics:
+        instrumentation.enable()
+    try:
+        run_command(manager, args)
+    finally:
+        if args.metrics:
+            instrumentation.dump(args.metrics)
+
+
+def run_command(manager, args):
+    if args.command == 'lookup':
+        manager.simple_report(args.product_code)
+    elif args.command == 'locate':
+        locations = manager.location.get_locations(args.product_codes)
+        for product_code in args.product_codes:
+            print(f"{product_code}: {locations.get(product_code, 'Localização não encontrada')}")
+    elif args.command == 'bin':
+        contents = manager.location.bin_contents(args.location)
+        for product_code, name, real_stock in contents:
+            print(f"{product_code}  {name}  {real_stock} unidades")
+        if not contents:
+            print(f"Nenhum produto na localização {args.location}.")
+    elif args.command == 'relocate':
+        manager.relocate_products(move.split('=', 1) for move in args.moves)
+    elif args.command == 'report':
+        manager.generate_weekly_report()
+    elif args.command == 'analysis':
+        manager.perform_detailed_analysis()
+    elif args.command == 'monthly':
+        manager.generate_monthly_report(args.month)
+    elif args.command == 'compare-weeks':
+        manager.compare_weeks()
+    elif args.command == 'snapshot':
+        if args.backfill:
+            manager.snapshot.backfill()
+            print("Snapshots diários refeitos a partir do histórico.")
+        else:
+            print(f"Snapshots diários gravados para {manager.snapshot.append()} dias.")
+    elif args.command == 'backfill-activity':
+        manager.product_activity.backfill()
+        print("Agregados de vendas e reposições reconstruídos a partir do histórico.")
+    elif args.command == 'rollup':
+        from .rollups import RollupEngine
+        engine = RollupEngine(manager)
+        if args.category or args.location:
+            print(engine.drill_down(args.category, args.location).to_string(index=False))
+        else:
+            print(engine.rollup(('category', 'location') if args.by == 'both' else args.by).to_string())
+    elif args.command == 'archive':
+        manager.movement.archive(args.keep_months)
+    elif args.command == 'detach':
+        manager.movement.detach_partition(args.month, args.archive_path)
+    elif args.command == 'attach':
+        manager.movement.attach_partition(args.month)
+    elif args.command == 'compact':
+        before, after = manager.movement.compact()
+        print(f"Banco compactado: {before / 2 ** 20:.1f} MB -> {after / 2 ** 20:.1f} MB.")
+    elif args.command == 'reports':
+        from .report_runner import ReportRunner
+        ReportRunner(manager, threads=args.threads).print_report()
+    else:
+        # Sem comando, gera relatórios/análises
+        manager.generate_weekly_report()
+        manager.perform_detailed_analysis()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2399 @@
+import csv
+import json
+from datetime import datetime
+import sqlite3
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from statistics import NormalDist
+from typing import Optional
+
+from .instrumentation import instrumentation, instrumented
+from .logs import notify
+
+# ☆☆ Datetime adapting
+    # Function to adapt datetime to SQLite compatible string format
+def adapt_datetime(dt):
+    return dt.strftime('%Y-%m-%d %H:%M:%S')
+
+    # Function to convert SQLite string to Python datetime
+def convert_datetime(s):
+    return datetime.strptime(s.decode('utf-8'), '%Y-%m-%d %H:%M:%S')
+
+    # Register adapter and converter
+sqlite3.register_adapter(datetime, adapt_datetime)
+sqlite3.register_converter("DATETIME", convert_datetime)
+
+# pandas, numpy e dateutil só são importados nos relatórios e análises que os usam,
+# para que uma consulta simples não pague o custo de importá-los.
+
+
+# ☆☆ Stock health classification
+    # Ordem das categorias: estoque baixo, regular e excesso
+STOCK_STATUSES = ['low_stock', 'regular_stock', 'over_stock']
+
+
+def stock_status_codes(real_stock, min_stock, max_stock):
+    """Índice em STOCK_STATUSES da situação de cada produto, para arrays de estoque."""
+    import numpy as np
+
+    return np.where(real_stock > max_stock, 2, np.where(real_stock <= min_stock, 0, 1))
+
+
+def classify_stock(stock_df):
+    """Classifica o estoque em uma única passada vetorizada.
+
+    Acrescenta a coluna categórica 'status' (excesso tem prioridade sobre estoque baixo)
+    e retorna {status: DataFrame} com todas as categorias, mesmo as vazias.
+    """
+    import pandas as pd
+
+    codes = stock_status_codes(stock_df['real_stock'], stock_df['min_stock'], stock_df['max_stock'])
+    stock_df['status'] = pd.Categorical.from_codes(codes, categories=STOCK_STATUSES)
+    return {status: stock_df[codes == code] for code, status in enumerate(STOCK_STATUSES)}
+
+
+class ConnectionPool:
+    """Pool de conexões SQLite de longa duração compartilhado pelas entidades de um banco.
+
+    Enquanto uma thread estiver com uma conexão emprestada, qualquer novo empréstimo
+    na mesma thread reutiliza essa conexão, permitindo que várias operações façam
+    parte da mesma transação.
+    """
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    # Aplicados uma única vez, quando a conexão é aberta
+    PRAGMAS = (
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA cache_size = -16000",
+    )
+
+    def __init__(self, db_path: str, size: int = 5, timeout: float = 5.0, health_check_interval: float = 30.0):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._open = 0
+        self.stats = {'hits': 0, 'misses': 0, 'waits': 0, 'wait_time': 0.0, 'health_failures': 0}
+
+    @classmethod
+    def get(cls, db_path: str, size: Optional[int] = None, **kwargs):
+        """Retorna o pool compartilhado do banco, criando-o no primeiro uso.
+
+        Se o pool já existe, ele cresce quando 'size' pede mais conexões do que ele tem; um
+        timeout ou intervalo de verificação diferente do configurado gera ValueError.
+        """
+        with cls._pools_lock:
+            pool = cls._pools.get(db_path)
+            if pool is None:
+                if size is not None:
+                    kwargs['size'] = size
+                pool = cls._pools[db_path] = cls(db_path, **kwargs)
+                return pool
+        conflicts = {name: value for name, value in kwargs.items() if getattr(pool, name) != value}
+        if conflicts:
+            current = {name: getattr(pool, name) for name in conflicts}
+            raise ValueError(f"O pool de '{db_path}' já existe com {current}; pedido: {conflicts}.")
+        if size is not None and size > pool.size:
+            pool.grow(size)
+        return pool
+
+    def grow(self, size: int):
+        """Aumenta o número máximo de conexões; quem espera por uma conexão é acordado."""
+        with self._cond:
+            if size > self.size:
+                logging.info(f"Pool de '{self.db_path}' ampliado de {self.size} para {size} conexões.")
+                self.size = size
+                self._cond.notify_all()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _acquire(self):
+        with self._cond:
+            start = time.perf_counter()
+            waited = False
+            while not self._idle and self._open >= self.size:
+                waited = True
+                remaining = self.timeout - (time.perf_counter() - start)
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise sqlite3.OperationalError("Tempo esgotado aguardando uma conexão livre no pool.")
+            if waited:
+                self.stats['waits'] += 1
+                self.stats['wait_time'] += time.perf_counter() - start
+            if self._idle:
+                conn, last_used = self._idle.pop()
+                self.stats['hits'] += 1
+            else:
+                conn, last_used = None, None
+                self._open += 1
+                self.stats['misses'] += 1
+
+        # Conexões paradas há muito tempo são verificadas antes de voltar ao uso
+        if conn is not None and time.monotonic() - last_used > self.health_check_interval:
+            if not self._is_healthy(conn):
+                logging.warning(f"Conexão inválida descartada do pool de '{self.db_path}'.")
+                self.stats['health_failures'] += 1
+                conn.close()
+                conn = None
+        if conn is None:
+            try:
+                conn = self._connect()
+            except sqlite3.Error:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+        return conn
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Empresta a conexão da thread atual (ou uma conexão livre do pool)."""
+        local = self._local
+        conn = getattr(local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._acquire()
+        local.conn, local.tx_depth = conn, 0
+        try:
+            yield conn
+        finally:
+            local.conn = None
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Executa o bloco em uma única transação; transações aninhadas fazem parte da externa."""
+        start = time.perf_counter()
+        with self.connection() as conn:
+            local = self._local
+            if local.tx_depth:
+                local.tx_depth += 1
+                try:
+                    yield conn
+                finally:
+                    local.tx_depth -= 1
+                return
+
+            if instrumentation.enabled:
+                # A espera pelo lock de escrita aparece como execução do BEGIN
+                connected = time.perf_counter()
+                conn.execute("BEGIN IMMEDIATE")
+                instrumentation.record_statement("BEGIN IMMEDIATE", connected - start, time.perf_counter() - connected)
+            else:
+                conn.execute("BEGIN IMMEDIATE")
+            local.tx_depth, local.after_commit = 1, []
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                if instrumentation.enabled:
+                    committing = time.perf_counter()
+                    conn.commit()
+                    instrumentation.record_statement("COMMIT", 0.0, 0.0, time.perf_counter() - committing)
+                else:
+                    conn.commit()
+            finally:
+                local.tx_depth = 0
+                callbacks, local.after_commit = local.after_commit, []
+            # Só chega aqui depois do commit; com rollback as funções são descartadas
+            for callback in callbacks:
+                callback()
+
+    @contextmanager
+    def read_transaction(self):
+        """Transação de leitura, sem o lock de escrita: as consultas do bloco leem o mesmo snapshot (WAL).
+
+        Dentro de uma transação já aberta na thread, faz parte dela.
+        """
+        with self.connection() as conn:
+            local = self._local
+            if local.tx_depth:
+                yield conn
+                return
+            conn.execute("BEGIN")
+            local.tx_depth, local.after_commit = 1, []
+            try:
+                yield conn
+            finally:
+                local.tx_depth, local.after_commit = 0, []
+                conn.rollback()
+
+    def in_transaction(self):
+        return bool(getattr(self._local, 'tx_depth', 0))
+
+    def after_commit(self, callback):
+        """Executa callback() depois do commit da transação corrente da thread; fora de uma transação, já."""
+        if self.in_transaction():
+            self._local.after_commit.append(callback)
+        else:
+            callback()
+
+    def run_transaction(self, operation, retries: int = 5, backoff: float = 0.01):
+        """Executa operation(conn) em uma transação, repetindo-a enquanto o banco estiver ocupado."""
+        for attempt in range(retries + 1):
+            try:
+                with self.transaction() as conn:
+                    return operation(conn)
+            except sqlite3.OperationalError as e:
+                busy = "locked" in str(e) or "busy" in str(e)
+                # Dentro de uma transação externa a repetição fica a cargo de quem a abriu
+                if not busy or attempt == retries or self.in_transaction():
+                    raise
+                logging.warning(f"Banco ocupado, repetindo transação (tentativa {attempt + 1}).")
+                time.sleep(backoff * 2 ** attempt)
+
+    def metrics(self):
+        """Retorna um retrato das métricas do pool."""
+        with self._cond:
+            metrics = dict(self.stats)
+            metrics['open'] = self._open
+            metrics['idle'] = len(self._idle)
+        return metrics
+
+    def close_all(self):
+        """Fecha as conexões livres do pool."""
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                conn.close()
+                self._open -= 1
+
+
+class LookupCache:
+    """Cache em memória (LRU com expiração) para consultas que mudam pouco: produtos, estoque e usuários.
+
+    As entidades invalidam as chaves afetadas depois do commit de cada gravação nas tabelas
+    correspondentes, e um valor lido enquanto uma invalidação acontecia não é guardado; o TTL
+    limita o tempo em que uma alteração feita por fora delas pode ficar invisível.
+    """
+    _caches = {}
+    _caches_lock = threading.Lock()
+    _missing = object()
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Muda a cada invalidação: um valor lido antes dela não é guardado
+        self._generation = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    @classmethod
+    def get(cls, db_path: str, **kwargs):
+        """Retorna o cache compartilhado do banco, criando-o no primeiro uso."""
+        with cls._caches_lock:
+            cache = cls._caches.get(db_path)
+            if cache is None:
+                cache = cls._caches[db_path] = cls(**kwargs)
+            return cache
+
+    def get_or_load(self, key, loader):
+        """Retorna o valor em cache ou executa loader() e guarda o resultado (inclusive None)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, self._missing)
+            if entry is not self._missing:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return value
+                del self._entries[key]
+                self.stats['expirations'] += 1
+            self.stats['misses'] += 1
+            generation = self._generation
+
+        value = loader()
+        with self._lock:
+            if generation != self._generation:
+                # Uma gravação foi confirmada durante a leitura; o valor lido pode ser o anterior
+                return value
+            self._entries[key] = (value, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return value
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._entries.pop(key, self._missing) is not self._missing:
+                    self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        """Retorna um retrato dos contadores do cache."""
+        with self._lock:
+            metrics = dict(self.stats)
+            metrics['size'] = len(self._entries)
+        return metrics
+
+
+class BaseEntity:
+    def __init__(self, db_path: str, pool: Optional[ConnectionPool] = None):
+        self.db_path = db_path
+        self.pool = pool or ConnectionPool.get(db_path)
+        self.cache = LookupCache.get(db_path)
+
+    def cached(self, key, loader):
+        """Consulta pelo cache; dentro de uma transação lê direto, para ver as gravações ainda não confirmadas."""
+        if self.pool.in_transaction():
+            return loader()
+        return self.cache.get_or_load(key, loader)
+
+    def invalidate_after_commit(self, *keys):
+        """Invalida as chaves do cache depois do commit da gravação corrente.
+
+        Invalidar antes do commit deixaria uma leitura concorrente guardar no cache o valor anterior.
+        """
+        self.pool.after_commit(lambda: self.cache.invalidate(*keys))
+
+    def execute_query(self, query: str, params: Optional[tuple] = None):
+        """Executa uma consulta no banco de dados com tratamento de erros."""
+        if instrumentation.enabled:
+            return self._execute_instrumented(query, params)
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                # Dentro de uma transação o commit fica a cargo de quem a abriu
+                if not self.pool.in_transaction():
+                    conn.commit()
+                return cursor
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao executar consulta: {e}")
+            raise
+
+    def execute_many(self, query: str, params_seq):
+        """Executa a mesma consulta para cada conjunto de parâmetros, com um único commit."""
+        if instrumentation.enabled:
+            return self._execute_instrumented(query, params_seq, many=True)
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany(query, params_seq)
+                if not self.pool.in_transaction():
+                    conn.commit()
+                return cursor
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao executar consulta em lote: {e}")
+            raise
+
+    def _execute_instrumented(self, query: str, params, many: bool = False):
+        """execute_query/execute_many medindo a obtenção da conexão, a execução e o commit."""
+        start = time.perf_counter()
+        try:
+            with self.pool.connection() as conn:
+                connected = time.perf_counter()
+                cursor = conn.cursor()
+                if many:
+                    cursor.executemany(query, params)
+                elif params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                executed = time.perf_counter()
+                commit = None
+                if not self.pool.in_transaction():
+                    conn.commit()
+                    commit = time.perf_counter() - executed
+                instrumentation.record_statement(query, connected - start, executed - connected, commit,
+                                                 cursor.rowcount)
+                return cursor
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao executar consulta{' em lote' if many else ''}: {e}")
+            raise
+
+    def read_dataframe(self, query: str, params: Optional[tuple] = None):
+        """Lê o resultado da consulta em um DataFrame do pandas."""
+        import pandas as pd
+
+        if not instrumentation.enabled:
+            with self.pool.connection() as conn:
+                return pd.read_sql_query(query, conn, params=params)
+        start = time.perf_counter()
+        with self.pool.connection() as conn:
+            connected = time.perf_counter()
+            frame = pd.read_sql_query(query, conn, params=params)
+            instrumentation.record_statement(query, connected - start, time.perf_counter() - connected,
+                                             rows=len(frame))
+        return frame
+
+    def get_stock_levels(self, product_codes):
+        """Retorna {código: (estoque, nome)} dos produtos informados, consultando em blocos."""
+        product_codes = list(product_codes)
+        levels = {}
+        for start in range(0, len(product_codes), 500):
+            chunk = product_codes[start:start + 500]
+            query = f"SELECT product_code, real_stock, name FROM Stock WHERE product_code IN ({', '.join('?' * len(chunk))})"
+            for product_code, real_stock, name in self.execute_query(query, tuple(chunk)):
+                levels[product_code] = (real_stock, name)
+        return levels
+
+    def lookup_stock(self, product_code: str):
+        """Retorna (product_code, name, real_stock, location) do produto no estoque, passando pelo cache."""
+        query = "SELECT product_code, name, real_stock, location FROM Stock WHERE product_code = ?"
+        return self.cached(
+            ('stock', product_code), lambda: self.execute_query(query, (product_code,)).fetchone()
+        )
+
+
+class User(BaseEntity):
+    def create_table(self):
+        query = """
+        CREATE TABLE IF NOT EXISTS Users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name VARCHAR(30) NOT NULL,
+            privilege INTEGER NOT NULL DEFAULT 0
+        );
+        """
+        self.execute_query(query)
+        logging.info("Tabela 'Users' criada com sucesso.")
+
+    def add_user(self, name: str, privilege: int):
+        query = "INSERT INTO Users (name, privilege) VALUES (?, ?)"
+        cursor = self.execute_query(query, (name, privilege))
+        self.invalidate_after_commit(('user', cursor.lastrowid))
+        logging.info(f"Usuário '{name}' adicionado com privilégio {privilege}.")
+
+
+class Product(BaseEntity):
+    def create_table(self):
+        query = """
+        CREATE TABLE IF NOT EXISTS Products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_code VARCHAR(7) UNIQUE,
+            name VARCHAR(30) NOT NULL,
+            category VARCHAR(20) NOT NULL
+        );
+        """
+        self.execute_query(query)
+        logging.info("Tabela 'Products' criada com sucesso.")
+
+    def add_product(self, product_code: str, name: str, category: str):
+        # Um produto que já tinha ID por ter estoque (categoria vazia) é completado, não duplicado
+        query = """
+        INSERT INTO Products (product_code, name, category) VALUES (?, ?, ?)
+        ON CONFLICT (product_code) DO UPDATE SET name = excluded.name, category = excluded.category WHERE category = ''
+        """
+        if self.execute_query(query, (product_code, name, category)).rowcount == 0:
+            raise sqlite3.IntegrityError("UNIQUE constraint failed: Products.product_code")
+        self.invalidate_after_commit(('product', product_code))
+        logging.info(f"Produto '{name}' (código: {product_code}) adicionado.",
+                     extra={'event': 'product_added', 'product_code': product_code, 'category': category})
+        notify(f"Produto '{name}' (código: {product_code}) adicionado com sucesso.")
+
+    def set_unit_costs(self, costs):
+        """Atualiza o custo unitário dos produtos, a partir de {product_code: custo}."""
+        self.execute_many("UPDATE Products SET unit_cost = ? WHERE product_code = ?",
+                          [(cost, product_code) for product_code, cost in costs.items()])
+        logging.info(f"Custo unitário atualizado para {len(costs)} produtos.")
+
+    def get_product(self, product_code: str):
+        """Retorna (product_code, name, category) do produto cadastrado, passando pelo cache."""
+        query = "SELECT product_code, name, category FROM Products WHERE product_code = ?"
+        return self.cached(
+            ('product', product_code), lambda: self.execute_query(query, (product_code,)).fetchone()
+        )
+
+    def get_location(self, product_code: str):
+        """Consulta a localização atual do produto a partir do número do produto."""
+        result = self.lookup_stock(product_code)
+        if result:
+            return result[3]
+        return "Localização não encontrada"
+
+
+class Stock(BaseEntity):
+    def create_table(self):
+        query = """
+        CREATE TABLE IF NOT EXISTS Stock (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_code VARCHAR(7) UNIQUE,
+            name VARCHAR(30) NOT NULL,
+            real_stock INTEGER NOT NULL DEFAULT 0,
+            min_stock INTEGER NOT NULL,
+            max_stock INTEGER NOT NULL,
+            location VARCHAR(20) NOT NULL,
+            FOREIGN KEY (product_code) REFERENCES Products (product_code) ON DELETE CASCADE
+        );
+        """
+        self.execute_query(query)
+        logging.info("Tabela 'Stock' criada com sucesso.")
+
+    def add_stock(self, product_code: str, name: str, real_stock: int, min_stock: int, max_stock: int, location: str,
+                  regular_stock: Optional[int] = None):
+        """Registra o estoque do produto; sem regular_stock, o ponto de reposição fica no meio entre mínimo e máximo."""
+        if regular_stock is None:
+            regular_stock = (min_stock + max_stock) // 2
+        query = """
+        INSERT INTO Stock (product_code, name, real_stock, min_stock, regular_stock, max_stock, location)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """
+        self.execute_query(query, (product_code, name, real_stock, min_stock, regular_stock, max_stock, location))
+        self.invalidate_after_commit(('stock', product_code))
+        logging.info(f"Estoque do produto '{name}' (código: {product_code}) registrado.",
+                     extra={'event': 'stock_added', 'product_code': product_code, 'real_stock': real_stock,
+                            'location': location})
+        notify(f"Estoque do produto '{name}' (código: {product_code}) registrado com sucesso.")
+
+    def update_stock(self, product_code: str, quantity: int):
+        query = """
+        UPDATE Stock
+        SET real_stock = real_stock + ?
+        WHERE product_code = ?
+        """
+        self.execute_query(query, (quantity, product_code))
+        self.invalidate_after_commit(('stock', product_code))
+        logging.info(f"Estoque do produto com código {product_code} atualizado.",
+                     extra={'event': 'stock_updated', 'product_code': product_code, 'quantity': quantity})
+
+    def apply_movement(self, product_code: str, quantity: int):
+        """Soma quantity ao estoque em um único comando, sem permitir saldo negativo.
+
+        Retorna (nome, estoque atualizado) ou None se o produto não existir ou o saldo for insuficiente.
+        """
+        query = """
+        UPDATE Stock
+        SET real_stock = real_stock + ?
+        WHERE product_code = ? AND real_stock >= ?
+        RETURNING name, real_stock
+        """
+        rows = self.execute_query(query, (quantity, product_code, max(-quantity, 0))).fetchall()
+        self.invalidate_after_commit(('stock', product_code))
+        return rows[0] if rows else None
+
+    def get_real_stock(self, product_code: str):
+        """Retorna o estoque atual do produto, ou None se ele não estiver no estoque."""
+        result = self.lookup_stock(product_code)
+        return result[2] if result else None
+
+    def apply_deltas(self, deltas: dict):
+        """Soma a variação líquida de cada produto ao estoque em um único executemany."""
+        query = "UPDATE Stock SET real_stock = real_stock + ? WHERE product_code = ?"
+        self.execute_many(query, [(delta, product_code) for product_code, delta in deltas.items() if delta])
+        self.invalidate_after_commit(*[('stock', product_code) for product_code in deltas])
+        logging.info(f"Estoque de {len(deltas)} produtos atualizado em lote.")
+
+
+# Situação do estoque calculada no SQLite, com a mesma regra de classify_stock
+STOCK_STATUS_CASE = """
+    CASE WHEN {row}.real_stock > {row}.max_stock THEN 'over_stock'
+         WHEN {row}.real_stock <= {row}.min_stock THEN 'low_stock'
+         ELSE 'regular_stock' END"""
+
+
+class StockStatus(BaseEntity):
+    """Resumo materializado da situação de cada produto, mantido por triggers na tabela Stock."""
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS StockStatus (
+            product_code VARCHAR(7) PRIMARY KEY,
+            status VARCHAR(13) NOT NULL,
+            changed_at DATETIME
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_stock_status_status ON StockStatus (status)",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stock_status_insert AFTER INSERT ON Stock
+        BEGIN
+            INSERT OR REPLACE INTO StockStatus (product_code, status, changed_at)
+            VALUES (NEW.product_code, {STOCK_STATUS_CASE.format(row='NEW')}, datetime('now', 'localtime'));
+        END
+        """,
+        # Só reescreve o resumo quando a situação do produto muda de fato
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_stock_status_update AFTER UPDATE OF real_stock, min_stock, max_stock ON Stock
+        WHEN {STOCK_STATUS_CASE.format(row='NEW')} IS NOT {STOCK_STATUS_CASE.format(row='OLD')}
+        BEGIN
+            INSERT OR REPLACE INTO StockStatus (product_code, status, changed_at)
+            VALUES (NEW.product_code, {STOCK_STATUS_CASE.format(row='NEW')}, datetime('now', 'localtime'));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_stock_status_delete AFTER DELETE ON Stock
+        BEGIN
+            DELETE FROM StockStatus WHERE product_code = OLD.product_code;
+        END
+        """,
+    ]
+
+    # Mesma tabela sem rowid: a chave primária já é o código, e o índice automático sobre ele deixa de existir.
+    # Copia em vez de renomear, porque renomear reescreveria os triggers de Stock para o nome antigo.
+    WITHOUT_ROWID = [
+        "CREATE TABLE StockStatus_rowid AS SELECT product_code, status, changed_at FROM StockStatus",
+        "DROP TABLE StockStatus",
+        """
+        CREATE TABLE StockStatus (
+            product_code VARCHAR(7) PRIMARY KEY,
+            status VARCHAR(13) NOT NULL,
+            changed_at DATETIME
+        ) WITHOUT ROWID
+        """,
+        "INSERT INTO StockStatus SELECT product_code, status, changed_at FROM StockStatus_rowid",
+        "DROP TABLE StockStatus_rowid",
+        "CREATE INDEX IF NOT EXISTS idx_stock_status_status ON StockStatus (status)",
+    ]
+
+    def rebuild(self):
+        """Recalcula todo o resumo a partir da tabela Stock."""
+        with self.pool.transaction():
+            self.execute_query("DELETE FROM StockStatus")
+            self.execute_query(f"""
+            INSERT INTO StockStatus (product_code, status, changed_at)
+            SELECT product_code, {STOCK_STATUS_CASE.format(row='Stock')}, datetime('now', 'localtime')
+            FROM Stock
+            """)
+        logging.info("Tabela 'StockStatus' reconstruída.")
+
+    def find_inconsistencies(self):
+        """Compara o resumo com o cálculo ao vivo; retorna [(código, situação gravada, situação real)]."""
+        query = f"""
+        SELECT s.product_code, ss.status, {STOCK_STATUS_CASE.format(row='s')} AS expected
+        FROM Stock s
+        LEFT JOIN StockStatus ss ON ss.product_code = s.product_code
+        WHERE ss.status IS NOT expected
+        UNION ALL
+        SELECT ss.product_code, ss.status, NULL
+        FROM StockStatus ss
+        WHERE NOT EXISTS (SELECT 1 FROM Stock s WHERE s.product_code = ss.product_code)
+        """
+        return self.execute_query(query).fetchall()
+
+    def check_consistency(self):
+        """Confere o resumo e o reconstrói se houver divergências, que são retornadas."""
+        inconsistencies = self.find_inconsistencies()
+        if inconsistencies:
+            logging.warning(f"{len(inconsistencies)} divergências encontradas em 'StockStatus'.")
+            self.rebuild()
+        return inconsistencies
+
+    def get_products(self, status: str):
+        """Produtos em uma situação (low_stock, regular_stock ou over_stock), via índice."""
+        query = """
+        SELECT s.product_code, s.name, s.real_stock, s.min_stock, s.max_stock, ss.changed_at
+        FROM StockStatus ss
+        JOIN Stock s ON s.product_code = ss.product_code
+        WHERE ss.status = ?
+        """
+        return self.read_dataframe(query, (status,))
+
+
+class Location(BaseEntity):
+    """Consultas e mudanças de localização do estoque, para a separação de pedidos.
+
+    As consultas por lista recebem os códigos como um único parâmetro JSON lido com json_each:
+    uma consulta por lista, de qualquer tamanho, resolvida pelos índices de Stock.
+    """
+    # Conteúdo de uma localização, pelo índice idx_stock_location
+    SCHEMA = ["CREATE INDEX IF NOT EXISTS idx_stock_location ON Stock (location)"]
+
+    def bin_contents(self, location: str):
+        """Retorna [(product_code, name, real_stock)] dos produtos guardados na localização."""
+        query = "SELECT product_code, name, real_stock FROM Stock WHERE location = ? ORDER BY product_code"
+        return self.execute_query(query, (location,)).fetchall()
+
+    def bins_contents(self, locations):
+        """Retorna {localização: [(product_code, name, real_stock)]} das localizações informadas, em uma consulta."""
+        query = """
+        SELECT s.location, s.product_code, s.name, s.real_stock
+        FROM json_each(?) j
+        JOIN Stock s ON s.location = j.value
+        ORDER BY s.location, s.product_code
+        """
+        contents = {location: [] for location in locations}
+        for location, *product in self.execute_query(query, (json.dumps(list(contents)),)):
+            contents[location].append(tuple(product))
+        return contents
+
+    def get_locations(self, product_codes):
+        """Retorna {código: localização} dos produtos informados que estão no estoque, em uma consulta."""
+        query = """
+        SELECT s.product_code, s.location
+        FROM json_each(?) j
+        JOIN Stock s ON s.product_code = j.value
+        """
+        return dict(self.execute_query(query, (json.dumps(list(product_codes)),)).fetchall())
+
+    def picking_list(self, quantities: dict):
+        """Lista de separação de {código: quantidade}, em ordem de localização, em uma consulta.
+
+        Retorna [(location, product_code, name, quantidade pedida, real_stock)]; produtos fora do
+        estoque vêm no fim, com localização, nome e estoque None.
+        """
+        query = """
+        SELECT s.location, j.key, s.name, j.value, s.real_stock
+        FROM json_each(?) j
+        LEFT JOIN Stock s ON s.product_code = j.key
+        ORDER BY s.location IS NULL, s.location, j.key
+        """
+        return self.execute_query(query, (json.dumps(quantities),)).fetchall()
+
+    def apply_relocations(self, moves: dict):
+        """Muda a localização dos produtos de {código: nova localização} na transação corrente.
+
+        Retorna ([(código, nome, estoque, localização anterior, nova localização)] das mudanças feitas,
+        [códigos que já estavam na localização], [códigos fora do estoque]).
+        """
+        query = """
+        SELECT s.product_code, s.name, s.real_stock, s.location
+        FROM json_each(?) j
+        JOIN Stock s ON s.product_code = j.key
+        """
+        current = {row[0]: row for row in self.execute_query(query, (json.dumps(moves),))}
+        relocations = [(*current[product_code], location) for product_code, location in moves.items()
+                       if product_code in current and current[product_code][3] != location]
+        unchanged = [product_code for product_code in moves
+                     if product_code in current and current[product_code][3] == moves[product_code]]
+        not_found = [product_code for product_code in moves if product_code not in current]
+
+        self.execute_many("UPDATE Stock SET location = ? WHERE product_code = ?",
+                          [(new_location, product_code) for product_code, *_, new_location in relocations])
+        self.invalidate_after_commit(*[('stock', relocation[0]) for relocation in relocations])
+        return relocations, unchanged, not_found
+
+
+MOVEMENT_COLUMNS = "id, product_code, name, movement_category, moved_quantity, before_stock, after_stock, timestamp"
+# Colunas gravadas em MovementLog e nas partições: produto e categoria viram IDs inteiros
+MOVEMENT_LOG_COLUMNS = "id, product_id, category_id, moved_quantity, before_stock, after_stock, timestamp"
+# IDs fixos das categorias usadas pelo sistema; outras são cadastradas no primeiro uso
+MOVEMENT_CATEGORIES = {'SALE': 1, 'ENTRY': 2, 'PURCHASE': 3}
+# Mudança de localização: registrada como movimentação, mas sem quantidade movimentada
+RELOCATION_CATEGORY = 'RE-LOCATION'
+
+
+def movement_select(table: str):
+    """SELECT com as colunas de Movements sobre uma tabela compacta (MovementLog ou partição mensal)."""
+    return (
+        "SELECT m.id, p.product_code, p.name, c.name AS movement_category, m.moved_quantity, "
+        f"m.before_stock, m.after_stock, m.timestamp FROM {table} m "
+        "JOIN Products p ON p.id = m.product_id JOIN MovementCategories c ON c.id = m.category_id"
+    )
+
+
+def movement_tables(conn, start=None, end=None):
+    """Tabelas compactas com as movimentações do período [start, end): as partições anexadas que o cobrem e MovementLog."""
+    conditions, params = ["archive_path IS NULL"], []
+    if start is not None:
+        conditions.append("end > ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("start < ?")
+        params.append(end)
+    tables = [row[0] for row in conn.execute(
+        f"SELECT table_name FROM MovementPartitions WHERE {' AND '.join(conditions)} ORDER BY start", params
+    )]
+    return tables + ['MovementLog']
+
+
+def movement_source(conn, start=None, end=None):
+    """Origem das movimentações do período [start, end): Movements mais as partições que cobrem o período.
+
+    Sem partições no período, é a própria tabela Movements; as condições da consulta
+    externa são levadas pelo SQLite para dentro de cada parte do UNION ALL.
+    """
+    tables = movement_tables(conn, start, end)
+    if len(tables) == 1:
+        return "Movements"
+    return "(" + " UNION ALL ".join(movement_select(table) for table in tables) + ")"
+
+
+class Movement(BaseEntity):
+    def create_table(self):
+        query = """
+        CREATE TABLE IF NOT EXISTS Movements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_code VARCHAR(7),
+            name VARCHAR(30) NOT NULL,
+            movement_category VARCHAR(20),
+            moved_quantity INTEGER,
+            before_stock INTEGER,
+            after_stock INTEGER,
+            timestamp DATETIME,
+            FOREIGN KEY (product_code) REFERENCES Stock (product_code) ON DELETE CASCADE
+        );
+        """
+        self.execute_query(query)
+        logging.info("Tabela 'Movements' criada com sucesso.")
+
+    # Grava direto em MovementLog: o nome fica só em Products e a categoria vira um ID
+    INSERT_QUERY = """
+    INSERT INTO MovementLog (product_id, category_id, moved_quantity, before_stock, after_stock, timestamp)
+    VALUES ((SELECT id FROM Products WHERE product_code = ?), (SELECT id FROM MovementCategories WHERE name = ?), ?, ?, ?, ?)
+    """
+
+    def add_movement(self, product_code: str, name: str, category: str, quantity: int, before_stock: int, after_stock: int):
+        self.register_categories([category])
+        timestamp = datetime.now()
+        self.execute_query(self.INSERT_QUERY, (product_code, category, quantity, before_stock, after_stock, timestamp))
+        logging.info(f"Movimentação registrada: {quantity} unidades de '{name}' (código: {product_code}) movidas na categoria '{category}'.",
+                     extra={'event': 'movement', 'product_code': product_code, 'category': category,
+                            'quantity': quantity, 'before_stock': before_stock, 'after_stock': after_stock})
+        notify(f"Movimentação registrada: {quantity} unidades de '{name}' (código: {product_code}) movidas na categoria '{category}'.")
+
+    def add_movements(self, movements):
+        """Registra várias movimentações de uma vez.
+
+        Cada item é (product_code, name, category, quantity, before_stock, after_stock, timestamp);
+        o nome não é gravado, ele vem de Products.
+        """
+        self.register_categories({movement[2] for movement in movements})
+        self.execute_many(self.INSERT_QUERY, [(code, category, *rest) for code, _, category, *rest in movements])
+        logging.info(f"{len(movements)} movimentações registradas em lote.")
+
+    def register_categories(self, categories):
+        """Cadastra em MovementCategories as categorias que ainda não têm ID."""
+        new_categories = [(category,) for category in categories if category not in MOVEMENT_CATEGORIES]
+        if new_categories:
+            self.execute_many("INSERT OR IGNORE INTO MovementCategories (name) VALUES (?)", new_categories)
+
+    # ☆☆ Formato compacto ☆☆
+    # MovementLog guarda IDs inteiros de produto e categoria; Movements vira uma view com as
+    # colunas antigas, e inserções nela são convertidas por trigger.
+    LOG_SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS MovementCategories (
+            id INTEGER PRIMARY KEY,
+            name VARCHAR(20) NOT NULL UNIQUE
+        )
+        """,
+        "INSERT OR IGNORE INTO MovementCategories (id, name) VALUES "
+        + ", ".join(f"({category_id}, '{name}')" for name, category_id in MOVEMENT_CATEGORIES.items()),
+        """
+        CREATE TABLE IF NOT EXISTS MovementLog (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            moved_quantity INTEGER,
+            before_stock INTEGER,
+            after_stock INTEGER,
+            timestamp DATETIME,
+            FOREIGN KEY (product_id) REFERENCES Products (id) ON DELETE CASCADE,
+            FOREIGN KEY (category_id) REFERENCES MovementCategories (id)
+        )
+        """,
+        # Todo produto com estoque tem um ID em Products, mesmo antes de ser cadastrado (categoria vazia)
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_stock_product AFTER INSERT ON Stock
+        BEGIN
+            INSERT OR IGNORE INTO Products (product_code, name, category) VALUES (NEW.product_code, NEW.name, '');
+        END
+        """,
+        "INSERT OR IGNORE INTO Products (product_code, name, category) SELECT product_code, name, '' FROM Stock",
+    ]
+
+    LOG_VIEW = [
+        "CREATE INDEX IF NOT EXISTS idx_movement_log_timestamp ON MovementLog (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_movement_log_category_timestamp ON MovementLog (category_id, timestamp, product_id)",
+        "CREATE INDEX IF NOT EXISTS idx_movement_log_product_timestamp ON MovementLog (product_id, timestamp)",
+        f"CREATE VIEW IF NOT EXISTS Movements AS {movement_select('MovementLog')}",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_movements_insert INSTEAD OF INSERT ON Movements
+        BEGIN
+            INSERT OR IGNORE INTO Products (product_code, name, category) VALUES (NEW.product_code, NEW.name, '');
+            INSERT OR IGNORE INTO MovementCategories (name) VALUES (NEW.movement_category);
+            INSERT INTO MovementLog (id, product_id, category_id, moved_quantity, before_stock, after_stock, timestamp)
+            VALUES (
+                NEW.id,
+                (SELECT id FROM Products WHERE product_code = NEW.product_code),
+                (SELECT id FROM MovementCategories WHERE name = NEW.movement_category),
+                NEW.moved_quantity, NEW.before_stock, NEW.after_stock, NEW.timestamp
+            );
+        END
+        """,
+    ]
+
+    @classmethod
+    def convert_log(cls, conn):
+        """Migra a tabela Movements e as partições anexadas do formato antigo para o compacto."""
+        # Os IDs continuam de onde a tabela antiga parou, mesmo que as últimas linhas já tenham sido arquivadas
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = 'MovementLog'")
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) SELECT 'MovementLog', seq FROM sqlite_sequence WHERE name = 'Movements'")
+        cls._copy_legacy(conn, 'Movements', 'MovementLog')
+        conn.execute("DROP VIEW IF EXISTS AllMovements")
+        conn.execute("DROP TABLE Movements")
+
+        tables = [row[0] for row in conn.execute("SELECT table_name FROM MovementPartitions WHERE archive_path IS NULL")]
+        for table in tables:
+            conn.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+            for index in ('timestamp', 'category_timestamp', 'product_timestamp'):
+                conn.execute(f"DROP INDEX IF EXISTS idx_{table}_{index}")
+            for statement in cls.partition_schema(table):
+                conn.execute(statement)
+            cls._copy_legacy(conn, f"{table}_legacy", table)
+            conn.execute(f"DROP TABLE {table}_legacy")
+        cls._rebuild_view(conn)
+
+    @staticmethod
+    def _copy_legacy(conn, source, target):
+        """Copia movimentações no formato antigo (código, nome e categoria em texto) para uma tabela compacta."""
+        conn.execute(f"""
+        INSERT INTO Products (product_code, name, category)
+        SELECT codes.product_code, (SELECT name FROM {source} WHERE product_code = codes.product_code LIMIT 1), ''
+        FROM (SELECT DISTINCT product_code FROM {source} WHERE product_code IS NOT NULL) codes
+        WHERE NOT EXISTS (SELECT 1 FROM Products p WHERE p.product_code = codes.product_code)
+        """)
+        conn.execute(f"""
+        INSERT OR IGNORE INTO MovementCategories (name)
+        SELECT DISTINCT movement_category FROM {source} WHERE movement_category IS NOT NULL
+        """)
+        copied = conn.execute(f"""
+        INSERT INTO {target} ({MOVEMENT_LOG_COLUMNS})
+        SELECT m.id, p.id, c.id, m.moved_quantity, m.before_stock, m.after_stock, m.timestamp
+        FROM {source} m
+        JOIN Products p ON p.product_code = m.product_code
+        JOIN MovementCategories c ON c.name = m.movement_category
+        ORDER BY m.id
+        """).rowcount
+        skipped = conn.execute(f"SELECT COUNT(*) FROM {source}").fetchone()[0] - copied
+        if skipped:
+            logging.warning(f"{skipped} movimentações sem produto ou categoria não foram copiadas de '{source}'.")
+        return copied
+
+    # ☆☆ Partições mensais ☆☆
+    # MovementLog guarda só os meses recentes; os anteriores ficam em tabelas Movements_AAAAMM,
+    # registradas em MovementPartitions e reunidas na view AllMovements.
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS MovementPartitions (
+            month VARCHAR(7) PRIMARY KEY,
+            table_name VARCHAR(20) NOT NULL,
+            start DATETIME NOT NULL,
+            end DATETIME NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            archive_path TEXT
+        )
+        """,
+        f"CREATE VIEW IF NOT EXISTS AllMovements AS SELECT {MOVEMENT_COLUMNS} FROM Movements",
+    ]
+
+    @staticmethod
+    def partition_schema(table: str, schema: str = 'main'):
+        """Tabela de uma partição mensal, no formato e com os índices de MovementLog."""
+        return [
+            f"""
+            CREATE TABLE IF NOT EXISTS {schema}.{table} (
+                id INTEGER PRIMARY KEY,
+                product_id INTEGER NOT NULL,
+                category_id INTEGER NOT NULL,
+                moved_quantity INTEGER,
+                before_stock INTEGER,
+                after_stock INTEGER,
+                timestamp DATETIME
+            )
+            """,
+            f"CREATE INDEX IF NOT EXISTS {schema}.idx_{table}_timestamp ON {table} (timestamp)",
+            f"CREATE INDEX IF NOT EXISTS {schema}.idx_{table}_category_timestamp ON {table} (category_id, timestamp, product_id)",
+            f"CREATE INDEX IF NOT EXISTS {schema}.idx_{table}_product_timestamp ON {table} (product_id, timestamp)",
+        ]
+
+    def source(self, start: Optional[datetime] = None, end: Optional[datetime] = None):
+        """Origem (para o FROM) das movimentações do período, com só as partições que o cobrem."""
+        with self.pool.connection() as conn:
+            return movement_source(conn, start, end)
+
+    def partitions(self):
+        """Lista (mês, tabela, linhas, arquivo de arquivo morto ou None) das partições."""
+        return self.execute_query(
+            "SELECT month, table_name, row_count, archive_path FROM MovementPartitions ORDER BY month"
+        ).fetchall()
+
+    def archive(self, keep_months: int = 2):
+        """Move para partições mensais as movimentações anteriores aos 'keep_months' meses mais recentes.
+
+        Serve também para dividir uma tabela MovementLog já existente. Retorna {mês: linhas movidas}.
+        """
+        from dateutil.relativedelta import relativedelta
+
+        this_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        cutoff = this_month - relativedelta(months=keep_months - 1)
+
+        def split(conn):
+            moved = {}
+            # Só os meses que têm movimentações: um mês vazio não vira tabela nem parte da view
+            months = [row[0] for row in conn.execute(
+                "SELECT DISTINCT strftime('%Y-%m', timestamp) FROM MovementLog WHERE timestamp < ? ORDER BY 1",
+                (cutoff,))]
+            for month in months:
+                start = datetime.strptime(month, '%Y-%m')
+                end = start + relativedelta(months=1)
+                table = f"Movements_{start:%Y%m}"
+                partition = conn.execute("SELECT archive_path FROM MovementPartitions WHERE month = ?", (month,)).fetchone()
+                if partition and partition[0]:
+                    raise ValueError(f"A partição {month} está desanexada; anexe-a antes de arquivar o mês novamente.")
+                for statement in self.partition_schema(table):
+                    conn.execute(statement)
+                rows = conn.execute(
+                    f"INSERT INTO {table} ({MOVEMENT_LOG_COLUMNS}) SELECT {MOVEMENT_LOG_COLUMNS} FROM MovementLog "
+                    "WHERE timestamp >= ? AND timestamp < ?", (start, end)
+                ).rowcount
+                conn.execute("DELETE FROM MovementLog WHERE timestamp >= ? AND timestamp < ?", (start, end))
+                conn.execute("""
+                INSERT INTO MovementPartitions (month, table_name, start, end, row_count) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (month) DO UPDATE SET row_count = row_count + excluded.row_count
+                """, (month, table, start, end, rows))
+                moved[month] = rows
+            self._rebuild_view(conn)
+            return moved
+
+        moved = self.pool.run_transaction(split)
+        logging.info(f"Movimentações arquivadas em partições mensais: {moved}.")
+        notify(f"{sum(moved.values())} movimentações movidas para {len(moved)} partições mensais.")
+        return moved
+
+    def detach_partition(self, month: str, archive_path: str):
+        """Move a partição do mês para um arquivo de banco próprio, fora do banco principal e das consultas.
+
+        O arquivo guarda os IDs de produto e categoria; os nomes continuam em Products no banco principal.
+        """
+        table = self._partition_table(month, attached=True)
+        with self.pool.connection() as conn:
+            conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+            try:
+                with self.pool.transaction():
+                    for statement in self.partition_schema(table, schema='archive'):
+                        conn.execute(statement)
+                    conn.execute(f"INSERT INTO archive.{table} SELECT {MOVEMENT_LOG_COLUMNS} FROM main.{table}")
+                    conn.execute(f"DROP TABLE main.{table}")
+                    conn.execute("UPDATE MovementPartitions SET archive_path = ? WHERE month = ?", (archive_path, month))
+                    self._rebuild_view(conn)
+            finally:
+                conn.execute("DETACH DATABASE archive")
+        logging.info(f"Partição {month} desanexada para '{archive_path}'.")
+        notify(f"Partição {month} desanexada para '{archive_path}'.")
+
+    def attach_partition(self, month: str):
+        """Traz de volta ao banco principal uma partição desanexada, convertendo-a se estiver no formato antigo."""
+        table = self._partition_table(month, attached=False)
+        archive_path = self.execute_query("SELECT archive_path FROM MovementPartitions WHERE month = ?", (month,)).fetchone()[0]
+        with self.pool.connection() as conn:
+            conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+            try:
+                with self.pool.transaction():
+                    for statement in self.partition_schema(table):
+                        conn.execute(statement)
+                    columns = {row[1] for row in conn.execute(f"PRAGMA archive.table_info({table})")}
+                    if 'product_code' in columns:
+                        self._copy_legacy(conn, f"archive.{table}", f"main.{table}")
+                    else:
+                        conn.execute(f"INSERT INTO main.{table} SELECT {MOVEMENT_LOG_COLUMNS} FROM archive.{table}")
+                    conn.execute("UPDATE MovementPartitions SET archive_path = NULL WHERE month = ?", (month,))
+                    self._rebuild_view(conn)
+            finally:
+                conn.execute("DETACH DATABASE archive")
+        logging.info(f"Partição {month} anexada de volta a partir de '{archive_path}'.")
+        notify(f"Partição {month} anexada de volta.")
+
+    def compact(self):
+        """Recupera o espaço deixado pelas movimentações arquivadas ou desanexadas; retorna (bytes antes, depois)."""
+        def size(conn):
+            return conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+
+        with self.pool.connection() as conn:
+            before = size(conn)
+            conn.execute("VACUUM")
+            after = size(conn)
+        logging.info(f"Banco compactado de {before} para {after} bytes.")
+        return before, after
+
+    def _partition_table(self, month, attached):
+        partition = self.execute_query(
+            "SELECT table_name, archive_path FROM MovementPartitions WHERE month = ?", (month,)
+        ).fetchone()
+        if partition is None:
+            raise ValueError(f"Partição {month} não encontrada.")
+        if attached and partition[1]:
+            raise ValueError(f"A partição {month} já está desanexada em '{partition[1]}'.")
+        if not attached and not partition[1]:
+            raise ValueError(f"A partição {month} já está no banco principal.")
+        return partition[0]
+
+    @staticmethod
+    def _rebuild_view(conn):
+        tables = [row[0] for row in conn.execute(
+            "SELECT table_name FROM MovementPartitions WHERE archive_path IS NULL ORDER BY start"
+        )]
+        conn.execute("DROP VIEW IF EXISTS AllMovements")
+        conn.execute("CREATE VIEW AllMovements AS " + " UNION ALL ".join(
+            movement_select(table) for table in tables + ['MovementLog']
+        ))
+
+
+class ProductActivity(BaseEntity):
+    """Agregados de vendas e reposições por produto, atualizados por trigger na mesma transação de cada movimentação.
+
+    ProductActivity guarda a última venda e a última reposição; ProductDailyActivity guarda
+    a contagem e a quantidade de vendas e reposições por produto e dia.
+    """
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS ProductActivity (
+            product_code VARCHAR(7) PRIMARY KEY,
+            last_sale DATETIME,
+            last_purchase DATETIME
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ProductDailyActivity (
+            product_code VARCHAR(7) NOT NULL,
+            day DATE NOT NULL,
+            sale_count INTEGER NOT NULL DEFAULT 0,
+            sale_quantity INTEGER NOT NULL DEFAULT 0,
+            purchase_count INTEGER NOT NULL DEFAULT 0,
+            purchase_quantity INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (product_code, day)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_product_daily_activity_day ON ProductDailyActivity (day, product_code, purchase_count)",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_product_activity AFTER INSERT ON Movements
+        WHEN NEW.movement_category IN ('SALE', 'PURCHASE')
+        BEGIN
+            INSERT INTO ProductActivity (product_code, last_sale, last_purchase)
+            VALUES (
+                NEW.product_code,
+                CASE WHEN NEW.movement_category = 'SALE' THEN NEW.timestamp END,
+                CASE WHEN NEW.movement_category = 'PURCHASE' THEN NEW.timestamp END
+            )
+            ON CONFLICT (product_code) DO UPDATE SET
+                last_sale = CASE WHEN excluded.last_sale > coalesce(last_sale, '') THEN excluded.last_sale ELSE last_sale END,
+                last_purchase = CASE WHEN excluded.last_purchase > coalesce(last_purchase, '') THEN excluded.last_purchase ELSE last_purchase END;
+
+            INSERT INTO ProductDailyActivity (product_code, day, sale_count, sale_quantity, purchase_count, purchase_quantity)
+            VALUES (
+                NEW.product_code,
+                date(NEW.timestamp),
+                NEW.movement_category = 'SALE',
+                CASE WHEN NEW.movement_category = 'SALE' THEN NEW.moved_quantity ELSE 0 END,
+                NEW.movement_category = 'PURCHASE',
+                CASE WHEN NEW.movement_category = 'PURCHASE' THEN NEW.moved_quantity ELSE 0 END
+            )
+            ON CONFLICT (product_code, day) DO UPDATE SET
+                sale_count = sale_count + excluded.sale_count,
+                sale_quantity = sale_quantity + excluded.sale_quantity,
+                purchase_count = purchase_count + excluded.purchase_count,
+                purchase_quantity = purchase_quantity + excluded.purchase_quantity;
+        END
+        """,
+    ]
+
+    # O mesmo trigger sobre MovementLog, onde produto e categoria são IDs
+    LOG_TRIGGER = f"""
+        CREATE TRIGGER IF NOT EXISTS trg_product_activity AFTER INSERT ON MovementLog
+        WHEN NEW.category_id IN ({MOVEMENT_CATEGORIES['SALE']}, {MOVEMENT_CATEGORIES['PURCHASE']})
+        BEGIN
+            INSERT INTO ProductActivity (product_code, last_sale, last_purchase)
+            SELECT product_code,
+                   CASE WHEN NEW.category_id = {MOVEMENT_CATEGORIES['SALE']} THEN NEW.timestamp END,
+                   CASE WHEN NEW.category_id = {MOVEMENT_CATEGORIES['PURCHASE']} THEN NEW.timestamp END
+            FROM Products WHERE id = NEW.product_id
+            ON CONFLICT (product_code) DO UPDATE SET
+                last_sale = CASE WHEN excluded.last_sale > coalesce(last_sale, '') THEN excluded.last_sale ELSE last_sale END,
+                last_purchase = CASE WHEN excluded.last_purchase > coalesce(last_purchase, '') THEN excluded.last_purchase ELSE last_purchase END;
+
+            INSERT INTO ProductDailyActivity (product_code, day, sale_count, sale_quantity, purchase_count, purchase_quantity)
+            SELECT product_code,
+                   date(NEW.timestamp),
+                   NEW.category_id = {MOVEMENT_CATEGORIES['SALE']},
+                   CASE WHEN NEW.category_id = {MOVEMENT_CATEGORIES['SALE']} THEN NEW.moved_quantity ELSE 0 END,
+                   NEW.category_id = {MOVEMENT_CATEGORIES['PURCHASE']},
+                   CASE WHEN NEW.category_id = {MOVEMENT_CATEGORIES['PURCHASE']} THEN NEW.moved_quantity ELSE 0 END
+            FROM Products WHERE id = NEW.product_id
+            ON CONFLICT (product_code, day) DO UPDATE SET
+                sale_count = sale_count + excluded.sale_count,
+                sale_quantity = sale_quantity + excluded.sale_quantity,
+                purchase_count = purchase_count + excluded.purchase_count,
+                purchase_quantity = purchase_quantity + excluded.purchase_quantity;
+        END
+        """
+
+    BACKFILL = [
+        "DELETE FROM ProductActivity",
+        "DELETE FROM ProductDailyActivity",
+        """
+        INSERT INTO ProductActivity (product_code, last_sale, last_purchase)
+        SELECT product_code,
+               MAX(CASE WHEN movement_category = 'SALE' THEN timestamp END),
+               MAX(CASE WHEN movement_category = 'PURCHASE' THEN timestamp END)
+        FROM {movements}
+        WHERE movement_category IN ('SALE', 'PURCHASE') AND product_code IS NOT NULL
+        GROUP BY product_code
+        """,
+        """
+        INSERT INTO ProductDailyActivity (product_code, day, sale_count, sale_quantity, purchase_count, purchase_quantity)
+        SELECT product_code, date(timestamp),
+               SUM(movement_category = 'SALE'),
+               SUM(CASE WHEN movement_category = 'SALE' THEN moved_quantity ELSE 0 END),
+               SUM(movement_category = 'PURCHASE'),
+               SUM(CASE WHEN movement_category = 'PURCHASE' THEN moved_quantity ELSE 0 END)
+        FROM {movements}
+        WHERE movement_category IN ('SALE', 'PURCHASE') AND product_code IS NOT NULL
+        GROUP BY product_code, date(timestamp)
+        """,
+    ]
+
+    def backfill(self):
+        """Reconstrói os agregados a partir de todo o histórico, incluindo as partições mensais."""
+        with self.pool.transaction():
+            for statement in self.BACKFILL:
+                self.execute_query(statement.format(movements='AllMovements'))
+        logging.info("Agregados de 'ProductActivity' reconstruídos a partir do histórico.")
+
+
+class DailySnapshot(BaseEntity):
+    """Snapshots diários: estoque no fim do dia e totais movimentados por produto e categoria.
+
+    Só os produtos que se movimentaram no dia têm linhas; o estoque de abertura e de fechamento
+    vêm da primeira e da última movimentação do dia. SnapshotDays registra os dias processados,
+    sempre em sequência: os relatórios leem os snapshots desses dias e agregam na hora só os
+    dias seguintes (normalmente, o de hoje).
+
+    Os relatórios só leem. Os snapshots são gravados por quem grava movimentações (a primeira
+    gravação de cada dia grava os dias completos que faltam, depois do seu commit) ou pelo
+    comando 'snapshot', que pode ser agendado.
+    """
+    # Dia em que este processo já conferiu os snapshots
+    _appended_day = None
+
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS SnapshotDays (
+            day DATE PRIMARY KEY,
+            taken_at DATETIME NOT NULL
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS DailyMovementTotals (
+            day DATE NOT NULL,
+            product_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            movement_count INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY (day, product_id, category_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS DailyStockSnapshots (
+            day DATE NOT NULL,
+            product_id INTEGER NOT NULL,
+            opening_stock INTEGER,
+            closing_stock INTEGER,
+            PRIMARY KEY (day, product_id)
+        ) WITHOUT ROWID
+        """,
+    ]
+
+    # Agregação das movimentações de uma tabela compacta no período [?, ?), dia a dia
+    TOTALS = """
+    SELECT date(timestamp) AS day, product_id, category_id, COUNT(*) AS movement_count, SUM(moved_quantity) AS quantity
+    FROM {table}
+    WHERE timestamp >= ? AND timestamp < ?
+    GROUP BY date(timestamp), product_id, category_id
+    """
+    # Estoque antes da primeira e depois da última movimentação de cada produto no dia (ordem de gravação)
+    STOCK = """
+    SELECT d.day, d.product_id, f.before_stock AS opening_stock, l.after_stock AS closing_stock{ids}
+    FROM (
+        SELECT date(timestamp) AS day, product_id, MIN(id) AS first_id, MAX(id) AS last_id
+        FROM {table}
+        WHERE timestamp >= ? AND timestamp < ?
+        GROUP BY date(timestamp), product_id
+    ) d
+    JOIN {table} f ON f.id = d.first_id
+    JOIN {table} l ON l.id = d.last_id
+    """
+    # Um dia com movimentações em mais de uma tabela (lançamento retroativo depois de arquivar o mês):
+    # as partes de cada tabela são somadas, e o estoque vem da primeira e da última entre todas elas
+    MERGED_TOTALS = """
+    SELECT day, product_id, category_id, SUM(movement_count) AS movement_count, SUM(quantity) AS quantity
+    FROM ({parts})
+    GROUP BY day, product_id, category_id
+    """
+    MERGED_STOCK = """
+    SELECT o.day, o.product_id, o.opening_stock, c.closing_stock
+    FROM (SELECT day, product_id, opening_stock, MIN(first_id) FROM ({parts}) GROUP BY day, product_id) o
+    JOIN (SELECT day, product_id, closing_stock, MAX(last_id) FROM ({parts}) GROUP BY day, product_id) c
+      ON c.day = o.day AND c.product_id = o.product_id
+    """
+
+    # Agrupa antes de juntar com os nomes de produto e categoria
+    PERIOD_REPORT = """
+    WITH totals AS ({totals}),
+    stock AS ({stock}),
+    grouped AS (
+        SELECT product_id, category_id, SUM(movement_count) AS movement_count, SUM(quantity) AS moved_quantity
+        FROM totals
+        GROUP BY product_id, category_id
+    ),
+    opening AS (SELECT product_id, opening_stock, MIN(day) FROM stock GROUP BY product_id),
+    closing AS (SELECT product_id, closing_stock, MAX(day) FROM stock GROUP BY product_id)
+    SELECT p.product_code, p.name, c.name AS movement_category, g.movement_count, g.moved_quantity,
+           o.opening_stock, cl.closing_stock
+    FROM grouped g
+    JOIN Products p ON p.id = g.product_id
+    JOIN MovementCategories c ON c.id = g.category_id
+    LEFT JOIN opening o ON o.product_id = g.product_id
+    LEFT JOIN closing cl ON cl.product_id = g.product_id
+    ORDER BY p.product_code, c.name
+    """
+
+    WEEK_OVER_WEEK = """
+    WITH totals AS ({totals}),
+    stock AS ({stock}),
+    grouped AS (
+        SELECT product_id, category_id,
+               SUM(CASE WHEN day >= ? THEN quantity ELSE 0 END) AS current_quantity,
+               SUM(CASE WHEN day < ? THEN quantity ELSE 0 END) AS previous_quantity
+        FROM totals
+        GROUP BY product_id, category_id
+    ),
+    closing AS (SELECT product_id, closing_stock, MAX(day) FROM stock GROUP BY product_id)
+    SELECT p.product_code, p.name, c.name AS movement_category, g.current_quantity, g.previous_quantity,
+           g.current_quantity - g.previous_quantity AS quantity_change, cl.closing_stock
+    FROM grouped g
+    JOIN Products p ON p.id = g.product_id
+    JOIN MovementCategories c ON c.id = g.category_id
+    LEFT JOIN closing cl ON cl.product_id = g.product_id
+    ORDER BY abs(quantity_change) DESC, p.product_code, c.name
+    """
+
+    @staticmethod
+    def first_day(conn):
+        """Dia da movimentação mais antiga ainda disponível (fora das partições desanexadas), ou None."""
+        firsts = [conn.execute(f"SELECT MIN(timestamp) FROM {table}").fetchone()[0] for table in movement_tables(conn)]
+        firsts = [first for first in firsts if first is not None]
+        return datetime.strptime(min(firsts)[:10], '%Y-%m-%d').date() if firsts else None
+
+    @classmethod
+    def live_rows(cls, tables, start: str, end: str):
+        """SQL e parâmetros dos totais e do estoque por dia agregados na hora das tabelas, no período [start, end)."""
+        bounds = [start, end]
+        if len(tables) == 1:
+            return (cls.TOTALS.format(table=tables[0]), bounds,
+                    cls.STOCK.format(table=tables[0], ids=''), bounds)
+        totals = " UNION ALL ".join(cls.TOTALS.format(table=table) for table in tables)
+        stock = " UNION ALL ".join(cls.STOCK.format(table=table, ids=', d.first_id, d.last_id') for table in tables)
+        return (cls.MERGED_TOTALS.format(parts=totals), bounds * len(tables),
+                cls.MERGED_STOCK.format(parts=stock), bounds * len(tables) * 2)
+
+    @classmethod
+    def take_range(cls, conn, start, end):
+        """Grava os snapshots dos dias [start, end), substituindo os que já existirem."""
+        bounds = (start.isoformat(), end.isoformat())
+        for table in ('DailyMovementTotals', 'DailyStockSnapshots', 'SnapshotDays'):
+            conn.execute(f"DELETE FROM {table} WHERE day >= ? AND day < ?", bounds)
+        totals, totals_params, stock, stock_params = cls.live_rows(movement_tables(conn, *bounds), *bounds)
+        conn.execute("INSERT INTO DailyMovementTotals (day, product_id, category_id, movement_count, quantity) "
+                     + totals, totals_params)
+        conn.execute("INSERT INTO DailyStockSnapshots (day, product_id, opening_stock, closing_stock) "
+                     + stock, stock_params)
+        conn.execute("""
+            WITH RECURSIVE days(day) AS (
+                SELECT ? UNION ALL SELECT date(day, '+1 day') FROM days WHERE date(day, '+1 day') < ?
+            )
+            INSERT INTO SnapshotDays (day, taken_at) SELECT day, datetime('now', 'localtime') FROM days
+        """, bounds)
+
+    @classmethod
+    def backfill_history(cls, conn, until=None):
+        """Refaz os snapshots de todo o histórico disponível, até o dia anterior a 'until' (padrão: hoje)."""
+        for table in ('DailyMovementTotals', 'DailyStockSnapshots', 'SnapshotDays'):
+            conn.execute(f"DELETE FROM {table}")
+        first, until = cls.first_day(conn), until or datetime.now().date()
+        if first is not None and first < until:
+            cls.take_range(conn, first, until)
+
+    def backfill(self, until=None):
+        """Refaz os snapshots a partir de todo o histórico de movimentações."""
+        self.pool.run_transaction(lambda conn: self.backfill_history(conn, until))
+        logging.info("Snapshots diários refeitos a partir do histórico.")
+
+    def append(self, until=None):
+        """Grava os snapshots dos dias completos que ainda não têm, até o dia anterior a 'until' (padrão: hoje).
+
+        Retorna o número de dias gravados.
+        """
+        from dateutil.relativedelta import relativedelta
+
+        until = until or datetime.now().date()
+
+        def take(conn):
+            last = conn.execute("SELECT MAX(day) FROM SnapshotDays").fetchone()[0]
+            start = datetime.strptime(last, '%Y-%m-%d').date() + relativedelta(days=1) if last else self.first_day(conn)
+            if start is None or start >= until:
+                return 0
+            self.take_range(conn, start, until)
+            return (until - start).days
+
+        days = self.pool.run_transaction(take)
+        if days:
+            logging.info(f"Snapshots diários gravados para {days} dias, até {until}.")
+        return days
+
+    def append_when_due(self):
+        """Na primeira gravação do dia, agenda append() para depois do commit da transação corrente."""
+        today = datetime.now().date()
+        if self._appended_day != today:
+            self.pool.after_commit(lambda: self._append_once(today))
+
+    def _append_once(self, today):
+        if self._appended_day == today:
+            return
+        self._appended_day = today
+        try:
+            self.append(today)
+        except sqlite3.Error as e:
+            # A movimentação já foi confirmada; os snapshots ficam para a próxima gravação
+            self._appended_day = None
+            logging.error(f"Erro ao gravar os snapshots diários: {e}")
+
+    def covered_until(self, conn):
+        """Primeiro dia ainda sem snapshot (o dia seguinte ao último gravado), ou None se não houver nenhum."""
+        from dateutil.relativedelta import relativedelta
+
+        last = conn.execute("SELECT MAX(day) FROM SnapshotDays").fetchone()[0]
+        return datetime.strptime(last, '%Y-%m-%d').date() + relativedelta(days=1) if last else None
+
+    def daily_rows(self, conn, start, end):
+        """SQL e parâmetros das linhas diárias de totais e de estoque dos dias [start, end).
+
+        Os dias com snapshot vêm das tabelas de snapshot; os seguintes são agregados na hora.
+        """
+        covered = self.covered_until(conn)
+        split = min(max(covered or start, start), end)
+        bounds, live = (start.isoformat(), split.isoformat()), (split.isoformat(), end.isoformat())
+        totals = ["SELECT day, product_id, category_id, movement_count, quantity FROM DailyMovementTotals "
+                  "WHERE day >= ? AND day < ?"]
+        stock = ["SELECT day, product_id, opening_stock, closing_stock FROM DailyStockSnapshots "
+                 "WHERE day >= ? AND day < ?"]
+        totals_params, stock_params = list(bounds), list(bounds)
+        if split < end:
+            live_totals, live_totals_params, live_stock, live_stock_params = self.live_rows(
+                movement_tables(conn, *live), *live)
+            totals.append(live_totals)
+            stock.append(live_stock)
+            totals_params += live_totals_params
+            stock_params += live_stock_params
+        return " UNION ALL ".join(totals), totals_params, " UNION ALL ".join(stock), stock_params
+
+    def period_report(self, start, end):
+        """Totais por produto e categoria dos dias [start, end), com o estoque de abertura e de fechamento."""
+        with self.pool.connection() as conn:
+            totals, totals_params, stock, stock_params = self.daily_rows(conn, start, end)
+            return self.read_dataframe(self.PERIOD_REPORT.format(totals=totals, stock=stock),
+                                       tuple(totals_params + stock_params))
+
+    def week_over_week(self, end=None):
+        """Quantidades por produto e categoria nos 7 dias até 'end' (exclusivo; padrão: amanhã) e nos 7 anteriores."""
+        from dateutil.relativedelta import relativedelta
+
+        end = end or datetime.now().date() + relativedelta(days=1)
+        split, start = end - relativedelta(days=7), end - relativedelta(days=14)
+        with self.pool.connection() as conn:
+            totals, totals_params, stock, stock_params = self.daily_rows(conn, start, end)
+            # Os '?' de 'grouped' vêm depois dos das CTEs de totais e de estoque
+            return self.read_dataframe(self.WEEK_OVER_WEEK.format(totals=totals, stock=stock),
+                                       tuple(totals_params + stock_params + [split.isoformat()] * 2))
+
+
+class PurchaseOrder(BaseEntity):
+    def create_table(self):
+        query = """
+        CREATE TABLE IF NOT EXISTS PurchaseOrders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_code VARCHAR(7),
+            name VARCHAR(30) NOT NULL,
+            purchase_quantity INTEGER NOT NULL,
+            order_approved BOOLEAN DEFAULT FALSE,
+            order_finished BOOLEAN DEFAULT FALSE,
+            order_date DATETIME,
+            FOREIGN KEY (product_code) REFERENCES Stock (product_code) ON DELETE CASCADE
+        );
+        """
+        self.execute_query(query)
+        logging.info("Tabela 'PurchaseOrders' criada com sucesso.")
+
+    @instrumented
+    def create_order(self, product_code: str, name: str, quantity: int):
+        query = """
+        INSERT INTO PurchaseOrders (product_code, name, purchase_quantity, order_date)
+        VALUES (?, ?, ?, ?)
+        """
+        order_date = datetime.now()
+        order_id = self.execute_query(query, (product_code, name, quantity, order_date)).lastrowid
+        logging.info(f"Ordem de compra criada para '{name}' (código: {product_code}) com quantidade {quantity}.",
+                     extra={'event': 'order_created', 'order_id': order_id, 'product_code': product_code,
+                            'quantity': quantity})
+        notify(f"Ordem de compra criada para '{name}' (código: {product_code}) com quantidade {quantity}.")
+        return order_id
+
+    # Produtos em estoque baixo e a quantidade que os leva de volta ao regular_stock,
+    # descontando as ordens ainda não finalizadas
+    REORDER_QUERY = """
+    SELECT product_code, name, quantity FROM (
+        SELECT s.product_code, s.name,
+               COALESCE(s.regular_stock, (s.min_stock + s.max_stock) / 2) - s.real_stock
+               - COALESCE((SELECT SUM(po.purchase_quantity) FROM PurchaseOrders po
+                           WHERE po.product_code = s.product_code AND po.order_finished = 0), 0) AS quantity
+        FROM StockStatus ss
+        JOIN Stock s ON s.product_code = ss.product_code
+        WHERE ss.status = 'low_stock'
+    )
+    WHERE quantity > 0
+    """
+
+    def suggest_reorders(self):
+        """Retorna um DataFrame com as ordens que a reposição automática criaria, sem criá-las."""
+        import pandas as pd
+
+        cursor = self.execute_query(self.REORDER_QUERY)
+        return pd.DataFrame(cursor.fetchall(), columns=['product_code', 'name', 'quantity'])
+
+    @instrumented
+    def create_reorders(self):
+        """Cria, em uma única transação, as ordens de compra de todos os produtos em estoque baixo.
+
+        Retorna a lista de (id da ordem, código do produto, quantidade).
+        """
+        query = f"""
+        INSERT INTO PurchaseOrders (product_code, name, purchase_quantity, order_date)
+        SELECT product_code, name, quantity, ? FROM ({self.REORDER_QUERY})
+        RETURNING id, product_code, purchase_quantity
+        """
+
+        def reorder(conn):
+            return self.execute_query(query, (datetime.now(),)).fetchall()
+
+        orders = self.pool.run_transaction(reorder)
+        logging.info(f"Reposição automática: {len(orders)} ordens de compra criadas.")
+        notify(f"Reposição automática: {len(orders)} ordens de compra criadas.")
+        return orders
+
+    @instrumented
+    def approve_order(self, user_id, order_id):
+        """Aprova uma ordem de compra apenas se o usuário tiver privilégio suficiente (gerente)."""
+        if not self.check_privilege(user_id, 2):  # Privilegio 2 para gerente
+            notify("Erro: Usuário não tem privilégio para aprovar ordens de compra.")
+            return
+
+        query = "UPDATE PurchaseOrders SET order_approved = TRUE WHERE id = ?"
+        self.execute_query(query, (order_id,))
+        logging.info(f"Ordem de compra com ID {order_id} aprovada.",
+                     extra={'event': 'order_approved', 'order_id': order_id, 'user_id': user_id})
+        notify(f"Ordem de compra com ID {order_id} aprovada.")
+
+    @instrumented
+    def finalize_order(self, user_id, order_id: int):
+        """Finaliza a ordem de compra e realiza a entrada de material no estoque após conferir a NF."""
+        if not self.check_privilege(user_id, 1):  # Privilegio 1 para estoquista
+            notify("Erro: Usuário não tem privilégio suficiente para realizar esta ação.")
+            return
+
+        with self.pool.transaction() as conn:
+            cursor = conn.cursor()
+            query = """
+            SELECT product_code, name, purchase_quantity, order_approved, order_finished
+            FROM PurchaseOrders
+            WHERE id = ?
+            """
+            order = cursor.execute(query, (order_id,)).fetchone()
+
+            if not order:
+                notify(f"Erro: Ordem de compra com ID {order_id} não encontrada.")
+                return
+
+            product_code, name, quantity, approved, finished = order
+
+            if not approved:
+                notify(f"Erro: A ordem de compra com ID {order_id} ainda não foi aprovada.")
+                return
+
+            if finished:
+                notify(f"Erro: A ordem de compra com ID {order_id} já foi finalizada.")
+                return
+
+            nf_code = 'nfcode'
+            nf_verified = self.verify_nf(nf_code)
+            if not nf_verified:
+                notify("Erro: Nota Fiscal não conferida corretamente.")
+                return
+
+            query_stock = "SELECT real_stock FROM Stock WHERE product_code = ?"
+            stock_data = cursor.execute(query_stock, (product_code,)).fetchone()
+
+            if stock_data:
+                current_stock = stock_data[0]
+                new_stock = current_stock + quantity
+
+                # Atualiza o estoque
+                update_stock_query = "UPDATE Stock SET real_stock = ? WHERE product_code = ?"
+                cursor.execute(update_stock_query, (new_stock, product_code))
+                self.invalidate_after_commit(('stock', product_code))
+
+                # Registra a movimentação
+                timestamp = datetime.now()
+                log_data = (product_code, "PURCHASE", quantity, current_stock, new_stock, timestamp)
+                cursor.execute(Movement.INSERT_QUERY, log_data)
+
+                # Marca a ordem como finalizada
+                update_order_query = "UPDATE PurchaseOrders SET order_finished = TRUE WHERE id = ?"
+                cursor.execute(update_order_query, (order_id,))
+
+                logging.info(f"Ordem de compra com ID {order_id} finalizada.",
+                             extra={'event': 'order_finalized', 'order_id': order_id, 'user_id': user_id,
+                                    'product_code': product_code, 'quantity': quantity, 'after_stock': new_stock})
+                notify(f"Ordem de compra com ID {order_id} finalizada. Estoque atualizado para {new_stock}.")
+
+    @instrumented
+    def approve_orders(self, user_id, order_ids):
+        """Aprova várias ordens de compra de uma vez, conferindo o privilégio uma única vez.
+
+        Retorna {id da ordem: resultado}.
+        """
+        order_ids = list(dict.fromkeys(order_ids))
+        if not self.check_privilege(user_id, 2):  # Privilegio 2 para gerente
+            notify("Erro: Usuário não tem privilégio para aprovar ordens de compra.")
+            return {order_id: "sem privilégio" for order_id in order_ids}
+
+        def approve(conn):
+            outcomes = {}
+            orders = self.get_orders(order_ids)
+            for order_id in order_ids:
+                order = orders.get(order_id)
+                if order is None:
+                    outcomes[order_id] = "não encontrada"
+                elif order[4]:
+                    outcomes[order_id] = "já finalizada"
+                elif order[3]:
+                    outcomes[order_id] = "já aprovada"
+                else:
+                    outcomes[order_id] = "aprovada"
+            approved = [(order_id,) for order_id, outcome in outcomes.items() if outcome == "aprovada"]
+            self.execute_many("UPDATE PurchaseOrders SET order_approved = TRUE WHERE id = ?", approved)
+            return outcomes
+
+        outcomes = self.pool.run_transaction(approve)
+        approved = sum(outcome == "aprovada" for outcome in outcomes.values())
+        logging.info(f"{approved} ordens de compra aprovadas em lote.")
+        notify(f"{approved} de {len(order_ids)} ordens de compra aprovadas.")
+        return outcomes
+
+    @instrumented
+    def finalize_orders(self, user_id, order_ids):
+        """Finaliza várias ordens de compra em uma única transação, dando entrada no estoque de cada uma.
+
+        Retorna {id da ordem: resultado}.
+        """
+        order_ids = list(dict.fromkeys(order_ids))
+        if not self.check_privilege(user_id, 1):  # Privilegio 1 para estoquista
+            notify("Erro: Usuário não tem privilégio suficiente para realizar esta ação.")
+            return {order_id: "sem privilégio" for order_id in order_ids}
+
+        def finalize(conn):
+            outcomes = {}
+            orders = self.get_orders(order_ids)
+            levels = self.get_stock_levels({order[0] for order in orders.values()})
+            balances = {product_code: real_stock for product_code, (real_stock, _) in levels.items()}
+            timestamp = datetime.now()
+            movements, finished = [], []
+
+            for order_id in order_ids:
+                order = orders.get(order_id)
+                if order is None:
+                    outcomes[order_id] = "não encontrada"
+                    continue
+                product_code, name, quantity, approved, already_finished = order
+                if not approved:
+                    outcomes[order_id] = "não aprovada"
+                elif already_finished:
+                    outcomes[order_id] = "já finalizada"
+                elif not self.verify_nf('nfcode'):
+                    outcomes[order_id] = "NF não conferida"
+                elif product_code not in balances:
+                    outcomes[order_id] = "produto não encontrado no estoque"
+                else:
+                    before_stock = balances[product_code]
+                    balances[product_code] = before_stock + quantity
+                    movements.append((product_code, "PURCHASE", quantity, before_stock, before_stock + quantity, timestamp))
+                    finished.append((order_id,))
+                    outcomes[order_id] = "finalizada"
+
+            deltas = [
+                (balances[product_code] - real_stock, product_code)
+                for product_code, (real_stock, _) in levels.items() if balances[product_code] != real_stock
+            ]
+            self.execute_many("UPDATE Stock SET real_stock = real_stock + ? WHERE product_code = ?", deltas)
+            self.execute_many(Movement.INSERT_QUERY, movements)
+            self.execute_many("UPDATE PurchaseOrders SET order_finished = TRUE WHERE id = ?", finished)
+            self.invalidate_after_commit(*[('stock', product_code) for product_code in levels])
+            return outcomes
+
+        outcomes = self.pool.run_transaction(finalize)
+        finalized = sum(outcome == "finalizada" for outcome in outcomes.values())
+        logging.info(f"{finalized} ordens de compra finalizadas em lote.")
+        notify(f"{finalized} de {len(order_ids)} ordens de compra finalizadas.")
+        return outcomes
+
+    def get_orders(self, order_ids):
+        """Retorna {id: (product_code, name, purchase_quantity, order_approved, order_finished)}, consultando em blocos."""
+        order_ids = list(order_ids)
+        orders = {}
+        for start in range(0, len(order_ids), 500):
+            chunk = order_ids[start:start + 500]
+            query = f"""
+            SELECT id, product_code, name, purchase_quantity, order_approved, order_finished
+            FROM PurchaseOrders
+            WHERE id IN ({', '.join('?' * len(chunk))})
+            """
+            for row in self.execute_query(query, tuple(chunk)):
+                orders[row[0]] = row[1:]
+        return orders
+
+    def verify_nf(self, nf_code):
+        """Simula a verificação da NF."""
+        valid_nfs = ['NF123456', 'NF789101']  # NFs válidas
+        return nf_code not in valid_nfs
+    
+    def check_privilege(self, user_id, required_privilege):
+        """Verifica se o usuário tem privilégio suficiente para realizar uma ação."""
+        query = "SELECT privilege FROM Users WHERE id = ?"
+        user_privilege = self.cached(
+            ('user', user_id), lambda: self.execute_query(query, (user_id,)).fetchone()
+        )
+
+        if user_privilege is None:
+            logging.warning(f"Usuário com ID {user_id} não encontrado.")
+            return False
+
+        if user_privilege[0] >= required_privilege:
+            return True
+        else:
+            logging.warning(f"Usuário com ID {user_id} não tem privilégio suficiente.")
+            return False
+
+
+class DemandForecast(BaseEntity):
+    """Previsão de demanda de todos os produtos de uma vez, sobre a matriz dia × produto de vendas.
+
+    As vendas diárias vêm de ProductDailyActivity, que já agrega a tabela Movements por produto e dia.
+    """
+
+    def sales_matrix(self, start, end):
+        """Monta a matriz densa (dias × produtos) de quantidades vendidas no período [start, end).
+
+        Retorna (matriz, DataFrame com os produtos do estoque na ordem das colunas).
+        """
+        import numpy as np
+        import pandas as pd
+
+        products = self.read_dataframe(
+            "SELECT product_code, name, real_stock, min_stock, regular_stock FROM Stock ORDER BY product_code"
+        )
+        days = (end - start).days
+        sales = np.zeros((days, len(products)), dtype=np.float32)
+
+        # Uma linha por produto, com os dias e as quantidades concatenados, em vez de milhões de tuplas.
+        # O '+' em day evita o índice por dia: a varredura pela chave primária já vem agrupada por produto.
+        cursor = self.execute_query("""
+        SELECT product_code, COUNT(*),
+               group_concat(CAST(julianday(day) - julianday(?1) AS INTEGER)), group_concat(sale_quantity)
+        FROM ProductDailyActivity
+        WHERE +day >= ?1 AND +day < ?2 AND sale_quantity > 0
+        GROUP BY product_code
+        """, (start.isoformat(), end.isoformat()))
+        rows = cursor.fetchall()
+        if rows:
+            codes, counts, day_lists, quantity_lists = zip(*rows)
+            columns = np.repeat(pd.Categorical(codes, categories=products['product_code']).codes, counts)
+            day_index = np.fromstring(','.join(day_lists), dtype=np.int64, sep=',')
+            quantities = np.fromstring(','.join(quantity_lists), dtype=np.float32, sep=',')
+            known = columns >= 0
+            sales[day_index[known], columns[known]] = quantities[known]
+        return sales, products
+
+    def forecast(self, history_days: int = 730, alpha: float = 0.3, error_days: int = 90,
+                 lead_time: int = 7, review_days: int = 14, service_level: float = 0.95, end=None):
+        """Calcula médias móveis, suavização exponencial e estoque de segurança de todos os produtos.
+
+        O novo estoque mínimo cobre a demanda prevista durante o prazo de entrega mais o estoque de
+        segurança; o novo estoque regular cobre ainda o intervalo até a próxima reposição.
+        """
+        import numpy as np
+        from dateutil.relativedelta import relativedelta
+
+        end = end or datetime.now().date() + relativedelta(days=1)
+        start = end - relativedelta(days=history_days)
+        sales, products = self.sales_matrix(start, end)
+
+        # Suavização exponencial simples, um dia por vez para todos os produtos,
+        # acumulando o erro da previsão de um dia à frente nos últimos 'error_days'
+        level = sales[0].copy()
+        squared_error = np.zeros(len(products), dtype=np.float64)
+        for day in range(1, len(sales)):
+            error = sales[day] - level
+            if day >= len(sales) - error_days:
+                squared_error += error * error
+            level += alpha * error
+        sigma = np.sqrt(squared_error / max(min(error_days, len(sales) - 1), 1))
+
+        z = NormalDist().inv_cdf(service_level)
+        safety_stock = z * sigma * np.sqrt(lead_time)
+        suggested_min = np.ceil(level * lead_time + safety_stock)
+        suggested_regular = suggested_min + np.ceil(level * review_days)
+
+        products['moving_average_7'] = sales[-7:].mean(axis=0)
+        products['moving_average_28'] = sales[-28:].mean(axis=0)
+        products['forecast'] = level
+        products['safety_stock'] = safety_stock
+        products['suggested_min_stock'] = suggested_min.astype(np.int64)
+        products['suggested_regular_stock'] = suggested_regular.astype(np.int64)
+        return products
+
+    def apply_suggestions(self, suggestions):
+        """Grava os estoques mínimo e regular sugeridos em uma única transação.
+
+        O estoque máximo só é alterado quando ficaria abaixo do novo estoque regular.
+        """
+        rows = list(zip(
+            suggestions['suggested_min_stock'].astype(int).tolist(),
+            suggestions['suggested_regular_stock'].astype(int).tolist(),
+            suggestions['product_code'].tolist(),
+        ))
+
+        def apply(conn):
+            self.execute_many(
+                "UPDATE Stock SET min_stock = ?1, regular_stock = ?2, max_stock = MAX(max_stock, ?2) WHERE product_code = ?3",
+                rows,
+            )
+
+        self.pool.run_transaction(apply)
+        self.cache.invalidate(*[('stock', product_code) for _, _, product_code in rows])
+        logging.info(f"Estoques mínimo e regular atualizados pela previsão de demanda para {len(rows)} produtos.")
+        notify(f"Estoques mínimo e regular atualizados para {len(rows)} produtos.")
+
+
+class ReportExporter(BaseEntity):
+    """Exporta tabelas em blocos para CSV ou Parquet, com memória constante independentemente do tamanho da tabela."""
+    # Tabelas exportáveis e a coluna de data usada no filtro por período
+    TABLES = {
+        'Movements': 'timestamp',
+        'Stock': None,
+        'PurchaseOrders': 'order_date',
+    }
+
+    def iter_chunks(self, table: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                    product_codes=None, chunk_size: int = 50000):
+        """Percorre a tabela com o cursor, gerando (colunas, linhas) de até 'chunk_size' linhas."""
+        if table not in self.TABLES:
+            raise ValueError(f"Tabela '{table}' não pode ser exportada.")
+        date_column = self.TABLES[table]
+        if (start or end) and date_column is None:
+            raise ValueError(f"A tabela '{table}' não tem coluna de data para filtrar.")
+
+        conditions, params = [], []
+        if start:
+            conditions.append(f"{date_column} >= ?")
+            params.append(start)
+        if end:
+            conditions.append(f"{date_column} < ?")
+            params.append(end)
+        if product_codes is not None:
+            product_codes = list(product_codes)
+            conditions.append(f"product_code IN ({', '.join('?' * len(product_codes))})")
+            params.extend(product_codes)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self.pool.connection() as conn:
+            # Movements passa pelas partições mensais que cobrem o período
+            source = movement_source(conn, start, end) if table == 'Movements' else table
+            cursor = conn.execute(f"SELECT * FROM {source} {where} ORDER BY id", params)
+            columns = [description[0] for description in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield columns, rows
+
+    def export_csv(self, table: str, path: str, **filters):
+        """Exporta a tabela para CSV; retorna o número de linhas gravadas."""
+        written = 0
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            header_written = False
+            for columns, rows in self.iter_chunks(table, **filters):
+                if not header_written:
+                    writer.writerow(columns)
+                    header_written = True
+                writer.writerows(rows)
+                written += len(rows)
+            if not header_written:
+                writer.writerow(list(self.column_types(table)))
+        logging.info(f"{written} linhas de '{table}' exportadas para {path}.")
+        return written
+
+    def export_parquet(self, table: str, path: str, **filters):
+        """Exporta a tabela para Parquet (requer pyarrow), um row group por bloco; retorna o número de linhas."""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("A exportação em Parquet requer o pacote 'pyarrow'.") from e
+
+        arrow_types = {'INTEGER': pa.int64(), 'BOOLEAN': pa.bool_(), 'DATETIME': pa.timestamp('s')}
+        schema = pa.schema([
+            (column, arrow_types.get(declared.split('(')[0].upper(), pa.string()))
+            for column, declared in self.column_types(table).items()
+        ])
+
+        written = 0
+        with pq.ParquetWriter(path, schema) as writer:
+            for columns, rows in self.iter_chunks(table, **filters):
+                arrays = []
+                for field, values in zip(schema, zip(*rows)):
+                    # Datas chegam do SQLite como texto e booleanos como inteiros
+                    if pa.types.is_timestamp(field.type):
+                        arrays.append(pa.array(values, pa.string()).cast(field.type))
+                    elif pa.types.is_boolean(field.type):
+                        arrays.append(pa.array(values, pa.int64()).cast(field.type))
+                    else:
+                        arrays.append(pa.array(values, field.type))
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                written += len(rows)
+        logging.info(f"{written} linhas de '{table}' exportadas para {path}.")
+        return written
+
+    def column_types(self, table: str):
+        """Retorna {coluna: tipo declarado} da tabela."""
+        if table not in self.TABLES:
+            raise ValueError(f"Tabela '{table}' não pode ser exportada.")
+        return {row[1]: row[2] for row in self.execute_query(f"PRAGMA table_info({table})").fetchall()}
+
+
+# Expansão da classe InventoryManager
+class InventoryManagerRefactored:
+    # Migrações de esquema aplicadas em ordem; a versão atual fica em PRAGMA user_version
+    MIGRATIONS = [
+        (1, [
+            # Relatório semanal (timestamp >= ?)
+            "CREATE INDEX IF NOT EXISTS idx_movements_timestamp ON Movements (timestamp)",
+            # Análises por categoria e período, cobrindo o código do produto
+            "CREATE INDEX IF NOT EXISTS idx_movements_category_timestamp ON Movements (movement_category, timestamp, product_code)",
+            # Histórico de um produto
+            "CREATE INDEX IF NOT EXISTS idx_movements_product_timestamp ON Movements (product_code, timestamp)",
+            # Ordens de compra pendentes
+            "CREATE INDEX IF NOT EXISTS idx_purchase_orders_status ON PurchaseOrders (order_approved, order_finished)",
+        ]),
+        # Resumo materializado da situação do estoque, preenchido com os produtos existentes
+        (2, StockStatus.SCHEMA + [
+            f"""
+            INSERT OR REPLACE INTO StockStatus (product_code, status, changed_at)
+            SELECT product_code, {STOCK_STATUS_CASE.format(row='Stock')}, datetime('now', 'localtime')
+            FROM Stock
+            """,
+        ]),
+        # Agregados por produto para as análises, preenchidos com o histórico existente
+        (3, ProductActivity.SCHEMA + [statement.format(movements='Movements') for statement in ProductActivity.BACKFILL]),
+        # Ponto de reposição usado pela reposição automática e quantidade em aberto por produto
+        (4, [
+            "ALTER TABLE Stock ADD COLUMN regular_stock INTEGER",
+            "UPDATE Stock SET regular_stock = (min_stock + max_stock) / 2",
+            "CREATE INDEX IF NOT EXISTS idx_purchase_orders_product_open ON PurchaseOrders (product_code, order_finished, purchase_quantity)",
+        ]),
+        # Registro das partições mensais de Movements e a view com todo o histórico
+        (5, Movement.SCHEMA),
+        # Movimentações com IDs inteiros de produto e categoria em MovementLog; Movements vira uma view
+        (6, Movement.LOG_SCHEMA + [Movement.convert_log] + Movement.LOG_VIEW + [ProductActivity.LOG_TRIGGER]
+            + StockStatus.WITHOUT_ROWID),
+        # Snapshots diários de estoque e de totais movimentados, preenchidos com o histórico existente
+        (7, DailySnapshot.SCHEMA + [DailySnapshot.backfill_history]),
+        # Custo unitário, usado no valor do estoque dos agregados por categoria e localização
+        (8, ["ALTER TABLE Products ADD COLUMN unit_cost REAL"]),
+        # Conteúdo de uma localização sem varrer o estoque
+        (9, Location.SCHEMA),
+    ]
+
+    # Consultas que devem ser resolvidas por índice, usadas por check_query_plans
+    INDEXED_QUERIES = {
+        'movimentações recentes': (
+            "SELECT product_code, name, movement_category, moved_quantity, before_stock, after_stock, timestamp FROM Movements WHERE timestamp >= ?",
+            ('2000-01-01 00:00:00',),
+        ),
+        'vendas no período': (
+            "SELECT DISTINCT product_code FROM Movements WHERE movement_category = ? AND timestamp >= ?",
+            ('SALE', '2000-01-01 00:00:00'),
+        ),
+        'reposições por produto': (
+            "SELECT product_code, COUNT(*) FROM Movements WHERE movement_category = ? AND timestamp >= ? GROUP BY product_code",
+            ('PURCHASE', '2000-01-01 00:00:00'),
+        ),
+        'histórico do produto': (
+            "SELECT * FROM Movements WHERE product_code = ? ORDER BY timestamp",
+            ('CAM-001',),
+        ),
+        'produtos em estoque baixo': (
+            "SELECT s.* FROM StockStatus ss JOIN Stock s ON s.product_code = ss.product_code WHERE ss.status = ?",
+            ('low_stock',),
+        ),
+        'ordens em aberto do produto': (
+            "SELECT SUM(purchase_quantity) FROM PurchaseOrders WHERE product_code = ? AND order_finished = 0",
+            ('CAM-001',),
+        ),
+        'conteúdo da localização': (
+            "SELECT product_code, name, real_stock FROM Stock WHERE location = ?",
+            ('VEST01',),
+        ),
+        'ordens não aprovadas': (
+            "SELECT * FROM PurchaseOrders WHERE order_approved = 0 AND order_finished = 0",
+            None,
+        ),
+    }
+
+    def __init__(self, db_path: str, pool_size: int = 5):
+        self.db_path = db_path
+        # Todas as entidades compartilham o mesmo pool de conexões
+        self.pool = ConnectionPool.get(db_path, size=pool_size)
+        self.cache = LookupCache.get(db_path)
+        self.user = User(db_path, self.pool)
+        self.product = Product(db_path, self.pool)
+        self.stock = Stock(db_path, self.pool)
+        self.movement = Movement(db_path, self.pool)
+        self.purchase_order = PurchaseOrder(db_path, self.pool)
+        self.stock_status = StockStatus(db_path, self.pool)
+        self.location = Location(db_path, self.pool)
+        self.product_activity = ProductActivity(db_path, self.pool)
+        self.snapshot = DailySnapshot(db_path, self.pool)
+        self.exporter = ReportExporter(db_path, self.pool)
+        self.forecast = DemandForecast(db_path, self.pool)
+
+    def setup(self):
+        """Configura todas as tabelas no banco de dados.
+
+        Em um banco que já está na versão mais recente do esquema, só consulta PRAGMA user_version.
+        """
+        if self.schema_version() >= self.MIGRATIONS[-1][0]:
+            return
+        self.user.create_table()
+        self.product.create_table()
+        self.stock.create_table()
+        self.movement.create_table()
+        self.purchase_order.create_table()
+        self.migrate()
+
+    def schema_version(self):
+        """Versão do esquema registrada no banco (0 em um banco novo)."""
+        return self.stock.execute_query("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self, up_to: Optional[int] = None):
+        """Aplica as migrações de esquema ainda não aplicadas a este banco, até a versão 'up_to' (padrão: todas).
+
+        Cada migração é uma lista de comandos SQL ou de funções que recebem a conexão.
+        """
+        def apply(conn):
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, statements in self.MIGRATIONS:
+                if target <= version or (up_to is not None and target > up_to):
+                    continue
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {target}")
+                logging.info(f"Migração de esquema {target} aplicada.")
+                version = target
+            return version
+
+        return self.pool.run_transaction(apply)
+
+    def explain_query_plan(self, query: str, params: Optional[tuple] = None):
+        """Retorna os passos do plano de execução do SQLite para a consulta."""
+        cursor = self.stock.execute_query(f"EXPLAIN QUERY PLAN {query}", params)
+        return [row[3] for row in cursor.fetchall()]
+
+    def check_query_plans(self):
+        """Confere se as consultas de relatório usam índice; retorna {consulta: plano} das que fazem varredura completa."""
+        full_scans = {}
+        for label, (query, params) in self.INDEXED_QUERIES.items():
+            plan = self.explain_query_plan(query, params)
+            if not any("USING" in step and "INDEX" in step for step in plan):
+                full_scans[label] = plan
+        if full_scans:
+            logging.warning(f"Consultas sem índice: {list(full_scans)}")
+        return full_scans
+
+    @instrumented
+    def register_product_movement(self, product_code: str, quantity: int, category: str):
+        """Registra uma movimentação de produto (ex.: venda, entrada).
+
+        A conferência do saldo, a atualização do estoque e o registro da movimentação
+        acontecem na mesma transação, então vendas simultâneas não se sobrescrevem.
+        """
+        result = self.pool.run_transaction(lambda conn: self.apply_product_movement(product_code, quantity, category))
+        if result:
+            name, new_stock = result
+            notify(f"Movimentação de {quantity} unidades do produto '{name}' registrada com sucesso. Estoque atual: {new_stock}.")
+            return new_stock
+
+        stock_data = self.stock.execute_query(
+            "SELECT name FROM Stock WHERE product_code = ?", (product_code,)
+        ).fetchone()
+        if stock_data:
+            logging.warning(f"Estoque insuficiente para realizar a movimentação do produto {product_code}.")
+            notify(f"Erro: Estoque insuficiente para o produto '{stock_data[0]}' (código: {product_code}).")
+        else:
+            notify(f"Erro: Produto com código '{product_code}' não encontrado.")
+
+    @instrumented
+    def apply_product_movement(self, product_code: str, quantity: int, category: str):
+        """Atualiza o estoque e registra a movimentação na transação corrente.
+
+        Retorna (nome, estoque atualizado) ou None se o produto não existir ou o saldo for insuficiente.
+        """
+        delta = quantity if category == "ENTRY" else -quantity
+        result = self.stock.apply_movement(product_code, delta)
+        if result:
+            name, new_stock = result
+            self.movement.add_movement(product_code, name, category, quantity, new_stock - delta, new_stock)
+            self.snapshot.append_when_due()
+        return result
+
+    @instrumented
+    def apply_movement_lines(self, lines):
+        """Aplica as linhas (product_code, quantity, category) na transação corrente, na ordem recebida.
+
+        Retorna (estoque resultante de cada linha, ou None se rejeitada; [(índice, linha, motivo)]).
+        """
+        levels = self.stock.get_stock_levels({line[0] for line in lines})
+        balances = {product_code: real_stock for product_code, (real_stock, _) in levels.items()}
+        timestamp = datetime.now()
+        movements, after_stocks, rejected = [], [], []
+
+        for index, (product_code, quantity, category) in enumerate(lines):
+            after_stocks.append(None)
+            if product_code not in balances:
+                rejected.append((index, (product_code, quantity, category), "produto não encontrado"))
+                continue
+            before_stock = balances[product_code]
+            after_stock = before_stock + quantity if category == "ENTRY" else before_stock - quantity
+            if after_stock < 0:
+                rejected.append((index, (product_code, quantity, category), "estoque insuficiente"))
+                continue
+            balances[product_code] = after_stocks[index] = after_stock
+            movements.append((product_code, levels[product_code][1], category, quantity, before_stock, after_stock, timestamp))
+
+        deltas = {product_code: balances[product_code] - real_stock for product_code, (real_stock, _) in levels.items()}
+        self.stock.apply_deltas(deltas)
+        self.movement.add_movements(movements)
+        if movements:
+            self.snapshot.append_when_due()
+        return after_stocks, rejected
+
+    @instrumented
+    def register_movements_bulk(self, lines):
+        """Registra um lote de movimentações (product_code, quantity, category) em uma única transação.
+
+        As linhas de cada produto são aplicadas na ordem recebida; uma linha que deixaria o
+        estoque negativo, ou de produto inexistente, é rejeitada sem afetar as demais.
+        Retorna um resumo com as linhas aplicadas, as rejeitadas e a vazão em linhas/s.
+        """
+        start = time.perf_counter()
+        lines = list(lines)
+        rejected = []
+
+        def apply(conn):
+            # Em caso de nova tentativa o lote é reavaliado do início
+            _, rejections = self.apply_movement_lines(lines)
+            rejected[:] = rejections
+            return len(lines) - len(rejections)
+
+        applied = self.pool.run_transaction(apply)
+        elapsed = time.perf_counter() - start
+        lines_per_sec = applied / elapsed if elapsed else 0.0
+
+        if rejected:
+            logging.warning(f"{len(rejected)} linhas rejeitadas no lote de movimentações.")
+        notify(f"Lote de movimentações: {applied} linhas aplicadas, {len(rejected)} rejeitadas ({lines_per_sec:,.0f} linhas/s).")
+        return {'applied': applied, 'rejected': list(rejected), 'lines_per_sec': lines_per_sec}
+
+    @instrumented
+    def relocate_products(self, moves):
+        """Muda a localização de vários produtos, de {código: nova localização}, em uma única transação.
+
+        Cada mudança é registrada como movimentação RELOCATION_CATEGORY (quantidade 0, estoque inalterado)
+        e, com as localizações anterior e nova, na trilha de auditoria. Retorna um resumo com os
+        produtos movidos, os que já estavam na localização e os que não estão no estoque.
+        """
+        moves = dict(moves)
+
+        def apply(conn):
+            relocations, unchanged, not_found = self.location.apply_relocations(moves)
+            timestamp = datetime.now()
+            self.movement.add_movements([(product_code, name, RELOCATION_CATEGORY, 0, real_stock, real_stock, timestamp)
+                                         for product_code, name, real_stock, _, _ in relocations])
+            return relocations, unchanged, not_found
+
+        relocations, unchanged, not_found = self.pool.run_transaction(apply)
+        for product_code, _, _, old_location, new_location in relocations:
+            logging.info(f"Produto {product_code} movido de {old_location} para {new_location}.",
+                         extra={'event': 'relocation', 'product_code': product_code,
+                                'from_location': old_location, 'to_location': new_location})
+        if not_found:
+            logging.warning(f"{len(not_found)} produtos não encontrados no estoque para mudança de localização.")
+        notify(f"Mudança de localização: {len(relocations)} produtos movidos, {len(unchanged)} já estavam no destino, "
+               f"{len(not_found)} não encontrados.")
+        return {'relocated': [relocation[0] for relocation in relocations], 'unchanged': unchanged,
+                'not_found': not_found}
+
+    @instrumented
+    def simple_report(self, product_code: str):
+        """Mostra nome, localização e estoque atual de um produto."""
+        stock = self.stock.lookup_stock(product_code)
+        if stock:
+            print(f"O produto '{stock[1]}' ({stock[0]}) está na locação {stock[3]}, com {stock[2]} unidades em estoque.")
+        else:
+            print(f"Erro: Produto com código '{product_code}' não encontrado.")
+        return stock
+
+    @instrumented
+    def generate_weekly_report(self):
+        """Gera um relatório semanal mostrando o status crítico do estoque e as movimentações dos últimos 7 dias.
+
+        As movimentações vêm somadas por produto e categoria dos snapshots diários e, para os dias
+        ainda sem snapshot (normalmente, só hoje), das movimentações do dia. Só leitura.
+        """
+        from dateutil.relativedelta import relativedelta
+
+        print("=== Relatório Semanal ===")
+        # Relatório de estoque crítico, lido do resumo mantido pelos triggers
+        low_stock = self.stock_status.get_products('low_stock')
+        over_stock = self.stock_status.get_products('over_stock')
+
+        print("\nProdutos com estoque crítico (abaixo do mínimo):")
+        print(low_stock if not low_stock.empty else "Nenhum produto com estoque crítico.")
+
+        print("\nProdutos com excesso de estoque:")
+        print(over_stock if not over_stock.empty else "Nenhum produto com excesso de estoque.")
+
+        # Movimentações dos últimos 7 dias, incluindo hoje
+        today = datetime.now().date()
+        movements_df = self.snapshot.period_report(today - relativedelta(days=6), today + relativedelta(days=1))
+
+        print("\nMovimentações nos últimos 7 dias, por produto e categoria:")
+        print(movements_df if not movements_df.empty else "Nenhuma movimentação registrada nos últimos 7 dias.")
+
+    @instrumented
+    def generate_monthly_report(self, month: Optional[str] = None):
+        """Totais do mês 'month' (AAAA-MM; padrão: o mês atual) por produto e categoria, lidos dos snapshots diários."""
+        from dateutil.relativedelta import relativedelta
+
+        start = datetime.strptime(month, '%Y-%m').date() if month else datetime.now().date().replace(day=1)
+        monthly = self.snapshot.period_report(start, start + relativedelta(months=1))
+
+        print(f"=== Relatório Mensal ({start:%Y-%m}) ===")
+        print(monthly if not monthly.empty else "Nenhuma movimentação registrada no mês.")
+        return monthly
+
+    @instrumented
+    def compare_weeks(self):
+        """Compara as quantidades movimentadas nos últimos 7 dias com as dos 7 anteriores, por categoria e produto."""
+        comparison = self.snapshot.week_over_week()
+
+        print("=== Comparação Semanal (últimos 7 dias x 7 anteriores) ===")
+        if comparison.empty:
+            print("Nenhuma movimentação registrada nas duas últimas semanas.")
+            return comparison
+        summary = comparison.groupby('movement_category')[['current_quantity', 'previous_quantity', 'quantity_change']].sum()
+        print("\nPor categoria:")
+        print(summary)
+        print("\nPor produto (maiores variações primeiro):")
+        print(comparison)
+        return comparison
+
+    @instrumented
+    def perform_detailed_analysis(self, sales_days=30, purchase_months=2, purchase_count=4):
+        """
+        Realiza uma análise detalhada do estoque:
+        1. Identifica produtos que não tiveram vendas nos últimos 'sales_days'.
+        2. Identifica produtos com excesso de reposições nos últimos 'purchase_months'.
+        """
+        from dateutil.relativedelta import relativedelta
+
+        print("=== Análise Detalhada ===")
+        # Identificar produtos sem vendas nos últimos 'sales_days'
+        cutoff_date_sales = datetime.now() - relativedelta(days=sales_days)
+        unsold_products = self.get_unsold_products(cutoff_date_sales)
+
+        print(f"\nProdutos sem vendas nos últimos {sales_days} dias:")
+        print(unsold_products if not unsold_products.empty else "Todos os produtos tiveram vendas recentes.")
+
+        # Identificar produtos com excesso de reposições nos últimos 'purchase_months'
+        cutoff_date_purchases = datetime.now() - relativedelta(months=purchase_months)
+        frequent_purchases = self.get_frequent_purchases(cutoff_date_purchases, purchase_count)
+
+        print(f"\nProdutos com mais de {purchase_count} reposições nos últimos {purchase_months} meses:")
+        print(frequent_purchases if not frequent_purchases.empty else "Nenhum produto excedeu o limite de reposições.")
+
+    def get_unsold_products(self, since: datetime):
+        """Produtos cadastrados sem nenhuma venda desde 'since', lidos dos agregados por produto.
+
+        Os produtos que só têm estoque (categoria vazia, criados por trg_stock_product) ficam de fora.
+        """
+        query = """
+        SELECT p.product_code, p.name
+        FROM Products p
+        LEFT JOIN ProductActivity a ON a.product_code = p.product_code
+        WHERE p.category != '' AND (a.last_sale IS NULL OR a.last_sale < ?)
+        """
+        return self.movement.read_dataframe(query, (since,))
+
+    def get_frequent_purchases(self, since: datetime, purchase_count: int):
+        """Produtos com pelo menos 'purchase_count' reposições desde o dia de 'since', lidos dos agregados diários."""
+        query = """
+        SELECT product_code, SUM(purchase_count) AS purchase_count
+        FROM ProductDailyActivity
+        WHERE day >= date(?) AND purchase_count > 0
+        GROUP BY product_code
+        HAVING SUM(purchase_count) >= ?
+        ORDER BY purchase_count DESC
+        """
+        return self.movement.read_dataframe(query, (since, purchase_count))
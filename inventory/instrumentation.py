@@ -0,0 +1,307 @@
+"""Instrumentação das consultas e das operações do sistema, desligada por padrão.
+
+Ligada, cada consulta grava os tempos de obtenção da conexão, execução e commit, e as linhas
+afetadas, em histogramas agrupados pela operação que a disparou e pela forma normalizada do
+comando (fingerprint). As operações do gerenciador gravam o tempo total.
+
+Variáveis de ambiente, lidas na importação:
+    INVENTORY_METRICS=1                 liga os histogramas
+    INVENTORY_PROFILE=cprofile|sample   perfila as operações com cProfile ou por amostragem de pilhas
+    INVENTORY_PROFILE_OUTPUT=arquivo    onde o perfil é gravado ao sair do programa
+    INVENTORY_SAMPLE_INTERVAL=segundos  intervalo entre amostras no modo 'sample' (padrão: 0.005)
+"""
+import atexit
+import functools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+_SPACES = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|(?<![\w?.])\d+(?:\.\d+)?")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def fingerprint(query: str):
+    """Forma normalizada do comando: espaços colapsados, literais e listas IN trocados por marcadores."""
+    text = _LITERALS.sub('?', _SPACES.sub(' ', query).strip())
+    return _LISTS.sub('(...)', text)
+
+
+class Histogram:
+    """Histograma de durações em faixas exponenciais: a faixa b vai de 2^b a 2^(b+1) microssegundos."""
+    BUCKETS = 32
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.buckets = [0] * self.BUCKETS
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min((int(seconds * 1e6) or 1).bit_length() - 1, self.BUCKETS - 1)] += 1
+
+    def percentile(self, fraction: float):
+        """Estimativa do percentil: o limite superior da faixa onde ele cai, sem passar do máximo."""
+        target, seen = fraction * self.count, 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min(2 ** (bucket + 1) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'total_ms': self.total * 1000,
+            'mean_ms': self.total / self.count * 1000,
+            'min_ms': self.min * 1000,
+            'p50_ms': self.percentile(0.50) * 1000,
+            'p95_ms': self.percentile(0.95) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+            'max_ms': self.max * 1000,
+            # Limite superior de cada faixa em µs: quantidade
+            'buckets_us': {2 ** (bucket + 1): count for bucket, count in enumerate(self.buckets) if count},
+        }
+
+
+class StatementStats:
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.connect = Histogram()
+        self.execute = Histogram()
+        self.commit = Histogram()
+
+
+class Instrumentation:
+    """Coletor de métricas do processo; use a instância 'instrumentation' deste módulo."""
+    PROFILE_MODES = ('cprofile', 'sample')
+    # Limite de comandos distintos guardados no cache de fingerprints
+    MAX_FINGERPRINTS = 10000
+
+    def __init__(self):
+        self.enabled = False
+        self.profile_mode = None
+        # Verificado no caminho quente: qualquer coleta (métricas ou perfil) ligada
+        self.active = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._fingerprints = {}
+        self._operations = {}
+        self._statements = {}
+        self._profiles = []
+        self._samples = Counter()
+        self._sampler = None
+        self._sample_interval = 0.005
+
+    # ☆☆ Liga e desliga ☆☆
+    def enable(self):
+        self.enabled = True
+        self.active = True
+
+    def disable(self):
+        self.enabled = False
+        self.active = self.profile_mode is not None
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+            self._statements.clear()
+            self._profiles.clear()
+            self._samples.clear()
+
+    def configure_from_env(self, environ=os.environ):
+        """Liga as métricas e o perfil conforme as variáveis INVENTORY_*."""
+        if environ.get('INVENTORY_METRICS', '') not in ('', '0'):
+            self.enable()
+        mode = environ.get('INVENTORY_PROFILE')
+        if mode:
+            interval = float(environ.get('INVENTORY_SAMPLE_INTERVAL', self._sample_interval))
+            self.start_profiling(mode, interval)
+            output = environ.get('INVENTORY_PROFILE_OUTPUT') or (
+                'inventory_profile.prof' if mode == 'cprofile' else 'inventory_profile.folded')
+            atexit.register(self.dump_profile, output)
+
+    # ☆☆ Coleta ☆☆
+    def fingerprint(self, query: str):
+        cached = self._fingerprints.get(query)
+        if cached is None:
+            cached = fingerprint(query)
+            if len(self._fingerprints) < self.MAX_FINGERPRINTS:
+                self._fingerprints[query] = cached
+        return cached
+
+    def current_operation(self):
+        """Operação mais externa em andamento na thread (a que o chamador pediu), ou None."""
+        stack = getattr(self._local, 'stack', None)
+        return stack[0] if stack else None
+
+    def record_statement(self, query: str, connect: float, execute: float, commit=None, rows: int = -1):
+        """Grava uma execução do comando sob a operação corrente; commit=None quando não houve commit."""
+        key = (self.current_operation(), self.fingerprint(query))
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = StatementStats()
+            stats.calls += 1
+            if rows > 0:
+                stats.rows += rows
+            stats.connect.add(connect)
+            stats.execute.add(execute)
+            if commit is not None:
+                stats.commit.add(commit)
+
+    def run_operation(self, name: str, function, args, kwargs):
+        """Executa a operação registrando seu tempo; só a mais externa da thread é perfilada."""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        profiler = self._thread_profiler() if not stack and self.profile_mode == 'cprofile' else None
+        stack.append(name)
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if self.enabled:
+                with self._lock:
+                    histogram = self._operations.get(name)
+                    if histogram is None:
+                        histogram = self._operations[name] = Histogram()
+                    histogram.add(elapsed)
+
+    # ☆☆ Consulta ☆☆
+    def snapshot(self):
+        """Cópia das métricas: histogramas por operação e por (operação, comando), mais lentos primeiro."""
+        with self._lock:
+            operations = {name: histogram.summary() for name, histogram in sorted(self._operations.items())}
+            statements = [
+                {
+                    'operation': operation or '(sem operação)',
+                    'statement': statement,
+                    'calls': stats.calls,
+                    'rows': stats.rows,
+                    'total_ms': (stats.connect.total + stats.execute.total + stats.commit.total) * 1000,
+                    'connect': stats.connect.summary(),
+                    'execute': stats.execute.summary(),
+                    'commit': stats.commit.summary(),
+                }
+                for (operation, statement), stats in self._statements.items()
+            ]
+        statements.sort(key=lambda entry: entry['total_ms'], reverse=True)
+        return {'enabled': self.enabled, 'operations': operations, 'statements': statements}
+
+    def dump(self, path: str):
+        """Grava o snapshot em JSON e o devolve."""
+        snapshot = self.snapshot()
+        with open(path, 'w', encoding='utf-8') as output:
+            json.dump(snapshot, output, ensure_ascii=False, indent=2)
+        logging.info(f"Métricas de instrumentação gravadas em {path}")
+        return snapshot
+
+    def breakdown(self, operation: str):
+        """Tempo total por comando e fase (connect/execute/commit) de uma operação, em ms."""
+        return [
+            {phase: entry[phase].get('total_ms', 0.0) for phase in ('connect', 'execute', 'commit')}
+            | {'statement': entry['statement'], 'calls': entry['calls'], 'rows': entry['rows']}
+            for entry in self.snapshot()['statements'] if entry['operation'] == operation
+        ]
+
+    # ☆☆ Perfil ☆☆
+    def start_profiling(self, mode: str, interval: float = 0.005):
+        """'cprofile' perfila cada operação externa; 'sample' amostra as pilhas de todas as threads."""
+        if mode not in self.PROFILE_MODES:
+            raise ValueError(f"Modo de perfil desconhecido: {mode!r} (use {' ou '.join(self.PROFILE_MODES)})")
+        self.stop_profiling()
+        self.profile_mode = mode
+        self.active = True
+        if mode == 'sample':
+            self._sample_interval = interval
+            self._sampler = threading.Thread(target=self._sample_loop, name='inventory-sampler', daemon=True)
+            self._sampler.start()
+
+    def stop_profiling(self):
+        sampler, self._sampler = self._sampler, None
+        self.profile_mode = None
+        self.active = self.enabled
+        if sampler is not None:
+            sampler.join()
+
+    def _thread_profiler(self):
+        import cProfile
+        profiler = getattr(self._local, 'profiler', None)
+        if profiler is None:
+            profiler = self._local.profiler = cProfile.Profile()
+            with self._lock:
+                self._profiles.append(profiler)
+        return profiler
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while self._sampler is not None and self.profile_mode == 'sample':
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                with self._lock:
+                    self._samples[';'.join(reversed(stack))] += 1
+            time.sleep(self._sample_interval)
+
+    def dump_profile(self, path: str):
+        """Grava o perfil coletado: estatísticas pstats (cprofile) ou pilhas no formato 'folded' (sample)."""
+        with self._lock:
+            profiles = list(self._profiles)
+            samples = dict(self._samples)
+        if profiles:
+            import pstats
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(path)
+        elif samples:
+            with open(path, 'w', encoding='utf-8') as output:
+                for stack, count in sorted(samples.items()):
+                    output.write(f"{stack} {count}\n")
+        else:
+            return
+        logging.info(f"Perfil gravado em {path}")
+
+
+instrumentation = Instrumentation()
+
+
+def instrumented(function):
+    """Registra o tempo da operação (e o perfil, se ligado) quando a instrumentação está ativa."""
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not instrumentation.active:
+            return function(*args, **kwargs)
+        return instrumentation.run_operation(name, function, args, kwargs)
+    return wrapper
+
+
+instrumentation.configure_from_env()
@@ -0,0 +1,199 @@
+"""Logging do sistema: trilha de auditoria em arquivo rotativo, gravada fora das operações, e mensagens ao usuário.
+
+configure_logging põe na raiz um QueueHandler: quem registra só enfileira o record, e a
+thread de um QueueListener formata e grava no arquivo os records, com um flush quando a fila
+esvazia; o arquivo gira ao atingir max_bytes. Com structured=True cada linha é um objeto JSON, incluindo
+os campos passados em extra=.
+
+As mensagens de confirmação das operações (produto adicionado, movimentação registrada, ...)
+passam por notify, que não imprime nada no modo silencioso (set_quiet ou INVENTORY_QUIET=1):
+cargas em lote não pagam a escrita no console, e a trilha de auditoria continua no log.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_quiet = os.environ.get('INVENTORY_QUIET', '') not in ('', '0')
+_handler = None
+_listener = None
+_file_handler = None
+# Atributos de processo e thread dos records, que os formatos do sistema não usam
+_RECORD_SWITCHES = ('logThreads', 'logProcesses', 'logMultiprocessing')
+_record_switches = {}
+
+
+class JsonFormatter(logging.Formatter):
+    """Um objeto JSON por linha: horário, nível, logger, mensagem e os campos extras do record."""
+    RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in self.RESERVED)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler que confere o tamanho sem seek/tell e, com buffered=True, sem flush a cada record.
+
+    O tamanho é acompanhado pelo que o próprio handler escreve (em caracteres, uma aproximação
+    dos bytes); com buffered=True quem escreve chama flush() ao terminar um lote de records.
+    """
+
+    def __init__(self, filename, max_bytes=0, backup_count=0, encoding='utf-8', buffered=False):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding)
+        self.buffered = buffered
+        self.size = os.path.getsize(self.baseFilename) if os.path.exists(self.baseFilename) else 0
+
+    def emit(self, record):
+        try:
+            line = self.format(record) + self.terminator
+            if self.maxBytes and self.size and self.size + len(line) >= self.maxBytes:
+                self.doRollover()
+                self.size = 0
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(line)
+            self.size += len(line)
+            if not self.buffered:
+                self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+
+class LightQueueHandler(QueueHandler):
+    """Enfileira o próprio record, sem formatá-lo nem copiá-lo na thread de quem registra.
+
+    Só o que pode mudar depois da chamada é resolvido aqui: a mensagem com seus argumentos e a
+    exceção, que vira texto.
+    """
+
+    def prepare(self, record):
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class BatchQueueListener(QueueListener):
+    """QueueListener que só dá flush nos handlers quando a fila esvazia: um flush por lote de records."""
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+
+
+def configure_logging(filename: str = 'inventory_system.log', level: int = logging.INFO, structured: bool = False,
+                      max_bytes: int = 10 * 2 ** 20, backup_count: int = 5, queued: bool = True,
+                      quiet: bool = None, force: bool = False):
+    """Configuração de logging, feita pelo ponto de entrada e não na importação do módulo.
+
+    Como logging.basicConfig, não altera uma configuração já feita pela aplicação, a menos que
+    force=True; uma configuração anterior feita por esta função é sempre substituída. Com queued=True
+    o arquivo é gravado pela thread do QueueListener. Os formatos do sistema não usam thread nem
+    processo de origem, então a coleta deles em cada record é desligada (logging.logThreads,
+    logProcesses e logMultiprocessing), como recomenda a documentação do logging.
+    """
+    global _handler, _listener, _file_handler
+    if quiet is not None:
+        set_quiet(quiet)
+    root = logging.getLogger()
+    stop_logging()
+    if root.handlers and not force:
+        return
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+    _file_handler = BufferedRotatingFileHandler(filename, max_bytes, backup_count, buffered=queued)
+    _file_handler.setFormatter(JsonFormatter() if structured else logging.Formatter(LOG_FORMAT))
+    if queued:
+        records = queue.SimpleQueue()
+        _listener = BatchQueueListener(records, _file_handler, respect_handler_level=True)
+        _listener.start()
+        _handler = LightQueueHandler(records)
+    else:
+        _handler = _file_handler
+    for switch in _RECORD_SWITCHES:
+        _record_switches[switch] = getattr(logging, switch)
+        setattr(logging, switch, False)
+    root.setLevel(level)
+    root.addHandler(_handler)
+
+
+def stop_logging():
+    """Grava o que ainda está na fila e remove o handler instalado por configure_logging."""
+    global _handler, _listener, _file_handler
+    listener, _listener = _listener, None
+    handler, _handler = _handler, None
+    file_handler, _file_handler = _file_handler, None
+    if handler is not None:
+        logging.getLogger().removeHandler(handler)
+    for switch, value in _record_switches.items():
+        setattr(logging, switch, value)
+    _record_switches.clear()
+    if listener is not None:
+        listener.stop()
+    if file_handler is not None:
+        file_handler.close()
+
+
+def _before_fork():
+    # Esvazia o buffer e segura o arquivo durante o fork: o filho não herda linhas por gravar
+    if _listener is not None:
+        _file_handler.acquire()
+        _file_handler.flush()
+
+
+def _after_fork_in_parent():
+    if _listener is not None:
+        _file_handler.release()
+
+
+def _after_fork_in_child():
+    # O filho herda o QueueHandler, mas não a thread que esvazia a fila: passa a gravar direto.
+    # O lock do handler é recriado pelo próprio logging no filho.
+    global _handler, _listener
+    if _listener is not None:
+        root = logging.getLogger()
+        root.removeHandler(_handler)
+        _handler, _listener = _file_handler, None
+        _handler.buffered = False
+        root.addHandler(_handler)
+
+
+def set_quiet(quiet: bool = True):
+    """Liga ou desliga o modo silencioso das mensagens de confirmação."""
+    global _quiet
+    _quiet = quiet
+
+
+def notify(message: str):
+    """Mensagem ao usuário sobre o resultado de uma operação; omitida no modo silencioso."""
+    if not _quiet:
+        print(message)
+
+
+atexit.register(stop_logging)
+# os.register_at_fork só existe em sistemas Unix
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_before_fork, after_in_parent=_after_fork_in_parent,
+                        after_in_child=_after_fork_in_child)
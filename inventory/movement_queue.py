@@ -0,0 +1,143 @@
+"""Fila de gravação (write-behind) das movimentações, com group commit."""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MovementQueue:
+    """Acumula movimentações e variações de estoque de vários chamadores e as grava em uma só transação.
+
+    No modo 'group', o lote é gravado quando chega a 'max_batch' movimentações ou quando a mais
+    antiga já esperou 'max_delay' segundos. No modo 'sync', cada movimentação é gravada e confirmada
+    antes de submit retornar. Nos dois modos o futuro só é resolvido depois do commit, com o estoque
+    resultante (ou None, se a movimentação foi rejeitada).
+
+    O pool abre as conexões com synchronous=NORMAL, em que o commit em WAL não espera o fsync:
+    sobrevive à queda do processo, mas não à do sistema. Com durable=True (padrão) cada lote é
+    gravado com synchronous=FULL, um fsync por commit: por movimentação no modo 'sync' e por lote
+    no modo 'group'. Com durable=False os dois modos só diferem em quando o futuro é resolvido.
+    """
+    MODES = ('sync', 'group')
+
+    def __init__(self, manager, mode: str = 'group', max_batch: int = 500, max_delay: float = 0.01,
+                 max_pending: int = 10000, on_commit=None, durable: bool = True):
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de durabilidade inválido: '{mode}'.")
+        self.manager = manager
+        self.mode = mode
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.durable = durable
+        # Chamado após cada commit com o número de movimentações gravadas no lote
+        self.on_commit = on_commit
+        self.stats = {'batches': 0, 'movements': 0, 'rejected': 0, 'failed_batches': 0}
+        # Fila limitada: quem submete espera quando a gravação não acompanha
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._lock = threading.Lock()
+        self._flusher = None
+        if mode == 'group':
+            self._flusher = threading.Thread(target=self._run, name='movement-queue', daemon=True)
+            self._flusher.start()
+
+    def submit(self, product_code: str, quantity: int, category: str) -> Future:
+        """Enfileira a movimentação; retorna um Future com o estoque resultante."""
+        future = Future()
+        entry = ((product_code, quantity, category), future)
+        if self.mode == 'sync':
+            self._check_open()
+            self._flush([entry])
+        else:
+            self._put(entry)
+        return future
+
+    def flush(self):
+        """Grava imediatamente o que está na fila e espera o commit."""
+        if self.mode == 'group':
+            marker = Future()
+            self._put(marker)
+            marker.result()
+
+    def close(self):
+        """Grava o que resta na fila e encerra a thread de gravação; depois disso submit levanta RuntimeError."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._flusher is not None:
+                self._pending.put(None)
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+
+    def _check_open(self):
+        if self._closed:
+            raise RuntimeError("A fila de movimentações já foi encerrada.")
+
+    def _put(self, item):
+        # Sob o lock, para que nada entre na fila depois do marcador de encerramento
+        with self._lock:
+            self._check_open()
+            self._pending.put(item)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._pending.get()
+            batch, markers = [], []
+            deadline = time.monotonic() + self.max_delay
+            while True:
+                if item is None:
+                    stopping = True
+                    break
+                if isinstance(item, Future):
+                    markers.append(item)
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.max_batch or remaining <= 0:
+                    break
+                try:
+                    item = self._pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._flush(batch)
+            for marker in markers:
+                marker.set_result(None)
+
+    def _flush(self, batch):
+        lines = [line for line, _ in batch]
+        try:
+            after_stocks, rejected = self._commit(lines)
+        except Exception as e:
+            logging.error(f"Falha ao gravar lote de {len(lines)} movimentações: {e}")
+            self.stats['failed_batches'] += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        applied = len(lines) - len(rejected)
+        self.stats['batches'] += 1
+        self.stats['movements'] += applied
+        self.stats['rejected'] += len(rejected)
+        if self.on_commit is not None:
+            self.on_commit(applied)
+        for (_, future), after_stock in zip(batch, after_stocks):
+            future.set_result(after_stock)
+
+    def _commit(self, lines):
+        pool = self.manager.pool
+        apply = lambda conn: self.manager.apply_movement_lines(lines)
+        if not self.durable:
+            return pool.run_transaction(apply)
+        # A conexão fica presa à thread durante o bloco, então a transação usa a mesma
+        with pool.connection() as conn:
+            previous = conn.execute("PRAGMA synchronous").fetchone()[0]
+            conn.execute("PRAGMA synchronous = FULL")
+            try:
+                return pool.run_transaction(apply)
+            finally:
+                conn.execute(f"PRAGMA synchronous = {previous}")
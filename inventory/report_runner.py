@@ -0,0 +1,156 @@
+"""Relatório semanal e análise detalhada gerados em paralelo, todos sobre o mesmo snapshot do banco.
+
+Cada seção chama o mesmo método do InventoryManagerRefactored usado pelos relatórios
+sequenciais. As seções são divididas entre algumas threads; cada thread abre uma transação de
+leitura (modo WAL, sem bloquear quem grava) em uma conexão do pool. Para que todas leiam o mesmo
+snapshot, o coordenador compara o PRAGMA data_version antes de as threads começarem e depois de
+todas terem fixado o seu snapshot: se nenhuma gravação foi confirmada nesse intervalo, os
+snapshots são iguais. Se houve, a tentativa é descartada; depois de 'attempts' tentativas as
+seções rodam em sequência em uma única transação de leitura.
+
+As seções não são divididas em faixas de código de produto: cada uma é uma chamada inteira ao
+método do manager, que não recebe faixa. A seção mais pesada (period_report) agrega por ID de
+produto antes de juntar com Products, então uma faixa de códigos só filtraria depois da
+agregação, e cada parte refaria a agregação inteira.
+"""
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+
+def _weekly_movements(manager, now, options):
+    today = now.date()
+    return manager.snapshot.period_report(today - timedelta(days=options['movement_days'] - 1),
+                                          today + timedelta(days=1))
+
+
+def _frequent_purchases(manager, now, options):
+    from dateutil.relativedelta import relativedelta
+
+    return manager.get_frequent_purchases(now - relativedelta(months=options['purchase_months']),
+                                          options['purchase_count'])
+
+
+# Seção: função(manager, agora, opções) que devolve o DataFrame da seção
+SECTIONS = {
+    'low_stock': lambda manager, now, options: manager.stock_status.get_products('low_stock'),
+    'over_stock': lambda manager, now, options: manager.stock_status.get_products('over_stock'),
+    'weekly_movements': _weekly_movements,
+    'unsold_products': lambda manager, now, options: manager.get_unsold_products(
+        now - timedelta(days=options['sales_days'])),
+    'frequent_purchases': _frequent_purchases,
+}
+
+SECTION_TITLES = {
+    'low_stock': "Produtos com estoque crítico (abaixo do mínimo)",
+    'over_stock': "Produtos com excesso de estoque",
+    'weekly_movements': "Movimentações do período, por produto e categoria",
+    'unsold_products': "Produtos sem vendas recentes",
+    'frequent_purchases': "Produtos com reposições frequentes",
+}
+
+# Primeira leitura da transação: é ela que fixa o snapshot no modo WAL
+PIN_SNAPSHOT = "SELECT COUNT(*) FROM sqlite_master"
+
+
+class ReportRunner:
+    def __init__(self, manager, threads: int = None, attempts: int = 5):
+        self.manager = manager
+        # Uma conexão do pool fica livre para quem grava enquanto o relatório roda
+        limit = max(1, min(len(SECTIONS), manager.pool.size - 1))
+        self.threads = min(threads, limit) if threads else limit
+        self.attempts = attempts
+
+    def run(self, movement_days=7, sales_days=30, purchase_months=2, purchase_count=4):
+        """Gera todas as seções; retorna ({seção: DataFrame}, {seção: tempos})."""
+        options = {'movement_days': movement_days, 'sales_days': sales_days,
+                   'purchase_months': purchase_months, 'purchase_count': purchase_count}
+        now = datetime.now()
+        groups = [list(SECTIONS)[index::self.threads] for index in range(self.threads)]
+
+        start = time.perf_counter()
+        outputs, attempts = None, 0
+        if len(groups) > 1:
+            with ThreadPoolExecutor(max_workers=self.threads) as executor:
+                while outputs is None and attempts < self.attempts:
+                    attempts += 1
+                    outputs = self._run_aligned(executor, groups, now, options)
+        parallel = outputs is not None
+        if not parallel:
+            # Sem threads (ou sem conseguir alinhar os snapshots): tudo em uma transação só
+            with self.manager.pool.read_transaction():
+                outputs = self._run_group(list(SECTIONS), now, options)
+
+        results, timings = {}, {}
+        for name in SECTIONS:
+            frame, seconds = outputs[name]
+            results[name] = frame
+            timings[name] = {'seconds': seconds, 'rows': len(frame)}
+        timings['total'] = {'seconds': time.perf_counter() - start, 'attempts': attempts, 'parallel': parallel}
+        return results, timings
+
+    def _run_aligned(self, executor, groups, now, options):
+        """Uma tentativa em paralelo; retorna None se alguma gravação foi confirmada enquanto as threads começavam."""
+        # Quem esperar mais do que isso (uma thread sem conexão, por exemplo) desfaz a tentativa
+        pinned = threading.Barrier(len(groups) + 1, timeout=2 * self.manager.pool.timeout)
+        verdict = {}
+
+        def worker(sections):
+            try:
+                with self.manager.pool.read_transaction() as conn:
+                    conn.execute(PIN_SNAPSHOT).fetchone()
+                    pinned.wait()
+                    pinned.wait()
+                    if not verdict['aligned']:
+                        return None
+                    return self._run_group(sections, now, options)
+            except threading.BrokenBarrierError:
+                return None
+            except Exception:
+                # Inclusive o tempo esgotado esperando uma conexão do pool: libera as outras threads
+                pinned.abort()
+                raise
+
+        # O coordenador usa uma conexão própria, fora do pool: o data_version só muda com os commits das outras
+        conn = sqlite3.connect(self.manager.db_path)
+        try:
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            futures = [executor.submit(worker, sections) for sections in groups]
+            try:
+                pinned.wait()
+                verdict['aligned'] = conn.execute("PRAGMA data_version").fetchone()[0] == version
+                pinned.wait()
+            except threading.BrokenBarrierError:
+                verdict['aligned'] = False
+        finally:
+            conn.close()
+        parts = [future.result() for future in futures]
+        if not verdict['aligned']:
+            return None
+        outputs = {}
+        for part in parts:
+            outputs.update(part)
+        return outputs
+
+    def _run_group(self, sections, now, options):
+        outputs = {}
+        for name in sections:
+            started_at = time.perf_counter()
+            frame = SECTIONS[name](self.manager, now, options)
+            outputs[name] = (frame, time.perf_counter() - started_at)
+        return outputs
+
+    def print_report(self, **options):
+        """Gera as seções em paralelo e mostra cada uma com o seu tempo."""
+        results, timings = self.run(**options)
+        print("=== Relatório Semanal e Análise Detalhada ===")
+        for name, frame in results.items():
+            timing = timings[name]
+            print(f"\n{SECTION_TITLES[name]} ({timing['rows']} linhas, {timing['seconds'] * 1000:.0f} ms):")
+            print(frame if not frame.empty else "Nenhum registro.")
+        total = timings['total']
+        mode = f"com {self.threads} threads" if total['parallel'] else "em sequência"
+        print(f"\nTempo total: {total['seconds'] * 1000:.0f} ms {mode}.")
+        return results, timings
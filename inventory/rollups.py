@@ -0,0 +1,278 @@
+"""Agregados do estoque por categoria e por localização, com drill-down até o produto, mantidos em memória."""
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from .core import RELOCATION_CATEGORY, STOCK_STATUSES, stock_status_codes
+
+
+class RollupEngine:
+    """Calcula unidades, valor do estoque, produtos em estoque baixo/excesso e volume movimentado por grupo.
+
+    Um retrato por produto (arrays numpy na ordem do ID do produto) é lido em uma passada e fica
+    em memória; cada agregado sai de um np.bincount sobre o retrato, e o drill-down de um grupo
+    até seus produtos usa a ordenação por grupo já calculada, sem voltar ao banco.
+
+    O retrato cobre os produtos cadastrados com estoque; os que só têm estoque (categoria vazia)
+    ficam de fora. Ele é invalidado pelas movimentações: a cada consulta o engine compara a
+    sequência de MovementLog com a que já aplicou e relê só os produtos movimentados desde então.
+    Produtos ou estoques novos provocam uma releitura completa; o volume movimentado cobre os
+    últimos 'volume_days' dias, sem as mudanças de localização, e é recalculado quando o dia muda.
+    Alterações feitas sem movimentação (custo unitário, limites de estoque, cadastro de um produto
+    que já tinha estoque) só aparecem depois de invalidate().
+    """
+    DIMENSIONS = ('category', 'location')
+    COLUMNS = ['products', 'units', 'stock_value', 'low_stock', 'over_stock', 'movements', 'moved_quantity']
+
+    VERSION_QUERY = """
+    SELECT (SELECT seq FROM sqlite_sequence WHERE name = 'MovementLog'),
+           (SELECT MAX(rowid) FROM Stock),
+           (SELECT MAX(id) FROM Products)
+    """
+    # Mudanças de localização não movimentam quantidade e ficam fora do volume
+    RELOCATION_ID = "(SELECT id FROM MovementCategories WHERE name = ?)"
+    # Produtos com estoque que ainda não foram cadastrados (categoria vazia) ficam de fora
+    PRODUCTS_QUERY = """
+    SELECT p.id, s.product_code, s.name, p.category, s.location, s.real_stock, s.min_stock, s.max_stock,
+           coalesce(p.unit_cost, 0) AS unit_cost
+    FROM Stock s
+    JOIN Products p ON p.product_code = s.product_code
+    WHERE p.category != '' {where}
+    ORDER BY p.id
+    """
+
+    def __init__(self, manager, volume_days: int = 30):
+        self.manager = manager
+        self.volume_days = volume_days
+        self.stats = {'full_loads': 0, 'refreshes': 0, 'refreshed_products': 0}
+        self._lock = threading.RLock()
+        self._data = None
+        self._labels = {}
+        self._codes = {}
+        self._version = None
+        self._volume_day = None
+        self._rollups = {}
+        self._orders = {}
+
+    # ☆☆ Consulta ☆☆
+    def rollup(self, by='category'):
+        """Agregados por 'category', 'location' ou ('category', 'location'), um grupo por linha."""
+        import numpy as np
+        import pandas as pd
+
+        key = (by,) if isinstance(by, str) else tuple(by)
+        if not key or any(dimension not in self.DIMENSIONS for dimension in key):
+            raise ValueError(f"Agrupamento inválido: {by!r} (use {' e/ou '.join(self.DIMENSIONS)})")
+        with self._lock:
+            self._sync()
+            frame = self._rollups.get(key)
+            if frame is None:
+                data = self._data
+                if len(key) == 1:
+                    codes, size = data[key[0]], len(self._labels[key[0]])
+                    index = pd.Index(self._labels[key[0]], name=key[0])
+                else:
+                    sizes = [len(self._labels[dimension]) for dimension in key]
+                    codes, size = data[key[0]] * sizes[1] + data[key[1]], sizes[0] * sizes[1]
+                    index = pd.MultiIndex.from_product([self._labels[dimension] for dimension in key], names=key)
+                weights = {
+                    'products': None,
+                    'units': data['real_stock'],
+                    'stock_value': data['real_stock'] * data['unit_cost'],
+                    'low_stock': data['status'] == 0,
+                    'over_stock': data['status'] == 2,
+                    'movements': data['movements'],
+                    'moved_quantity': data['moved_quantity'],
+                }
+                frame = pd.DataFrame(
+                    {column: np.bincount(codes, weights=weight, minlength=size) for column, weight in weights.items()},
+                    index=index,
+                )
+                frame = frame[frame['products'] > 0].astype({column: 'int64' for column in self.COLUMNS
+                                                             if column != 'stock_value'})
+                self._rollups[key] = frame
+            return frame.copy()
+
+    def drill_down(self, category=None, location=None):
+        """Produtos de uma categoria e/ou localização, com os mesmos indicadores dos agregados."""
+        import numpy as np
+        import pandas as pd
+
+        filters = {dimension: value for dimension, value in (('category', category), ('location', location))
+                   if value is not None}
+        if not filters:
+            raise ValueError("Informe a categoria e/ou a localização do drill-down.")
+        with self._lock:
+            self._sync()
+            data = self._data
+            positions = None
+            for dimension, value in filters.items():
+                code = self._codes[dimension].get(value)
+                if code is None:
+                    positions = np.empty(0, dtype=np.int64)
+                    break
+                if positions is None:
+                    order, offsets = self._order(dimension)
+                    positions = order[offsets[code]:offsets[code + 1]]
+                else:
+                    positions = positions[data[dimension][positions] == code]
+            return pd.DataFrame({
+                'product_code': data['product_code'][positions],
+                'name': data['name'][positions],
+                'category': np.asarray(self._labels['category'], dtype=object)[data['category'][positions]],
+                'location': np.asarray(self._labels['location'], dtype=object)[data['location'][positions]],
+                'real_stock': data['real_stock'][positions],
+                'min_stock': data['min_stock'][positions],
+                'max_stock': data['max_stock'][positions],
+                'stock_value': data['real_stock'][positions] * data['unit_cost'][positions],
+                'status': pd.Categorical.from_codes(data['status'][positions], categories=STOCK_STATUSES),
+                'movements': data['movements'][positions],
+                'moved_quantity': data['moved_quantity'][positions],
+            })
+
+    def invalidate(self):
+        """Descarta o retrato; a próxima consulta relê todos os produtos."""
+        with self._lock:
+            self._data = None
+
+    # ☆☆ Retrato em memória ☆☆
+    def _sync(self):
+        """Deixa o retrato em dia com o banco, lendo tudo na mesma transação de leitura."""
+        pool = self.manager.pool
+        with pool.connection() as conn:
+            own_transaction = not pool.in_transaction()
+            if own_transaction:
+                conn.execute("BEGIN")
+            try:
+                version = conn.execute(self.VERSION_QUERY).fetchone()
+                today = datetime.now().date()
+                if self._data is None or version[1:] != self._version[1:]:
+                    self._load(conn)
+                    self._load_volume(conn, today)
+                elif today != self._volume_day:
+                    self._load_volume(conn, today)
+                elif version[0] != self._version[0]:
+                    self._apply_movements(conn, self._version[0] or 0, today)
+                self._version = version
+            finally:
+                if own_transaction:
+                    conn.rollback()
+
+    def _load(self, conn):
+        import numpy as np
+        import pandas as pd
+
+        frame = pd.read_sql_query(self.PRODUCTS_QUERY.format(where=''), conn)
+        data = {'id': frame['id'].to_numpy(np.int64)}
+        for column in ('product_code', 'name'):
+            data[column] = frame[column].to_numpy(object)
+        for dimension in self.DIMENSIONS:
+            codes, uniques = pd.factorize(frame[dimension].fillna(''))
+            data[dimension] = codes.astype(np.int64, copy=True)
+            self._labels[dimension] = list(uniques)
+            self._codes[dimension] = {label: code for code, label in enumerate(uniques)}
+        for column in ('real_stock', 'min_stock', 'max_stock'):
+            data[column] = frame[column].fillna(0).to_numpy(np.int64, copy=True)
+        data['unit_cost'] = frame['unit_cost'].to_numpy(np.float64, copy=True)
+        data['status'] = stock_status_codes(data['real_stock'], data['min_stock'], data['max_stock'])
+        data['movements'] = np.zeros(len(frame), dtype=np.int64)
+        data['moved_quantity'] = np.zeros(len(frame), dtype=np.int64)
+        self._data = data
+        self._rollups.clear()
+        self._orders.clear()
+        self.stats['full_loads'] += 1
+        logging.info(f"Agregados por categoria e localização: {len(frame)} produtos carregados.")
+
+    def _load_volume(self, conn, today):
+        """Volume movimentado por produto nos últimos 'volume_days' dias, dos snapshots diários."""
+        start, end = today - timedelta(days=self.volume_days - 1), today + timedelta(days=1)
+        totals, params, _, _ = self.manager.snapshot.daily_rows(conn, start, end)
+        rows = conn.execute(f"""
+            SELECT product_id, SUM(movement_count), SUM(quantity)
+            FROM ({totals})
+            WHERE category_id IS NOT {self.RELOCATION_ID}
+            GROUP BY product_id
+        """, params + [RELOCATION_CATEGORY]).fetchall()
+        data = self._data
+        data['movements'][:] = 0
+        data['moved_quantity'][:] = 0
+        self._add_volume(rows)
+        self._volume_day = today
+        self._rollups.clear()
+
+    def _add_volume(self, rows):
+        import numpy as np
+
+        data = self._data
+        if not rows or not len(data['id']):
+            return
+        product_ids, counts, quantities = (np.asarray(column, dtype=np.int64) for column in zip(*rows))
+        positions = np.minimum(np.searchsorted(data['id'], product_ids), len(data['id']) - 1)
+        # Produtos movimentados que não têm estoque ficam de fora
+        known = data['id'][positions] == product_ids
+        np.add.at(data['movements'], positions[known], counts[known])
+        np.add.at(data['moved_quantity'], positions[known], quantities[known])
+
+    def _apply_movements(self, conn, last_id, today):
+        """Soma o volume das movimentações novas e relê o estoque só dos produtos movimentados.
+
+        Os produtos que só mudaram de localização também são relidos, mas não somam volume.
+        """
+        import numpy as np
+
+        window_start = (today - timedelta(days=self.volume_days - 1)).isoformat()
+        rows = conn.execute(f"""
+            WITH counted AS (
+                SELECT product_id, moved_quantity, timestamp >= ? AND category_id IS NOT {self.RELOCATION_ID} AS counted
+                FROM MovementLog
+                WHERE id > ?
+            )
+            SELECT product_id, SUM(counted), SUM(CASE WHEN counted THEN moved_quantity ELSE 0 END)
+            FROM counted
+            GROUP BY product_id
+        """, (window_start, RELOCATION_CATEGORY, last_id)).fetchall()
+        self._add_volume(rows)
+
+        data = self._data
+        product_ids = [row[0] for row in rows]
+        for start in range(0, len(product_ids), 500):
+            chunk = product_ids[start:start + 500]
+            where = f"AND p.id IN ({', '.join('?' * len(chunk))})"
+            for product_id, _, _, category, location, real_stock, min_stock, max_stock, unit_cost in conn.execute(
+                    self.PRODUCTS_QUERY.format(where=where), chunk):
+                position = int(np.searchsorted(data['id'], product_id))
+                if position == len(data['id']) or data['id'][position] != product_id:
+                    # Produto cadastrado depois do retrato: relê tudo
+                    self._load(conn)
+                    self._load_volume(conn, today)
+                    return
+                data['real_stock'][position] = real_stock or 0
+                data['min_stock'][position] = min_stock or 0
+                data['max_stock'][position] = max_stock or 0
+                data['unit_cost'][position] = unit_cost
+                data['status'][position] = stock_status_codes(data['real_stock'][position], min_stock or 0,
+                                                               max_stock or 0)
+                for dimension, value in (('category', category or ''), ('location', location or '')):
+                    codes = self._codes[dimension]
+                    code = codes.get(value)
+                    if code is None:
+                        code = codes[value] = len(self._labels[dimension])
+                        self._labels[dimension].append(value)
+                    if data[dimension][position] != code:
+                        data[dimension][position] = code
+                        self._orders.pop(dimension, None)
+        self._rollups.clear()
+        self.stats['refreshes'] += 1
+        self.stats['refreshed_products'] += len(product_ids)
+
+    def _order(self, dimension):
+        """Posições dos produtos ordenadas por grupo e o início de cada grupo, para o drill-down."""
+        import numpy as np
+
+        order = self._orders.get(dimension)
+        if order is None:
+            codes = self._data[dimension]
+            offsets = np.zeros(len(self._labels[dimension]) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(codes, minlength=len(self._labels[dimension])), out=offsets[1:])
+            order = self._orders[dimension] = (np.argsort(codes, kind='stable'), offsets)
+        return order
@@ -0,0 +1,163 @@
+"""Front end assíncrono (asyncio) para o InventoryManagerRefactored.
+
+As escritas vão para uma única thread escritora, que junta os pedidos pendentes de vários
+chamadores em uma só transação (group commit); as leituras rodam em threads leitoras,
+que no modo WAL não esperam pela escritora.
+"""
+import asyncio
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .core import InventoryManagerRefactored
+
+
+class InventoryService:
+    """Expõe venda, entrada, consulta, ordem de compra e relatório como corrotinas.
+
+    Uso:
+        async with InventoryService('intei.db') as service:
+            new_stock = await service.sale('CAM-001', 2)
+    """
+
+    def __init__(self, db_path: str, readers: int = 4, max_batch: int = 256):
+        # Uma conexão para cada leitora e uma para a escritora (um pool já aberto cresce até esse tamanho)
+        self.manager = InventoryManagerRefactored(db_path, pool_size=readers + 1)
+        self.manager.setup()
+        self.max_batch = max_batch
+        self.stats = {'batches': 0, 'writes': 0, 'failed_batches': 0}
+        self._writes = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='inventory-reader')
+        self._writer = threading.Thread(target=self._write_loop, name='inventory-writer', daemon=True)
+        self._writer.start()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Grava os pedidos ainda na fila e encerra as threads; depois disso as operações levantam RuntimeError."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._writes.put(None)
+        await asyncio.get_running_loop().run_in_executor(None, self._writer.join)
+        self._readers.shutdown()
+
+    # ☆☆ Operações ☆☆
+    async def sale(self, product_code: str, quantity: int):
+        """Registra uma venda; retorna o novo estoque ou None se o saldo for insuficiente."""
+        return await self._move(product_code, quantity, "SALE")
+
+    async def entry(self, product_code: str, quantity: int):
+        """Registra uma entrada; retorna o novo estoque ou None se o produto não existir."""
+        return await self._move(product_code, quantity, "ENTRY")
+
+    async def order(self, product_code: str, name: str, quantity: int):
+        """Cria uma ordem de compra e retorna o seu ID."""
+        return await self._write(lambda: self.manager.purchase_order.create_order(product_code, name, quantity))
+
+    async def lookup(self, product_code: str):
+        """Retorna (product_code, name, real_stock, location) ou None."""
+        return await self._read(self.manager.stock.lookup_stock, product_code)
+
+    async def report(self):
+        """Retorna os produtos em estoque baixo e em excesso, como listas de dicionários."""
+        def build():
+            status = self.manager.stock_status
+            return {
+                'low_stock': status.get_products('low_stock').to_dict('records'),
+                'over_stock': status.get_products('over_stock').to_dict('records'),
+            }
+        return await self._read(build)
+
+    def metrics(self):
+        """Retorna os contadores da escritora, com o tamanho médio dos lotes."""
+        stats = dict(self.stats)
+        stats['average_batch'] = stats['writes'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    async def _move(self, product_code, quantity, category):
+        result = await self._write(
+            lambda: self.manager.apply_product_movement(product_code, quantity, category),
+            keys=[('stock', product_code)],
+        )
+        return result[1] if result else None
+
+    # ☆☆ Leitoras e escritora ☆☆
+    async def _read(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._readers, function, *args)
+
+    async def _write(self, operation, keys=()):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Sob o lock, para que nada entre na fila depois do marcador de encerramento
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("O serviço de estoque já foi encerrado.")
+            self._writes.put((operation, keys, loop, future))
+        return await future
+
+    def _write_loop(self):
+        stopping = False
+        while not stopping:
+            item = self._writes.get()
+            if item is None:
+                break
+            batch = [item]
+            # Junta ao lote tudo o que chegou enquanto a transação anterior era gravada
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        """Grava o lote em uma transação; cada pedido fica em um savepoint, então um erro não desfaz os demais."""
+        outcomes = []
+
+        def apply(conn):
+            outcomes.clear()
+            for operation, _, _, _ in batch:
+                conn.execute("SAVEPOINT service_write")
+                try:
+                    outcomes.append((True, operation()))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO service_write")
+                    outcomes.append((False, e))
+                conn.execute("RELEASE service_write")
+
+        try:
+            self.manager.pool.run_transaction(apply)
+        except Exception as e:
+            logging.error(f"Falha ao gravar lote de {len(batch)} escritas: {e}")
+            self.stats['failed_batches'] += 1
+            outcomes = [(False, e)] * len(batch)
+
+        # Só depois do commit, para que uma leitora não guarde no cache o valor anterior
+        self.manager.cache.invalidate(*[key for _, keys, _, _ in batch for key in keys])
+        self.stats['batches'] += 1
+        self.stats['writes'] += len(batch)
+        for (_, _, loop, future), outcome in zip(batch, outcomes):
+            loop.call_soon_threadsafe(_resolve, future, outcome)
+
+
+def _resolve(future, outcome):
+    if future.cancelled():
+        return
+    succeeded, value = outcome
+    if succeeded:
+        future.set_result(value)
+    else:
+        future.set_exception(value)
@@ -0,0 +1,19 @@
+"""Configuração comum dos testes: cada teste usa um banco novo em uma pasta temporária."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory import InventoryManagerRefactored, set_quiet  # noqa: E402
+
+
+@pytest.fixture
+def manager(tmp_path):
+    set_quiet(True)
+    manager = InventoryManagerRefactored(str(tmp_path / "inventory.db"))
+    manager.setup()
+    yield manager
+    manager.pool.close_all()
+    set_quiet(False)
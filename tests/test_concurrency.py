@@ -0,0 +1,38 @@
+"""Vendas simultâneas do mesmo produto: nenhuma atualização de estoque pode se perder."""
+import threading
+
+
+def test_concurrent_sales_do_not_lose_updates(manager, threads=8, sales=50):
+    initial_stock = threads * sales
+    manager.stock.add_stock('CAM-001', 'Camiseta', initial_stock, 10, initial_stock, 'VEST01')
+
+    def sell():
+        for _ in range(sales):
+            manager.register_product_movement('CAM-001', 1, 'SALE')
+
+    workers = [threading.Thread(target=sell) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    real_stock = manager.stock.execute_query("SELECT real_stock FROM Stock WHERE product_code = 'CAM-001'").fetchone()[0]
+    recorded = manager.movement.execute_query(
+        "SELECT COUNT(*), MIN(after_stock) FROM Movements WHERE movement_category = 'SALE'").fetchone()
+    assert real_stock == 0
+    assert recorded == (initial_stock, 0)
+
+
+def test_sale_beyond_stock_is_rejected(manager, threads=4):
+    manager.stock.add_stock('CAM-001', 'Camiseta', threads - 1, 0, 10, 'VEST01')
+    results = []
+    workers = [threading.Thread(target=lambda: results.append(manager.register_product_movement('CAM-001', 1, 'SALE')))
+               for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sorted(result for result in results if result is not None) == list(range(threads - 1))
+    assert results.count(None) == 1
+    assert manager.stock.lookup_stock('CAM-001')[2] == 0
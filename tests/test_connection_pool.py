@@ -0,0 +1,41 @@
+"""ConnectionPool.get: um pedido de configuração diferente não é ignorado em silêncio."""
+import threading
+
+import pytest
+
+from inventory import InventoryManagerRefactored
+from inventory.core import ConnectionPool
+
+
+def test_get_grows_existing_pool(manager):
+    assert manager.pool.size == 5
+    assert ConnectionPool.get(manager.db_path, size=3) is manager.pool
+    assert manager.pool.size == 5
+
+    other = InventoryManagerRefactored(manager.db_path, pool_size=8)
+    assert other.pool is manager.pool
+    assert manager.pool.size == 8
+
+
+def test_grow_wakes_waiting_threads(tmp_path):
+    pool = ConnectionPool.get(str(tmp_path / "pool.db"), size=1, timeout=5)
+    acquired = threading.Event()
+
+    def borrow():
+        with pool.connection():
+            acquired.set()
+
+    with pool.connection():
+        waiter = threading.Thread(target=borrow)
+        waiter.start()
+        assert not acquired.wait(0.2)
+        ConnectionPool.get(pool.db_path, size=2)
+        assert acquired.wait(2)
+    waiter.join()
+    pool.close_all()
+
+
+def test_get_rejects_conflicting_configuration(manager):
+    with pytest.raises(ValueError):
+        ConnectionPool.get(manager.db_path, timeout=1)
+    assert ConnectionPool.get(manager.db_path, timeout=manager.pool.timeout) is manager.pool
@@ -0,0 +1,78 @@
+"""Migrações: um banco criado antes delas chega à última versão com os agregados preenchidos."""
+from datetime import datetime, timedelta
+
+from inventory import InventoryManagerRefactored
+from inventory.__main__ import main
+from inventory.logs import set_quiet, stop_logging
+
+HISTORY = [
+    ('CAM-001', 'SALE', 2, 3),
+    ('CAM-001', 'SALE', 1, 1),
+    ('CAM-001', 'PURCHASE', 10, 1),
+    ('CAL-001', 'PURCHASE', 5, 40),
+    ('CAL-001', 'ENTRY', 5, 2),
+]
+
+
+def seed_baseline(db_path):
+    """Banco na versão 0: as tabelas originais, com histórico em Movements."""
+    manager = InventoryManagerRefactored(db_path)
+    for entity in (manager.user, manager.product, manager.stock, manager.movement, manager.purchase_order):
+        entity.create_table()
+    now = datetime.now().replace(microsecond=0)
+    manager.movement.execute_many(
+        "INSERT INTO Movements (product_code, name, movement_category, moved_quantity, before_stock, after_stock, "
+        "timestamp) VALUES (?, 'Produto', ?, ?, 100, 100, ?)",
+        [(code, category, quantity, now - timedelta(days=days_ago)) for code, category, quantity, days_ago in HISTORY])
+    assert manager.schema_version() == 0
+    return manager
+
+
+def activity(manager):
+    return (
+        manager.product_activity.execute_query(
+            "SELECT product_code, last_sale IS NOT NULL, last_purchase IS NOT NULL FROM ProductActivity "
+            "ORDER BY product_code").fetchall(),
+        manager.product_activity.execute_query(
+            "SELECT product_code, SUM(sale_count), SUM(sale_quantity), SUM(purchase_count), SUM(purchase_quantity) "
+            "FROM ProductDailyActivity GROUP BY product_code ORDER BY product_code").fetchall(),
+    )
+
+
+EXPECTED = (
+    [('CAL-001', 0, 1), ('CAM-001', 1, 1)],
+    [('CAL-001', 0, 0, 1, 5), ('CAM-001', 2, 3, 1, 10)],
+)
+
+
+def test_upgrade_fills_activity_from_history(tmp_path):
+    set_quiet(True)
+    manager = seed_baseline(str(tmp_path / "baseline.db"))
+
+    manager.setup()
+
+    assert manager.schema_version() == manager.MIGRATIONS[-1][0]
+    assert activity(manager) == EXPECTED
+    assert manager.movement.execute_query("SELECT COUNT(*) FROM AllMovements").fetchone()[0] == len(HISTORY)
+    manager.pool.close_all()
+    set_quiet(False)
+
+
+def test_backfill_activity_command_covers_partitions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db_path = str(tmp_path / "baseline.db")
+    manager = seed_baseline(db_path)
+    manager.setup()
+    # As vendas de 40 dias atrás vão para uma partição; depois os agregados são apagados
+    manager.movement.archive(keep_months=1)
+    manager.product_activity.execute_query("DELETE FROM ProductActivity")
+    manager.product_activity.execute_query("DELETE FROM ProductDailyActivity")
+
+    try:
+        main(['--db', db_path, '--quiet', 'backfill-activity'])
+    finally:
+        stop_logging()
+        set_quiet(False)
+
+    assert activity(manager) == EXPECTED
+    manager.pool.close_all()
@@ -0,0 +1,96 @@
+"""Fila de movimentações: gravação em lotes, encerramento e queda do processo no meio da gravação."""
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from inventory.movement_queue import MovementQueue
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def add_products(manager, products, initial_stock):
+    codes = [f"P{i:03d}" for i in range(products)]
+    manager.stock.execute_many(
+        "INSERT INTO Stock (product_code, name, real_stock, min_stock, max_stock, location) VALUES (?, ?, ?, ?, ?, ?)",
+        [(code, "Produto", initial_stock, 10, 10 ** 6, 'LOC01') for code in codes],
+    )
+    return codes
+
+
+@pytest.mark.parametrize('mode', MovementQueue.MODES)
+def test_queue_applies_every_movement(manager, mode, sales=300):
+    codes = add_products(manager, 10, 1000)
+    movements = MovementQueue(manager, mode=mode, max_batch=50)
+    futures = [movements.submit(codes[i % 10], 1, "SALE") for i in range(sales)]
+    movements.close()
+
+    assert [future.result() for future in futures[-10:]] == [1000 - sales // 10] * 10
+    assert manager.movement.execute_query("SELECT COUNT(*) FROM Movements").fetchone()[0] == sales
+    assert movements.stats['movements'] == sales
+
+
+@pytest.mark.parametrize('mode', MovementQueue.MODES)
+def test_submit_after_close_raises(manager, mode):
+    add_products(manager, 1, 10)
+    movements = MovementQueue(manager, mode=mode)
+    movements.close()
+    with pytest.raises(RuntimeError):
+        movements.submit("P000", 1, "SALE")
+
+
+# Processo que grava entradas sem parar até ser derrubado; imprime o total confirmado após cada commit
+CRASH_CHILD = """
+import sys
+from inventory import InventoryManagerRefactored
+from inventory.movement_queue import MovementQueue
+
+manager = InventoryManagerRefactored(sys.argv[1])
+committed = 0
+
+def report(applied):
+    global committed
+    committed += applied
+    print(committed, flush=True)
+
+movements = MovementQueue(manager, max_batch=int(sys.argv[2]), on_commit=report)
+sequence = 0
+while True:
+    movements.submit(f"P{sequence % 100:03d}", 1, "ENTRY")
+    sequence += 1
+"""
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGKILL'), reason="requer SIGKILL")
+def test_crash_keeps_whole_batches(manager, max_batch=100, products=100, initial_stock=1000):
+    """Derruba (SIGKILL) o processo no meio da gravação: nenhum lote pode ficar pela metade."""
+    codes = add_products(manager, products, initial_stock)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    child = subprocess.Popen(
+        [sys.executable, '-c', CRASH_CHILD, manager.db_path, str(max_batch)],
+        cwd=os.path.dirname(manager.db_path), env=env, stdout=subprocess.PIPE, text=True,
+    )
+    # Derruba depois de alguns lotes confirmados, com o próximo já em gravação
+    reported = [0] + [int(child.stdout.readline()) for _ in range(10)]
+    child.send_signal(signal.SIGKILL)
+    reported += [int(line) for line in child.stdout.read().split()]
+    child.wait()
+
+    conn = sqlite3.connect(manager.db_path)
+    try:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+        committed = conn.execute("SELECT COUNT(*) FROM Movements").fetchone()[0]
+        # As movimentações confirmadas formam um prefixo da sequência enviada...
+        counts = dict(conn.execute("SELECT product_code, COUNT(*) FROM Movements GROUP BY product_code"))
+        stocks = dict(conn.execute("SELECT product_code, real_stock FROM Stock"))
+    finally:
+        conn.close()
+    for index, code in enumerate(codes):
+        expected = committed // products + (index < committed % products)
+        assert counts.get(code, 0) == expected, "movimentações fora de ordem ou faltando"
+        assert stocks[code] == initial_stock + expected, "estoque e movimentações divergentes"
+    # ...que termina na fronteira de um lote: o último informado ou um lote gravado logo antes da queda
+    assert committed == reported[-1] or 0 < committed - reported[-1] <= max_batch
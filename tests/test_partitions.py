@@ -0,0 +1,65 @@
+"""Partições mensais de Movements: arquivamento, desanexação e volta ao banco principal."""
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+
+
+def mid_month(months_ago):
+    return datetime.now().replace(day=15, hour=10, minute=0, second=0, microsecond=0) - relativedelta(months=months_ago)
+
+
+def add_sales(manager, months_ago, count):
+    timestamp = mid_month(months_ago).strftime('%Y-%m-%d %H:%M:%S')
+    manager.movement.execute_many(
+        "INSERT INTO Movements (product_code, name, movement_category, moved_quantity, before_stock, after_stock, "
+        "timestamp) VALUES ('CAM-001', 'Camiseta', 'SALE', 1, 50, 49, ?)", [(timestamp,)] * count)
+
+
+def all_movements(manager):
+    return manager.movement.execute_query("SELECT * FROM AllMovements ORDER BY id").fetchall()
+
+
+def count(manager, table):
+    return manager.movement.execute_query(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_archive_creates_partitions_only_for_months_with_rows(manager):
+    manager.stock.add_stock('CAM-001', 'Camiseta', 50, 10, 100, 'VEST01')
+    # Nenhuma movimentação há 4 meses
+    for months_ago, rows in ((5, 3), (3, 2), (0, 4)):
+        add_sales(manager, months_ago, rows)
+    before = all_movements(manager)
+
+    moved = manager.movement.archive(keep_months=2)
+
+    assert moved == {f"{mid_month(5):%Y-%m}": 3, f"{mid_month(3):%Y-%m}": 2}
+    partitions = manager.movement.execute_query(
+        "SELECT month, table_name, row_count FROM MovementPartitions ORDER BY month").fetchall()
+    assert [(month, rows) for month, _, rows in partitions] == list(moved.items())
+    tables = {row[0] for row in manager.movement.execute_query(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'Movements_%'")}
+    assert tables == {table for _, table, _ in partitions}
+    assert count(manager, 'MovementLog') == 4
+    assert all_movements(manager) == before
+
+
+def test_detach_and_attach_round_trip(manager, tmp_path):
+    manager.stock.add_stock('CAM-001', 'Camiseta', 50, 10, 100, 'VEST01')
+    add_sales(manager, 5, 3)
+    add_sales(manager, 0, 4)
+    before = all_movements(manager)
+    manager.movement.archive(keep_months=2)
+    month = f"{mid_month(5):%Y-%m}"
+    archive_path = str(tmp_path / f"movements_{month}.db")
+
+    manager.movement.detach_partition(month, archive_path)
+
+    assert count(manager, 'AllMovements') == 4
+    assert manager.movement.execute_query(
+        "SELECT archive_path FROM MovementPartitions WHERE month = ?", (month,)).fetchone()[0] == archive_path
+
+    manager.movement.attach_partition(month)
+
+    assert all_movements(manager) == before
+    assert manager.movement.execute_query(
+        "SELECT archive_path FROM MovementPartitions WHERE month = ?", (month,)).fetchone()[0] is None
@@ -0,0 +1,20 @@
+"""As consultas de relatório devem ser resolvidas por índice (EXPLAIN QUERY PLAN)."""
+import pytest
+
+from inventory import InventoryManagerRefactored
+
+
+def test_report_queries_use_indexes(manager):
+    manager.stock.execute_query("ANALYZE")
+    assert manager.check_query_plans() == {}
+
+
+@pytest.mark.parametrize('label', list(InventoryManagerRefactored.INDEXED_QUERIES))
+def test_indexed_query_runs_with_its_parameters(manager, label):
+    query, params = manager.INDEXED_QUERIES[label]
+    manager.stock.execute_query(query, params).fetchall()
+
+
+def test_full_scan_is_reported(manager):
+    manager.stock.execute_query("DROP INDEX idx_stock_location")
+    assert list(manager.check_query_plans()) == ['conteúdo da localização']
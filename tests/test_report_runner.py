@@ -0,0 +1,96 @@
+"""ReportRunner: as seções geradas em paralelo leem o mesmo snapshot, mesmo com vendas em andamento."""
+import sqlite3
+import threading
+
+import pytest
+
+from inventory import InventoryManagerRefactored
+from inventory.core import ConnectionPool
+from inventory.report_runner import ReportRunner
+
+
+def test_sections_match_sequential_queries(manager):
+    manager.stock.add_stock('CAM-001', 'Camiseta', 5, 10, 100, 'VEST01')
+    manager.register_product_movement('CAM-001', 1, 'SALE')
+
+    results, timings = ReportRunner(manager, threads=4).run()
+
+    assert timings['total']['parallel']
+    assert results['low_stock'].equals(manager.stock_status.get_products('low_stock'))
+    assert list(results['weekly_movements']['closing_stock']) == [4]
+
+
+def test_unsold_products_leave_out_stock_only_products(manager):
+    manager.product.add_product('CAM-001', 'Camiseta', 'Vestuário')
+    manager.stock.add_stock('CAL-001', 'Calça', 30, 10, 100, 'VEST01')
+
+    results, _ = ReportRunner(manager).run()
+
+    assert results['unsold_products']['product_code'].tolist() == ['CAM-001']
+
+
+def test_sections_share_one_snapshot(manager, sales=2000):
+    # O estoque fica sempre abaixo do mínimo: cada venda muda a linha de low_stock e a de movimentações
+    manager.stock.add_stock('CAM-001', 'Camiseta', sales, sales + 1, sales + 10, 'VEST01')
+    manager.register_product_movement('CAM-001', 1, 'SALE')
+    done = threading.Event()
+
+    def sell():
+        for _ in range(sales - 1):
+            manager.register_product_movement('CAM-001', 1, 'SALE')
+        done.set()
+
+    runner = ReportRunner(manager, threads=4)
+    runner.run()
+    writer = threading.Thread(target=sell)
+    writer.start()
+    try:
+        while not done.is_set():
+            results, _ = runner.run()
+            real_stock = results['low_stock'].set_index('product_code').loc['CAM-001', 'real_stock']
+            closing_stock = results['weekly_movements'].set_index('product_code').loc['CAM-001', 'closing_stock']
+            assert real_stock == closing_stock
+    finally:
+        writer.join()
+
+
+def test_starved_pool_fails_instead_of_hanging(tmp_path):
+    ConnectionPool.get(str(tmp_path / "starved.db"), size=3, timeout=1)
+    manager = InventoryManagerRefactored(str(tmp_path / "starved.db"), pool_size=3)
+    manager.setup()
+    runner = ReportRunner(manager, threads=2)
+    runner.run()
+
+    # Duas threads seguram conexões: só sobra uma para as duas threads do relatório
+    holding, release = threading.Barrier(3), threading.Event()
+
+    def hold():
+        with manager.pool.connection():
+            holding.wait()
+            release.wait()
+
+    holders = [threading.Thread(target=hold) for _ in range(2)]
+    for holder in holders:
+        holder.start()
+    holding.wait()
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = runner.run()
+        except Exception as e:
+            outcome['error'] = e
+
+    reporter = threading.Thread(target=run, daemon=True)
+    reporter.start()
+    reporter.join(timeout=10)
+    release.set()
+    for holder in holders:
+        holder.join()
+    assert not reporter.is_alive()
+    with pytest.raises(sqlite3.OperationalError):
+        raise outcome['error']
+
+    # Com as conexões de volta ao pool, o relatório roda normalmente
+    assert runner.run()[1]['total']['parallel']
+    manager.pool.close_all()
@@ -0,0 +1,39 @@
+"""RollupEngine: volume sem as mudanças de localização e só os produtos cadastrados."""
+from inventory.rollups import RollupEngine
+
+
+def test_relocation_moves_product_without_volume(manager):
+    manager.product.add_product('CAM-001', 'Camiseta', 'Vestuário')
+    manager.stock.add_stock('CAM-001', 'Camiseta', 50, 10, 100, 'VEST01')
+    manager.register_product_movement('CAM-001', 5, 'SALE')
+    engine = RollupEngine(manager)
+    engine.rollup('location')
+
+    # Depois do primeiro retrato, a mudança chega pela atualização incremental
+    manager.relocate_products({'CAM-001': 'VEST02'})
+    by_location = engine.rollup('location')
+
+    assert list(by_location.index) == ['VEST02']
+    assert by_location.loc['VEST02', ['movements', 'moved_quantity']].tolist() == [1, 5]
+    assert engine.stats['refreshes'] == 1
+    assert list(engine.drill_down(location='VEST02')['product_code']) == ['CAM-001']
+    assert engine.drill_down(location='VEST01').empty
+
+    # Na releitura completa, o volume vem dos totais diários
+    engine.invalidate()
+    assert engine.rollup('location').loc['VEST02', ['movements', 'moved_quantity']].tolist() == [1, 5]
+
+
+def test_stock_only_products_are_left_out(manager):
+    manager.product.add_product('CAM-001', 'Camiseta', 'Vestuário')
+    manager.stock.add_stock('CAM-001', 'Camiseta', 50, 10, 100, 'VEST01')
+    manager.stock.add_stock('CAL-001', 'Calça', 30, 10, 100, 'VEST01')
+    engine = RollupEngine(manager)
+
+    assert engine.rollup('category').index.tolist() == ['Vestuário']
+    assert engine.rollup('location').loc['VEST01', 'units'] == 50
+
+    # Cadastrado depois do retrato e movimentado: entra na próxima consulta
+    manager.product.add_product('CAL-001', 'Calça', 'Vestuário')
+    manager.register_product_movement('CAL-001', 2, 'SALE')
+    assert engine.rollup('location').loc['VEST01', ['products', 'units', 'movements']].tolist() == [2, 78, 1]
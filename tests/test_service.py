@@ -0,0 +1,68 @@
+"""InventoryService: leituras e escritas simultâneas, group commit e encerramento."""
+import asyncio
+import sqlite3
+
+import pytest
+
+from inventory import InventoryManagerRefactored
+from inventory.service import InventoryService
+
+
+@pytest.fixture
+def db_path(manager):
+    manager.stock.add_stock('CAM-001', 'Camiseta', 100, 10, 200, 'VEST01')
+    return manager.db_path
+
+
+def test_concurrent_reads_and_writes(db_path, sales=50):
+    async def scenario():
+        async with InventoryService(db_path) as service:
+            results = await asyncio.gather(*[service.sale('CAM-001', 1) for _ in range(sales)],
+                                           *[service.lookup('CAM-001') for _ in range(sales)])
+            return results[:sales], results[sales:], await service.lookup('CAM-001')
+
+    new_stocks, lookups, final = asyncio.run(scenario())
+    assert sorted(new_stocks) == list(range(100 - sales, 100))
+    assert all(100 - sales <= lookup[2] <= 100 for lookup in lookups)
+    assert final[2] == 100 - sales
+
+
+def test_pending_writes_share_one_commit(db_path, sales=100):
+    async def scenario():
+        async with InventoryService(db_path) as service:
+            # Outra conexão segura o lock de escrita: os pedidos se acumulam enquanto o primeiro lote espera
+            blocker = sqlite3.connect(db_path)
+            blocker.execute("BEGIN IMMEDIATE")
+            first = asyncio.ensure_future(service.sale('CAM-001', 1))
+            await asyncio.sleep(0.1)
+            rest = [asyncio.ensure_future(service.sale('CAM-001', 1)) for _ in range(sales - 1)]
+            await asyncio.sleep(0.1)
+            blocker.rollback()
+            blocker.close()
+            await asyncio.gather(first, *rest)
+            return service.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert metrics['writes'] == sales
+    assert metrics['batches'] == 2
+
+
+def test_writes_after_close_are_rejected(db_path):
+    async def scenario():
+        service = InventoryService(db_path)
+        assert await service.sale('CAM-001', 1) == 99
+        await service.close()
+        await service.close()
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(service.sale('CAM-001', 1), timeout=1)
+
+    asyncio.run(scenario())
+    assert InventoryManagerRefactored(db_path).stock.lookup_stock('CAM-001')[2] == 99
+
+
+def test_readers_get_their_connections(db_path):
+    async def scenario():
+        async with InventoryService(db_path, readers=8) as service:
+            return service.manager.pool.size
+
+    assert asyncio.run(scenario()) == 9
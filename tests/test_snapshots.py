@@ -0,0 +1,77 @@
+"""Snapshots diários: os relatórios só leem; quem grava os snapshots é o caminho de gravação."""
+import io
+import sqlite3
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+
+def add_old_sale(manager, days_ago):
+    timestamp = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d %H:%M:%S')
+    manager.movement.execute_query(
+        "INSERT INTO Movements (product_code, name, movement_category, moved_quantity, before_stock, after_stock, "
+        "timestamp) VALUES ('CAM-001', 'Camiseta', 'SALE', 1, 51, 50, ?)", (timestamp,))
+
+
+def snapshot_days(manager):
+    return [row[0] for row in manager.snapshot.execute_query("SELECT day FROM SnapshotDays ORDER BY day")]
+
+
+def test_reports_do_not_write(manager):
+    manager.stock.add_stock('CAM-001', 'Camiseta', 50, 10, 100, 'VEST01')
+    add_old_sale(manager, days_ago=2)
+
+    # Outra conexão segura o lock de escrita: um relatório que gravasse ficaria esperando por ele
+    writer = sqlite3.connect(manager.db_path, timeout=0)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        with redirect_stdout(io.StringIO()):
+            manager.generate_weekly_report()
+            manager.generate_monthly_report()
+            manager.compare_weeks()
+    finally:
+        writer.rollback()
+        writer.close()
+    assert snapshot_days(manager) == []
+
+
+def test_first_write_of_the_day_appends_snapshots(manager):
+    manager.stock.add_stock('CAM-001', 'Camiseta', 50, 10, 100, 'VEST01')
+    add_old_sale(manager, days_ago=1)
+
+    manager.register_product_movement('CAM-001', 1, 'SALE')
+
+    yesterday = (datetime.now() - timedelta(days=1)).date().isoformat()
+    assert snapshot_days(manager) == [yesterday]
+    report = manager.snapshot.period_report(datetime.now().date() - timedelta(days=1),
+                                            datetime.now().date() + timedelta(days=1))
+    assert report['movement_count'].sum() == 2
+
+
+def test_day_split_between_partition_and_log(manager):
+    manager.stock.add_stock('CAM-001', 'Camiseta', 50, 10, 100, 'VEST01')
+    day = (datetime.now() - timedelta(days=100)).date()
+
+    def add_sale(time, before, after):
+        manager.movement.execute_query(
+            "INSERT INTO Movements (product_code, name, movement_category, moved_quantity, before_stock, after_stock, "
+            "timestamp) VALUES ('CAM-001', 'Camiseta', 'SALE', ?, ?, ?, ?)",
+            (before - after, before, after, f"{day} {time}"))
+
+    add_sale('10:00:00', 50, 49)
+    assert manager.movement.archive(keep_months=1)
+    # Lançamento retroativo: o mesmo dia agora tem uma linha na partição e outra em MovementLog
+    add_sale('12:00:00', 49, 47)
+
+    def day_report():
+        report = manager.snapshot.period_report(day, day + timedelta(days=1))
+        return report[['movement_count', 'moved_quantity', 'opening_stock', 'closing_stock']].values.tolist()
+
+    assert day_report() == [[2, 3, 50, 47]]
+    manager.snapshot.backfill()
+    assert str(day) in snapshot_days(manager)
+    assert day_report() == [[2, 3, 50, 47]]
+
+    # O caminho de gravação também consegue gravar os snapshots
+    manager.snapshot.execute_query("DELETE FROM SnapshotDays")
+    manager.register_product_movement('CAM-001', 1, 'SALE')
+    assert snapshot_days(manager)[-1] == (datetime.now() - timedelta(days=1)).date().isoformat()